@@ -15,11 +15,14 @@ import pandas as pd
 import asyncio
 from datetime import datetime
 from services.llm_service import llm_service
+from services.rag_service import rag_service
 from services.profile_parser import parse_profile
 from services.question_generator import generate_questions
 from services.evaluator import evaluate_answer
 from services.history_service import history_service
-from config import ABILITY_DIMENSIONS
+from services.round_prefetcher import RoundPrefetcher
+from services.question_pool import pool_replenisher
+from config import ABILITY_DIMENSIONS, settings
 from database import init_db, SessionLocal, is_db_available
 from models.schemas import CompanyScale
 
@@ -29,6 +32,10 @@ try:
 except Exception as e:
     print(f"数据库初始化失败: {e}")
 
+# 预生成题库补货线程（每个进程只启动一次，脚本重跑时不会重复启动）
+if settings.question_pool_enabled:
+    pool_replenisher.start()
+
 # 页面配置
 st.set_page_config(
     page_title="AIPM-Scan Pro",
@@ -377,10 +384,21 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+async def _run_and_close(coro):
+    try:
+        return await coro
+    finally:
+        # 每次调用都是新的事件循环，结束前关闭其上的连接池
+        await llm_service.aclose()
+        await rag_service.aclose()
+
 def run_async(coro):
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-    return loop.run_until_complete(coro)
+    try:
+        return loop.run_until_complete(_run_and_close(coro))
+    finally:
+        loop.close()
 
 def get_db_session():
     return SessionLocal()
@@ -400,11 +418,15 @@ def init_session_state():
         "current_idx": 0,
         "answers": {},    # {q_id: answer}
         "evaluations": {},# {q_id: evaluation}
-        "history_view_id": None
+        "history_view_id": None,
+        "round_prefetcher": None,  # 下一轮题目后台预取
+        "asked_questions": {}      # {round: [题目文本]}，用于跨轮近似重复过滤
     }
     for k, v in defaults.items():
         if k not in st.session_state:
             st.session_state[k] = v
+    if st.session_state.round_prefetcher is None:
+        st.session_state.round_prefetcher = RoundPrefetcher()
 
 # --- Components ---
 
@@ -445,6 +467,35 @@ def render_sidebar():
                     st.markdown(f"**→ {v}**")
                 else:
                     st.markdown(f"　{v}")
+        
+        st.markdown("---")
+        render_llm_metrics_panel()
+
+def render_llm_metrics_panel():
+    """侧边栏：按调用点展示 LLM 耗时、token 与预估成本"""
+    snapshot = llm_service.metrics.snapshot()
+    with st.expander("📈 LLM 调用统计", expanded=False):
+        if not snapshot:
+            st.caption("暂无调用记录")
+            return
+        rows = [
+            {
+                "调用点": site,
+                "调用": m["calls"],
+                "缓存命中": m["cache_hits"],
+                "平均耗时(s)": m["avg_latency_seconds"],
+                "P95(s)": m["p95_latency_seconds"],
+                "排队(s)": m["avg_queue_wait_seconds"],
+                "输入 tokens": m["prompt_tokens"],
+                "输出 tokens": m["completion_tokens"],
+                "解析失败": m["parse_failures"],
+                "成本(元)": m["estimated_cost"]
+            }
+            for site, m in snapshot.items()
+        ]
+        st.dataframe(pd.DataFrame(rows).set_index("调用点"), use_container_width=True)
+        total_cost = sum(m["estimated_cost"] for m in snapshot.values())
+        st.caption(f"累计预估成本: ¥{total_cost:.4f}")
 
 def render_setup():
     # 标题
@@ -585,6 +636,7 @@ def render_setup():
                             company_scale=st.session_state.company_scale
                         )
                         st.session_state.interview_id = interview.id
+                        st.session_state.asked_questions = {}
                     finally:
                         db.close()
                     
@@ -644,6 +696,22 @@ def render_profile_view():
     if st.button("开始第 1 轮面试 ➡️", type="primary"):
         start_round(1)
 
+def get_round_params(round_num):
+    """第 round_num 轮的题目生成参数（同时作为预取的匹配依据）"""
+    return {
+        "ability_weights": st.session_state.job_profile.get("ability_weights", {}),
+        "count": st.session_state.questions_per_round,
+        "resume_gap_analysis": st.session_state.job_profile.get("gap_analysis", []),
+        "company_scale": st.session_state.company_scale,
+        "current_round": round_num,
+        "total_rounds": st.session_state.max_rounds,
+        "asked_questions": [
+            text
+            for r, texts in sorted(st.session_state.asked_questions.items()) if r < round_num
+            for text in texts
+        ]
+    }
+
 def start_round(round_num):
     st.session_state.round = round_num
     st.session_state.current_idx = 0
@@ -658,18 +726,14 @@ def start_round(round_num):
     finally:
         db.close()
     
+    prefetcher = st.session_state.round_prefetcher
     with st.spinner(f"正在生成第 {round_num} 轮面试题..."):
-        weights = st.session_state.job_profile.get("ability_weights", {})
-        gaps = st.session_state.job_profile.get("gap_analysis", [])
+        params = get_round_params(round_num)
         
-        qt = run_async(generate_questions(
-            ability_weights=weights,
-            count=st.session_state.questions_per_round,
-            resume_gap_analysis=gaps,
-            company_scale=st.session_state.company_scale,
-            current_round=round_num,
-            total_rounds=st.session_state.max_rounds
-        ))
+        # 优先使用后台预取的题目（参数变化时会重新生成）
+        qt = prefetcher.take(**params) if settings.round_prefetch_enabled else None
+        if qt is None:
+            qt = run_async(generate_questions(**params))
         
         # Save questions to DB
         db = get_db_session()
@@ -677,6 +741,11 @@ def start_round(round_num):
             history_service.add_questions(db, st.session_state.round_id, qt)
         finally:
             db.close()
+        st.session_state.asked_questions[round_num] = [q["text"] for q in qt]
+            
+        # 候选人答题期间在后台生成下一轮
+        if settings.round_prefetch_enabled and round_num < st.session_state.max_rounds:
+            prefetcher.prefetch(**get_round_params(round_num + 1))
             
         st.session_state.questions = qt
         st.session_state.step = "interview"
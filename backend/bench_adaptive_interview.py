@@ -0,0 +1,80 @@
+"""
+自适应面试基准：模拟候选人作答，对比固定难度安排与自适应选题达到的测量精度和所需题数
+
+每个模拟候选人各维度有真实能力 θ（N(0, 1.2²)），作答得分按 IRT 模型加评分噪声生成，无需调用 LLM。
+固定安排每个维度出 k 道题，难度按 基础/进阶/高级 轮换（与 difficulty_schedule 相同的分布）；
+自适应模式按 AdaptiveInterview 选题直至各维度标准误达标。输出平均题数（即出题 + 评估的 LLM 调用数）
+与 θ 估计的均方根误差。
+用法: python bench_adaptive_interview.py [候选人数] [随机种子]
+"""
+import math
+import os
+import random
+import sys
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import ABILITY_DIMENSIONS, settings
+from services.adaptive_interview import (
+    AdaptiveInterview, DIFFICULTY_PARAMS, DISCRIMINATION, estimate_ability
+)
+
+LEVELS = list(DIFFICULTY_PARAMS)
+WEIGHTS = {dim: 1 / len(ABILITY_DIMENSIONS) for dim in ABILITY_DIMENSIONS}
+
+
+def simulate_score(rng: random.Random, theta: float, difficulty: str) -> float:
+    p = 1 / (1 + math.exp(-DISCRIMINATION * (theta - DIFFICULTY_PARAMS[difficulty])))
+    return 10 * min(max(p + rng.gauss(0, settings.adaptive_score_noise), 0.0), 1.0)
+
+
+def run_static(rng: random.Random, abilities: list, per_dimension: int) -> tuple:
+    errors, asked = [], 0
+    for truth in abilities:
+        for dim, theta in truth.items():
+            responses = [
+                (LEVELS[i % len(LEVELS)], simulate_score(rng, theta, LEVELS[i % len(LEVELS)]))
+                for i in range(per_dimension)
+            ]
+            asked += per_dimension
+            errors.append(estimate_ability(responses)[0] - theta)
+    return asked / len(abilities), math.sqrt(sum(e * e for e in errors) / len(errors))
+
+
+def run_adaptive(rng: random.Random, abilities: list) -> tuple:
+    errors, asked = [], 0
+    for truth in abilities:
+        interview = AdaptiveInterview(WEIGHTS, max_questions=100)
+        while True:
+            slot = interview.select_next()
+            if slot is None:
+                break
+            dim, difficulty = slot
+            interview.questions.append({"dimension": dim, "difficulty": difficulty})
+            interview.record({"dimension": dim, "difficulty": difficulty}, simulate_score(rng, truth[dim], difficulty))
+        asked += len(interview.questions)
+        errors.extend(interview.estimate(dim)[0] - theta for dim, theta in truth.items())
+    return asked / len(abilities), math.sqrt(sum(e * e for e in errors) / len(errors))
+
+
+def main():
+    candidates = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    rng = random.Random(seed)
+    abilities = [{dim: rng.gauss(0, 1.2) for dim in ABILITY_DIMENSIONS} for _ in range(candidates)]
+
+    print(
+        f"🚀 自适应面试基准: {candidates} 名模拟候选人, {len(ABILITY_DIMENSIONS)} 个维度, "
+        f"标准误目标 {settings.adaptive_se_target}, 评分噪声 {settings.adaptive_score_noise}"
+    )
+    adaptive_asked, adaptive_rmse = run_adaptive(random.Random(seed), abilities)
+    print(f"自适应: 平均 {adaptive_asked:.1f} 题/人, θ 均方根误差 {adaptive_rmse:.3f}")
+    for k in range(1, settings.adaptive_max_per_dimension + 3):
+        asked, rmse = run_static(random.Random(seed), abilities, k)
+        marker = " ← 精度不低于自适应" if rmse <= adaptive_rmse else ""
+        print(f"固定安排 每维度 {k} 题: {asked:.0f} 题/人, θ 均方根误差 {rmse:.3f}{marker}")
+
+
+if __name__ == "__main__":
+    main()
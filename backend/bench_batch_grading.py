@@ -0,0 +1,79 @@
+"""
+批量评分基准：对比逐题串行、逐题并发与多题打包评估的耗时和输入 token
+
+在进程内启动 Mock 服务（见 mock_server.py），对同一组题目分别以三种模式调用 evaluate_batch，
+输出各模式的上游调用数、prompt/completion token 与耗时。
+用法: python bench_batch_grading.py [题目数] [单次 LLM 延迟秒数]
+"""
+import asyncio
+import os
+import sys
+import time
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import ABILITY_DIMENSIONS
+from mock_server import LatencyModel, mock_services
+from services.evaluator import evaluate_batch
+from services.llm_service import llm_service
+
+DIMENSIONS = list(ABILITY_DIMENSIONS)
+
+
+def build_items(n: int) -> list:
+    return [
+        {
+            "question": {
+                "id": f"q{i + 1:03d}",
+                "text": f"请结合项目经历说明你如何评估大模型产品的效果（第 {i + 1} 题）",
+                "dimension": DIMENSIONS[i % len(DIMENSIONS)],
+                "reference_context": "评估体系应覆盖离线评测集、线上 A/B 与人工抽检，关注准确率、幻觉率与用户满意度。"
+            },
+            "answer": f"我会先搭建离线评测集，再通过灰度 A/B 观察留存与满意度，并定期人工抽检幻觉案例。（样本 {i}）"
+        }
+        for i in range(n)
+    ]
+
+
+async def run(items: list, batched: bool, concurrency: int = None) -> dict:
+    llm_service.metrics.reset()
+    start = time.perf_counter()
+    report = await evaluate_batch(items, batched=batched, concurrency=concurrency)
+    elapsed = time.perf_counter() - start
+    snapshot = llm_service.metrics.snapshot()
+    return {
+        "elapsed": elapsed,
+        "graded": report["total_questions"],
+        "calls": sum(site["calls"] for site in snapshot.values()),
+        "prompt_tokens": sum(site["prompt_tokens"] for site in snapshot.values()),
+        "completion_tokens": sum(site["completion_tokens"] for site in snapshot.values())
+    }
+
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+
+    # 关闭响应缓存，使各模式都真实调用上游
+    async with mock_services(rag=False, llm_cache=False, llm_latency=LatencyModel("fixed", (delay,))):
+        items = build_items(n)
+        print(f"🚀 批量评分基准: {n} 道题, 单次 LLM 延迟 {delay:.2f}s")
+        sequential = await run(items, batched=False, concurrency=1)
+        concurrent = await run(items, batched=False)
+        batched = await run(items, batched=True)
+
+        for label, r in (("逐题串行", sequential), ("逐题并发", concurrent), ("批量评估", batched)):
+            print(
+                f"{label}: 评估 {r['graded']}/{n} 题, 上游调用 {r['calls']} 次, "
+                f"prompt {r['prompt_tokens']} / completion {r['completion_tokens']} token, 耗时 {r['elapsed']:.2f}s"
+            )
+        if batched["prompt_tokens"] and batched["elapsed"]:
+            print(
+                f"📉 输入 token 降为 {batched['prompt_tokens'] / sequential['prompt_tokens']:.0%}, "
+                f"耗时降为 {batched['elapsed'] / sequential['elapsed']:.0%}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,51 @@
+"""
+并发基准：验证 N 个并发 /api/evaluate-answer 请求在时间上重叠而非排队
+
+在本地启动 Mock 服务（固定延迟，见 mock_server.py），再通过 ASGI 直接调用 FastAPI 应用。
+用法: python bench_concurrency.py [并发数] [单次延迟秒数]
+"""
+import asyncio
+import os
+import sys
+import time
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from main import app
+from mock_server import LatencyModel, mock_services
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+
+    # 关闭响应缓存，并让每个请求的回答各不相同（避免被合并），以测量真实的上游并发
+    async with mock_services(rag=False, llm_cache=False, llm_latency=LatencyModel("fixed", (delay,))) as server:
+        def payload(i: int) -> dict:
+            return {
+                "question": {"id": "q001", "text": "请解释 RAG 的原理", "dimension": "ai_tech_understanding"},
+                "answer": f"RAG 可以降低幻觉，通过检索外部知识增强生成。（候选人 {i}）"
+            }
+
+        print(f"🚀 并发基准: {n} 个请求, 单次 LLM 延迟 {delay:.2f}s")
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            # 预热一次，建立连接池
+            await client.post("/api/evaluate-answer", json=payload(-1))
+            server.stats["peak_in_flight"] = 0
+
+            start = time.perf_counter()
+            responses = await asyncio.gather(*[
+                client.post("/api/evaluate-answer", json=payload(i)) for i in range(n)
+            ])
+            elapsed = time.perf_counter() - start
+
+        ok = sum(1 for r in responses if r.json().get("success"))
+        print(f"✅ 成功 {ok}/{n}")
+        print(f"⏱️  总耗时 {elapsed:.2f}s (串行预期 {n * delay:.2f}s, 并行预期 ~{delay:.2f}s)")
+        print(f"📈 上游峰值并发 {server.stats['peak_in_flight']}, 累计 TCP 连接 {server.stats['connections']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
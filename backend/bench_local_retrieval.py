@@ -0,0 +1,104 @@
+"""
+本地检索基准：knowledge_base/ 的进程内 BM25 检索与经网络调用 RAGFlow 兼容接口的单次检索延迟
+
+本地后端：输出建索引耗时、片段数，以及出题检索 query（维度 × 难度 × 公司规模）与题库原题查询的延迟 p50/p99；
+用题库原题查询时统计包含该题的片段排在第一的比例（recall@1）。
+远程后端：在进程内启动 Mock 服务（见 mock_server.py，不加人为延迟，含网络、序列化与 Mock 自身的检索开销），
+关闭检索缓存后用同一批 query 测单次检索延迟作对照。
+用法: python bench_local_retrieval.py [每个 query 重复次数]
+"""
+import asyncio
+import os
+import re
+import sys
+import time
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import ABILITY_DIMENSIONS
+from mock_server import LatencyModel, mock_services
+from models.schemas import CompanyScale
+from services.local_retriever import local_retriever
+from services.rag_service import rag_service
+
+DIFFICULTIES = ["基础", "进阶", "高级"]
+SCALES = [scale.value for scale in CompanyScale]
+QUESTION_RE = re.compile(r"\*\*题目\*\*[：:]\s*(.+)")
+
+
+def generation_queries() -> list:
+    return [
+        f"AI产品经理面试题 {info['name']} {difficulty} {scale}"
+        for info in ABILITY_DIMENSIONS.values()
+        for difficulty in DIFFICULTIES
+        for scale in SCALES
+    ]
+
+
+def bank_questions() -> list:
+    questions = []
+    for path in sorted(local_retriever.root.rglob("*.md")):
+        questions.extend(m.group(1).strip() for m in QUESTION_RE.finditer(path.read_text(encoding="utf-8")))
+    return questions
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def remote_latencies(queries: list, repeat: int) -> list:
+    latencies = []
+    async with mock_services(
+        llm=False, rag_latency=LatencyModel("fixed", (0.0,)), overrides={"rag_cache_enabled": False}
+    ):
+        for _ in range(repeat):
+            for query in queries:
+                start = time.perf_counter()
+                await rag_service.retrieve(query, top_k=3)
+                latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    start = time.perf_counter()
+    local_retriever.ensure_index()
+    stats = local_retriever.stats()
+    print(
+        f"🚀 本地检索基准: {stats['chunks']} 个片段, {stats['terms']} 个 bigram, "
+        f"建索引 {(time.perf_counter() - start) * 1000:.1f}ms"
+    )
+
+    queries = generation_queries()
+    questions = bank_questions()
+    for label, batch in (("出题 query", queries), ("题库原题", questions)):
+        latencies = []
+        for _ in range(repeat):
+            for query in batch:
+                t = time.perf_counter()
+                local_retriever.search(query, top_k=3, similarity_threshold=0.5)
+                latencies.append((time.perf_counter() - t) * 1000)
+        print(
+            f"⏱️  本地 {label} ({len(batch)} 条): p50 {percentile(latencies, 0.5):.3f}ms / "
+            f"p99 {percentile(latencies, 0.99):.3f}ms"
+        )
+
+    hits = sum(
+        bool(results) and question in results[0]["content_with_weight"]
+        for question in questions
+        for results in [local_retriever.search(question, top_k=1)]
+    )
+    print(f"🎯 题库原题 recall@1: {hits}/{len(questions)}")
+
+    remote = asyncio.run(remote_latencies(queries, max(1, repeat // 4)))
+    print(
+        f"🌐 远程（Mock，不加人为延迟）出题 query: p50 {percentile(remote, 0.5):.3f}ms / "
+        f"p99 {percentile(remote, 0.99):.3f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
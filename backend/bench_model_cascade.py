@@ -0,0 +1,156 @@
+"""
+评分级联基准：对比全部用主模型评分与"便宜模型先评、存疑再升级"的延迟、成本和评分一致性
+
+在进程内启动 Mock 服务（见 mock_server.py），主模型与便宜模型分别配置延迟；便宜模型的评分带有
+稳定的随机偏差并有少量不合法输出。与 Streamlit 前端一样每场面试逐题提交、逐题评分（各场面试并发），
+对同一组面试分别运行两种模式，输出每题平均评分耗时、每场面试的累计评分耗时与预估成本、升级率（按原因）、
+便宜模型直接采用的评分与主模型的抽样一致率，以及级联最终分数与主模型分数的一致率。
+用法: python bench_model_cascade.py [面试场数] [每场题数] [主模型延迟秒数] [便宜模型延迟秒数]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import settings, ABILITY_DIMENSIONS
+from mock_server import LatencyModel, ModelProfile, mock_services
+from services.evaluator import evaluate_answer
+from services.llm_service import llm_service
+from services.model_cascade import model_cascade
+
+STRONG_MODEL = "mock-strong"
+FAST_MODEL = "mock-fast"
+DIMENSIONS = list(ABILITY_DIMENSIONS)
+SENTENCES = [
+    "我会先做需求分析，把目标拆解成离线评测集、线上 A/B 和人工抽检三条线，按优先级逐步落地。",
+    "离线评测集覆盖高频场景与长尾问题，关注准确率、幻觉率，每次模型迭代都跑一遍回归。",
+    "上线前通过灰度 A/B 观察留存、满意度与转化，确认核心指标不回退再全量。",
+    "定期人工抽检幻觉案例，把坏例回流到训练数据，形成数据飞轮。",
+    "技术上用 RAG 降低幻觉，同时关注召回率、推理延迟和模型调用成本。",
+    "商业上按 ROI 排优先级，先做 MVP 验证商业模式，再考虑规模化增长和变现。",
+    "风险方面要提前做合规审查，关注数据隐私和内容安全，准备好兜底方案。",
+    "跨团队推进时我会明确里程碑和负责人，每周同步进度和风险。",
+    "这个问题我之前没有深入做过。",
+    "不太清楚。"
+]
+
+
+def build_interviews(count: int, per_interview: int) -> list:
+    rng = random.Random(7)
+    interviews = []
+    for n in range(count):
+        items = []
+        for i in range(per_interview):
+            dim = DIMENSIONS[i % len(DIMENSIONS)]
+            answer = "".join(rng.sample(SENTENCES, rng.randint(1, 7)))
+            items.append({
+                "question": {
+                    "id": f"q{i + 1:03d}",
+                    "text": f"请结合项目经历说明你如何评估大模型产品的效果（第 {n + 1} 场第 {i + 1} 题）",
+                    "dimension": dim,
+                    "reference_context": "评估体系应覆盖离线评测集、线上 A/B 与人工抽检，关注准确率、幻觉率与用户满意度。"
+                },
+                "answer": f"{answer}（候选人 {n}）"
+            })
+        interviews.append(items)
+    return interviews
+
+
+async def run_interview(items: list) -> tuple:
+    """逐题评分，返回 (每题耗时, 每题分数)"""
+    latencies, scores = [], []
+    for qa in items:
+        start = time.perf_counter()
+        result = await evaluate_answer(qa["question"], qa["answer"])
+        latencies.append(time.perf_counter() - start)
+        scores.append(result["score"] if result else None)
+    return latencies, scores
+
+
+async def run(interviews: list, fast_model: str) -> dict:
+    settings.llm_fast_model = fast_model
+    model_cascade.reset()
+    llm_service.metrics.reset()
+    results = await asyncio.gather(*[run_interview(items) for items in interviews])
+    latencies = [t for per_question, _ in results for t in per_question]
+    snapshot = llm_service.metrics.snapshot()
+    return {
+        "avg_latency": sum(latencies) / len(latencies),
+        "interview_elapsed": sum(latencies) / len(interviews),
+        "cost_per_interview": sum(site["estimated_cost"] for site in snapshot.values()) / len(interviews),
+        "calls": {name: site["calls"] for name, site in snapshot.items()},
+        "scores": [score for _, per_question in results for score in per_question],
+        "cascade": model_cascade.stats()
+    }
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    per_interview = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    strong_delay = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+    fast_delay = float(sys.argv[4]) if len(sys.argv) > 4 else 0.3
+
+    # 关闭响应缓存，使两种模式都真实调用上游
+    async with mock_services(
+        rag=False,
+        llm_cache=False,
+        model=STRONG_MODEL,
+        overrides={
+            "llm_fast_model": settings.llm_fast_model,
+            "llm_model_prices": {
+                STRONG_MODEL: {"input": 0.002, "output": 0.008},
+                FAST_MODEL: {"input": 0.0003, "output": 0.0006}
+            }
+        },
+        llm_latency=LatencyModel("fixed", (strong_delay,)),
+        model_profiles={
+            FAST_MODEL: ModelProfile(LatencyModel("fixed", (fast_delay,)), score_noise=1.0, malformed_rate=0.03)
+        }
+    ):
+        # 先单独跑一遍全部抽样对比（不因一致率低而停用），统计便宜模型直接采用的评分与主模型的一致率
+        audit_rate = settings.llm_cascade_audit_rate
+        min_agreement = settings.llm_cascade_min_agreement
+
+        interviews = build_interviews(count, per_interview)
+        print(
+            f"🚀 评分级联基准: {count} 场面试 × {per_interview} 题, "
+            f"主模型延迟 {strong_delay:.2f}s, 便宜模型延迟 {fast_delay:.2f}s"
+        )
+        strong = await run(interviews, "")
+        settings.llm_cascade_audit_rate, settings.llm_cascade_min_agreement = 1.0, 0.0
+        audited = await run(interviews, FAST_MODEL)
+        settings.llm_cascade_audit_rate, settings.llm_cascade_min_agreement = audit_rate, min_agreement
+        cascade = await run(interviews, FAST_MODEL)
+
+        tolerance = settings.llm_cascade_agreement_tolerance
+        pairs = [(a, b) for a, b in zip(strong["scores"], cascade["scores"]) if a is not None and b is not None]
+        agreement = sum(abs(a - b) <= tolerance for a, b in pairs) / len(pairs) if pairs else 0.0
+        stats = cascade["cascade"]
+
+        for label, r in (("全部主模型", strong), ("评分级联", cascade)):
+            print(
+                f"{label}: 每题评分 {r['avg_latency']:.2f}s, 每场累计 {r['interview_elapsed']:.1f}s, "
+                f"每场成本 {r['cost_per_interview']:.4f} 元, "
+                f"上游调用 {r['calls']}"
+            )
+        print(
+            f"🔀 升级率 {stats['escalation_rate']:.0%} ({stats['escalated']}/{stats['graded']}), "
+            f"按原因 {stats['escalations_by_reason']}"
+        )
+        print(
+            f"🎯 级联最终分数与主模型分数一致率（分差 ≤ {tolerance}）{agreement:.0%}, "
+            f"便宜模型直接采用的评分抽样一致率 {audited['cascade']['agreement_rate']:.0%} "
+            f"(阈值 {min_agreement:.0%})"
+        )
+        print(
+            f"📉 评分耗时降为 {cascade['avg_latency'] / strong['avg_latency']:.0%}, "
+            f"成本降为 {cascade['cost_per_interview'] / strong['cost_per_interview']:.0%}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
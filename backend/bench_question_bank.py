@@ -0,0 +1,83 @@
+"""
+结构化题库出题基准：对比实时生成与题库优先出题的 LLM 调用数与耗时
+
+在进程内启动 Mock 服务（见 mock_server.py），按实时生成、题库优先、题库优先 + 改写三种方式
+各跑一场多轮面试（前几轮的题目作为 asked_questions 传给后续轮次），输出每种方式的 LLM/RAG 请求数、
+耗时、题库题目占比与带期望回答要点的题目数，并检查题库题目跨轮不重复。
+用法: python bench_question_bank.py [每轮题目数] [轮数] [单次 LLM 延迟秒数]
+"""
+import asyncio
+import os
+import sys
+import time
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import settings
+from mock_server import BENCH_WEIGHTS, LatencyModel, MockServer, mock_services
+from services.question_bank import question_bank
+from services.question_generator import generate_questions
+
+GAPS = ["缺乏 B 端商业化经验", "对模型评估体系理解较浅"]
+
+
+async def run(server: MockServer, count: int, rounds: int, bank: bool, rephrase: bool, gaps) -> dict:
+    settings.question_bank_enabled = bank
+    settings.question_bank_rephrase = rephrase
+    server.reset_stats()
+    asked, bank_ids, questions = [], [], []
+    start = time.perf_counter()
+    for current_round in range(1, rounds + 1):
+        round_questions = await generate_questions(
+            BENCH_WEIGHTS, count, gaps, "初创公司", current_round, rounds, asked
+        )
+        asked.extend(q["text"] for q in round_questions)
+        bank_ids.extend(q["bank_id"] for q in round_questions if "bank_id" in q)
+        questions.extend(round_questions)
+    return {
+        "elapsed": time.perf_counter() - start,
+        "questions": len(questions),
+        "banked": len(bank_ids),
+        "repeated": len(bank_ids) - len(set(bank_ids)),
+        "with_points": sum("期望回答要点" in q.get("reference_context", "") for q in questions),
+        "llm_requests": server.stats["llm_requests"],
+        "rag_requests": server.stats["rag_requests"]
+    }
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    delay = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+
+    # Mock 合成的题目句式固定，彼此都会被判为近似重复，基准中关闭查重（题库取题仍按 asked_questions 跳过已出题目）
+    async with mock_services(
+        llm_latency=LatencyModel("fixed", (delay,)),
+        rag_latency=LatencyModel("fixed", (0.05,)),
+        overrides={
+            "question_dedup_enabled": False,
+            "rag_cache_enabled": False,
+            "question_pool_enabled": False,
+            "question_bank_enabled": False,
+            "question_bank_rephrase": False
+        }
+    ) as server:
+        print(f"🚀 结构化题库出题基准: {rounds} 轮 × {count} 道题, 单次 LLM 延迟 {delay:.2f}s, 题库 {question_bank.stats()['total']} 道题")
+        for gaps, scene in ((None, "无简历差距"), (GAPS, "有简历差距")):
+            print(f"\n📋 {scene}")
+            for label, bank, rephrase in (
+                ("实时生成", False, False),
+                ("题库优先", True, False),
+                ("题库优先 + 改写", True, True)
+            ):
+                r = await run(server, count, rounds, bank, rephrase, gaps)
+                print(
+                    f"{label}: {r['questions']} 道题 (题库 {r['banked']}, 跨轮重复 {r['repeated']}, "
+                    f"带期望要点 {r['with_points']}), 耗时 {r['elapsed']:.2f}s, "
+                    f"LLM 请求 {r['llm_requests']}, RAG 请求 {r['rag_requests']}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+"""
+题目近似重复索引基准：百万级题目下的查询延迟与改写题召回率
+
+用知识库文本训练的字符级马尔可夫链生成 N 道同领域的合成题目建索引（与真实题库一样共享大量领域词汇），
+再把题库中的原题加入索引，并用其改写版本（调换分句、增删套话、删字）查询：
+输出建索引耗时、查询延迟（含签名计算 / 仅索引查找）的 p50/p99、平均候选数，以及改写题召回率与无关题误报率。
+建 100 万条约需 10 分钟。
+用法: python bench_question_dedup.py [题目数] [查询数]
+"""
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.question_dedup import MinHashIndex
+
+KNOWLEDGE_DIR = Path(__file__).resolve().parent.parent / "knowledge_base"
+PREFIXES = ["", "请", "请谈谈", "请结合你的经验说明", "面试官想了解：", "你能否说说"]
+SUFFIXES = ["", "？", "请举例说明。", "谈谈你的思路。", "你会怎么做？"]
+
+
+def load_corpus() -> tuple:
+    """知识库中的字符转移表（用于生成合成题）与题库原题（用于改写查询）"""
+    transitions, questions = {}, []
+    for path in KNOWLEDGE_DIR.rglob("*.md"):
+        text = path.read_text(encoding="utf-8")
+        for line in text.splitlines():
+            line = re.sub(r"[#>*`|\-]", "", line).strip()
+            if "题目" in line and "：" in line:
+                q = line.split("：", 1)[1].strip()
+                if len(q) >= 10:
+                    questions.append(q)
+            for a, b in zip(line, line[1:]):
+                transitions.setdefault(a, []).append(b)
+    return transitions, questions
+
+
+def synth_question(rng: random.Random, transitions: dict) -> str:
+    starts = list(transitions)
+    chars = [rng.choice(starts)]
+    for _ in range(rng.randint(18, 36)):
+        chars.append(rng.choice(transitions.get(chars[-1]) or starts))
+    return rng.choice(PREFIXES) + "".join(chars) + rng.choice(SUFFIXES)
+
+
+def paraphrase(rng: random.Random, text: str) -> str:
+    clauses = [c for c in re.split(r"[，。；？！,;?!]", text) if c]
+    if len(clauses) > 1:
+        rng.shuffle(clauses)
+    out = "，".join(clauses)
+    if len(out) > 12:
+        # 随机删掉两个字，模拟措辞微调
+        for _ in range(2):
+            i = rng.randrange(len(out))
+            out = out[:i] + out[i + 1:]
+    return rng.choice(PREFIXES) + out + rng.choice(SUFFIXES)
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    rng = random.Random(42)
+    transitions, originals = load_corpus()
+    if not originals:
+        originals = [synth_question(rng, transitions) for _ in range(50)]
+
+    index = MinHashIndex()
+    print(f"🚀 近似重复索引基准: {size} 道合成题, 原题 {len(originals)} 道, 查询 {queries} 次")
+    start = time.perf_counter()
+    for i in range(size):
+        index.add(("synthetic", i), synth_question(rng, transitions))
+        if (i + 1) % 100_000 == 0:
+            print(f"  已建 {i + 1} 条, {time.perf_counter() - start:.0f}s")
+    for i, q in enumerate(originals):
+        index.add(("original", i), q)
+    print(f"🏗️  建索引 {len(index)} 条, 耗时 {time.perf_counter() - start:.1f}s")
+
+    latencies, lookups, candidates = [], [], []
+    hits = false_positives = 0
+    for i in range(queries):
+        probe_original = i % 2 == 0
+        target = rng.randrange(len(originals))
+        text = paraphrase(rng, originals[target]) if probe_original else synth_question(rng, transitions) + "并给出衡量指标"
+        t = time.perf_counter()
+        signature = index.signature(text)
+        t_sig = time.perf_counter()
+        matches = index.query_signature(signature)
+        end = time.perf_counter()
+        latencies.append((end - t) * 1000)
+        lookups.append((end - t_sig) * 1000)
+        candidates.append(len(index._candidates(index._band_keys(signature))))
+        if probe_original:
+            hits += ("original", target) in {key for key, _ in matches}
+        else:
+            false_positives += any(key[0] == "original" for key, _ in matches)
+
+    probes = (queries + 1) // 2
+    print(
+        f"⏱️  查询延迟（含签名）p50 {percentile(latencies, 0.5):.3f}ms / p99 {percentile(latencies, 0.99):.3f}ms, "
+        f"其中索引查找 p50 {percentile(lookups, 0.5):.3f}ms / p99 {percentile(lookups, 0.99):.3f}ms, "
+        f"平均候选 {statistics.mean(candidates):.1f} 条"
+    )
+    print(f"🎯 改写题召回 {hits}/{probes} ({hits / probes:.0%}), 无关题误判为原题 {false_positives}/{queries - probes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+出题并发基准：验证一轮题目的生成耗时接近单次调用延迟，而非题数 × 单次延迟
+
+在进程内启动 Mock 服务（见 mock_server.py），分别以逐题串行（并发上限 1）、逐题并发（默认并发上限）
+和每维度单次调用三种方式调用 generate_questions，输出各自的耗时、上游 LLM/RAG 请求数与峰值并发，
+并检查题目 ID 与难度顺序一致。
+用法: python bench_question_generation.py [题目数] [单次 LLM 延迟秒数]
+"""
+import asyncio
+import os
+import sys
+import time
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import settings
+from mock_server import BENCH_WEIGHTS, LatencyModel, MockServer, mock_services
+from services.question_generator import generate_questions
+
+
+async def run(server: MockServer, count: int, concurrency: int, single_call: bool) -> dict:
+    settings.question_gen_concurrency = concurrency
+    settings.question_gen_single_call = single_call
+    server.reset_stats()
+    start = time.perf_counter()
+    questions = await generate_questions(BENCH_WEIGHTS, count)
+    return {
+        "elapsed": time.perf_counter() - start,
+        "questions": questions,
+        "llm_requests": server.stats["llm_requests"],
+        "rag_requests": server.stats["rag_requests"],
+        "peak": server.stats["peak_in_flight"]
+    }
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+
+    default_concurrency = settings.question_gen_concurrency
+    default_single_call = settings.question_gen_single_call
+    # Mock 合成的题目句式固定，彼此都会被判为近似重复，基准中关闭查重；
+    # 各模式都真实检索，避免先跑的模式替后面的模式预热检索缓存
+    async with mock_services(
+        llm_latency=LatencyModel("fixed", (delay,)),
+        rag_latency=LatencyModel("fixed", (0.05,)),
+        overrides={
+            "question_dedup_enabled": False,
+            "rag_cache_enabled": False,
+            "question_gen_concurrency": default_concurrency,
+            "question_gen_single_call": default_single_call
+        }
+    ) as server:
+        print(f"🚀 出题并发基准: {count} 道题, 单次 LLM 延迟 {delay:.2f}s")
+        sequential = await run(server, count, 1, single_call=False)
+        concurrent = await run(server, count, default_concurrency, single_call=False)
+        single_call = await run(server, count, default_concurrency, single_call=True)
+
+    for label, r in (
+        ("逐题串行 (并发 1)", sequential),
+        (f"逐题并发 (并发 {default_concurrency})", concurrent),
+        ("每维度单次调用", single_call)
+    ):
+        print(
+            f"{label}: {len(r['questions'])} 道题, 耗时 {r['elapsed']:.2f}s, "
+            f"LLM 请求 {r['llm_requests']}, RAG 请求 {r['rag_requests']}, 峰值并发 {r['peak']}"
+        )
+
+    layout = lambda r: [(q["id"], q["dimension"], q["difficulty"]) for q in r["questions"]]
+    print(f"🔢 题目 ID / 难度顺序一致: {layout(sequential) == layout(concurrent) == layout(single_call)}")
+    print(f"⏱️  并发耗时约为单次延迟的 {concurrent['elapsed'] / delay:.1f} 倍 (串行 {sequential['elapsed'] / delay:.1f} 倍)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
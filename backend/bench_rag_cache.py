@@ -0,0 +1,82 @@
+"""
+检索缓存基准：多场面试连续出题时，检索结果缓存能省掉多少 RAGFlow 请求
+
+在进程内启动 Mock 服务（见 mock_server.py），按不同的能力权重与公司规模连续生成若干场面试的题目，
+分别在关闭 / 开启检索缓存时运行，输出 RAGFlow 请求数、缓存命中率与出题总耗时；
+最后失效缓存并再出一场题，确认失效后重新检索。
+用法: python bench_rag_cache.py [面试场数] [每场题数] [RAG 延迟秒数]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import settings, ABILITY_DIMENSIONS
+from mock_server import LatencyModel, MockServer, mock_services
+from models.schemas import CompanyScale
+from services.question_generator import generate_questions
+from services.rag_service import rag_service
+
+SCALES = [scale.value for scale in CompanyScale]
+
+
+def interview_plans(count: int) -> list:
+    rng = random.Random(5)
+    plans = []
+    for _ in range(count):
+        weights = {dim: rng.random() for dim in ABILITY_DIMENSIONS}
+        total = sum(weights.values())
+        plans.append(({dim: w / total for dim, w in weights.items()}, rng.choice(SCALES)))
+    return plans
+
+
+async def run(server: MockServer, plans: list, per_interview: int, cache: bool) -> dict:
+    settings.rag_cache_enabled = cache
+    rag_service.invalidate_cache()
+    server.reset_stats()
+    start = time.perf_counter()
+    for weights, scale in plans:
+        await generate_questions(weights, per_interview, company_scale=scale)
+    return {
+        "elapsed": time.perf_counter() - start,
+        "rag_requests": server.stats["rag_requests"],
+        "stats": rag_service.cache.stats()
+    }
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    per_interview = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    delay = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+
+    # Mock 合成的题目句式固定，彼此都会被判为近似重复，基准中关闭查重
+    async with mock_services(
+        llm_cache=False,
+        overrides={"question_dedup_enabled": False, "rag_cache_enabled": settings.rag_cache_enabled},
+        llm_latency=LatencyModel("fixed", (0.05,)),
+        rag_latency=LatencyModel("fixed", (delay,))
+    ) as server:
+        plans = interview_plans(count)
+        print(f"🚀 检索缓存基准: {count} 场面试 × {per_interview} 题, RAG 延迟 {delay:.2f}s")
+        uncached = await run(server, plans, per_interview, cache=False)
+        cached = await run(server, plans, per_interview, cache=True)
+        for label, r in (("关闭缓存", uncached), ("开启缓存", cached)):
+            print(f"{label}: RAGFlow 请求 {r['rag_requests']}, 出题总耗时 {r['elapsed']:.2f}s")
+        print(
+            f"🎯 命中率 {cached['stats']['hit_rate']:.0%} "
+            f"({cached['stats']['hits']}/{cached['stats']['hits'] + cached['stats']['misses']}), "
+            f"缓存条目 {cached['stats']['entries']}"
+        )
+
+        server.reset_stats()
+        removed = rag_service.invalidate_cache(rag_service.dataset_id)
+        await generate_questions(plans[0][0], per_interview, company_scale=plans[0][1])
+        print(f"🧹 失效 {removed} 条后再出一场题: RAGFlow 请求 {server.stats['rag_requests']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+RAGFlow 客户端基准：对比每次检索新建 httpx.AsyncClient 与复用 keep-alive 连接池的单次检索延迟
+
+在进程内启动 Mock 服务（见 mock_server.py），以不同并发数发起互不相同的检索（关闭相同请求合并），
+分别用"每次新建客户端"（改造前的做法）与 rag_service 的连接池客户端，输出单次检索延迟 p50/p99、
+总耗时与 Mock 服务收到的 TCP 连接数；最后在 Mock 按比例返回 503 时统计重试后的检索成功率。
+用法: python bench_rag_client.py [每档检索数] [RAG 延迟秒数] [503 比例]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+import httpx
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import settings
+from mock_server import LatencyModel, MockServer, mock_services
+from services.rag_service import rag_service
+
+CONCURRENCY_LEVELS = [1, 16, 64]
+
+
+async def retrieve_fresh_client(query: str) -> list:
+    """改造前的做法：每次检索新建并关闭一个客户端"""
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        response = await client.post(
+            f"{rag_service.base_url}/api/v1/retrieval/{rag_service.dataset_id}",
+            json={"question": query, "top_k": 3, "similarity_threshold": 0.5},
+            headers={"Authorization": f"Bearer {rag_service.api_key}"}
+        )
+        return response.json().get("data", {}).get("chunks", [])
+
+
+async def retrieve_pooled(query: str) -> list:
+    return await rag_service.retrieve(query, top_k=3)
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run(server: MockServer, retrieve, n: int, concurrency: int) -> dict:
+    server.reset_stats()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, found = [], 0
+
+    async def one(i: int):
+        nonlocal found
+        async with semaphore:
+            start = time.perf_counter()
+            chunks = await retrieve(f"AI产品经理面试题 RAG 召回率 第 {i} 次 {random.random()}")
+            latencies.append(time.perf_counter() - start)
+            found += bool(chunks)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(n)])
+    return {
+        "elapsed": time.perf_counter() - start,
+        "p50": percentile(latencies, 0.5) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+        "connections": server.stats["connections"],
+        "success": found / n
+    }
+
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    error_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+
+    async with mock_services(
+        llm=False,
+        rag_latency=LatencyModel("fixed", (delay,)),
+        overrides={"rag_singleflight_enabled": False, "ragflow_max_retries": settings.ragflow_max_retries}
+    ) as server:
+        print(f"🚀 RAGFlow 客户端基准: 每档 {n} 次检索, RAG 延迟 {delay * 1000:.0f}ms")
+        for concurrency in CONCURRENCY_LEVELS:
+            for label, retrieve in (("每次新建客户端", retrieve_fresh_client), ("连接池客户端", retrieve_pooled)):
+                r = await run(server, retrieve, n, concurrency)
+                print(
+                    f"并发 {concurrency:>2} {label}: p50 {r['p50']:.1f}ms / p99 {r['p99']:.1f}ms, "
+                    f"总耗时 {r['elapsed']:.2f}s, TCP 连接 {r['connections']}"
+                )
+
+        server.rag_error_rate = error_rate
+        for retries in (0, settings.ragflow_max_retries):
+            settings.ragflow_max_retries = retries
+            r = await run(server, retrieve_pooled, n, 16)
+            print(
+                f"🔁 {error_rate:.0%} 请求返回 503, 最多重试 {retries} 次: 检索成功率 {r['success']:.1%}, "
+                f"p99 {r['p99']:.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
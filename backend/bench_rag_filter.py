@@ -0,0 +1,89 @@
+"""
+结构化检索过滤基准：出题检索按维度 / 难度标签过滤前后的精度与延迟
+
+用出题检索的 query（维度 × 难度 × 公司规模，top_k=3）分别不带过滤与带 {"dimension", "difficulty": [难度, None]}
+过滤检索，统计前 3 个片段中属于目标维度的比例（维度精度）、难度标签与目标难度冲突的片段比例，以及延迟 p50/p99。
+本地后端直接检索；RAGFlow 后端在进程内启动 Mock 服务（见 mock_server.py），多取 rag_filter_overfetch 倍后过滤。
+用法: python bench_rag_filter.py [每个 query 重复次数]
+"""
+import asyncio
+import os
+import sys
+import time
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import settings, ABILITY_DIMENSIONS
+from mock_server import LatencyModel, mock_services
+from models.schemas import CompanyScale
+from services.local_retriever import local_retriever, tag_remote_chunk
+from services.rag_service import rag_service
+
+DIFFICULTIES = ["基础", "进阶", "高级"]
+SCALES = [scale.value for scale in CompanyScale]
+
+
+def generation_queries() -> list:
+    return [
+        (dim, difficulty, f"AI产品经理面试题 {info['name']} {difficulty} {scale}")
+        for dim, info in ABILITY_DIMENSIONS.items()
+        for difficulty in DIFFICULTIES
+        for scale in SCALES
+    ]
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def measure(queries: list, repeat: int, filtered: bool) -> dict:
+    latencies, returned, on_dimension, conflicting = [], 0, 0, 0
+    for _ in range(repeat):
+        for dim, difficulty, query in queries:
+            filters = {"dimension": dim, "difficulty": [difficulty, None]} if filtered else None
+            start = time.perf_counter()
+            chunks = await rag_service.retrieve(query, top_k=3, filters=filters)
+            latencies.append(time.perf_counter() - start)
+            for chunk in chunks:
+                tags = chunk if "doc_type" in chunk else tag_remote_chunk(chunk)
+                returned += 1
+                on_dimension += tags["dimension"] == dim
+                conflicting += tags["difficulty"] not in (difficulty, None)
+    return {
+        "p50": percentile(latencies, 0.5) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+        "chunks": returned / (len(queries) * repeat),
+        "precision": on_dimension / returned if returned else 0.0,
+        "conflicting": conflicting / returned if returned else 0.0
+    }
+
+
+def report(label: str, r: dict):
+    print(
+        f"{label}: 维度精度 {r['precision']:.0%}, 难度冲突 {r['conflicting']:.0%}, "
+        f"平均片段数 {r['chunks']:.2f}, p50 {r['p50']:.2f}ms, p99 {r['p99']:.2f}ms"
+    )
+
+
+async def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    queries = generation_queries()
+    settings.rag_cache_enabled = False
+
+    settings.rag_backend = "local"
+    local_retriever.ensure_index()
+    print(f"🚀 检索过滤基准: {len(queries)} 个出题 query × {repeat} 次, top_k=3")
+    print("\n📚 本地后端")
+    report("不过滤", await measure(queries, repeat, filtered=False))
+    report("按维度 / 难度过滤", await measure(queries, repeat, filtered=True))
+
+    async with mock_services(llm=False, rag_latency=LatencyModel("fixed", (0.0,))):
+        print(f"\n🌐 RAGFlow 后端 (Mock, 多取 {settings.rag_filter_overfetch} 倍)")
+        report("不过滤", await measure(queries, repeat, filtered=False))
+        report("按维度 / 难度过滤", await measure(queries, repeat, filtered=True))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+"""
+多次采样评分基准：对比单次评分、固定 5 次采样与分波次提前停止的采样数、误差和分档准确率
+
+在进程内启动 Mock 服务（见 mock_server.py），评分响应在 Mock 的合成分数（视为真实分数）上叠加
+每次请求独立的正态抖动。对同一组回答分别以三种方式评分，输出平均采样数、平均分与真实分数的 RMSE、
+分档（🔴 <5 / 🟡 5-7 / 🟢 ≥7）与真实分档一致的比例、耗时，以及提前停止模式下置信度与分档准确率的对照。
+用法: python bench_self_consistency.py [回答数] [评分抖动标准差] [单次 LLM 延迟秒数]
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import settings, ABILITY_DIMENSIONS
+from mock_server import LatencyModel, ModelProfile, mock_services, synthesize_reply
+from services.evaluator import EVALUATE_SYSTEM_PROMPT, build_evaluate_prompt, evaluate_answer
+from services.llm_service import llm_service
+from services.self_consistency import self_consistency_stats
+
+MODEL = "mock-grader"
+DIMENSIONS = list(ABILITY_DIMENSIONS)
+
+
+def band(score: float) -> int:
+    return sum(score >= line for line in settings.llm_cascade_borderline_scores)
+
+
+def build_items(n: int) -> list:
+    rng = random.Random(11)
+    return [
+        {
+            "question": {
+                "id": f"q{i + 1:03d}",
+                "text": f"请说明你如何评估大模型产品的效果（第 {i + 1} 题）",
+                "dimension": DIMENSIONS[i % len(DIMENSIONS)],
+                "reference_context": "评估体系应覆盖离线评测集、线上 A/B 与人工抽检。"
+            },
+            "answer": f"我会先搭建离线评测集，再做灰度 A/B 与人工抽检。（样本 {rng.random():.6f}）"
+        }
+        for i in range(n)
+    ]
+
+
+def true_score(qa: dict) -> float:
+    reply = synthesize_reply(EVALUATE_SYSTEM_PROMPT, build_evaluate_prompt(qa["question"], qa["answer"]))
+    return json.loads(reply)["score"]
+
+
+async def run(items: list, enabled: bool, waves: list = None) -> dict:
+    settings.evaluate_self_consistency_enabled = enabled
+    if waves:
+        settings.evaluate_sc_waves = waves
+    self_consistency_stats.reset()
+    llm_service.metrics.reset()
+    start = time.perf_counter()
+    results = await asyncio.gather(*[evaluate_answer(qa["question"], qa["answer"]) for qa in items])
+    elapsed = time.perf_counter() - start
+    truths = [true_score(qa) for qa in items]
+    pairs = [(r, t) for r, t in zip(results, truths) if r]
+    calls = sum(site["calls"] for site in llm_service.metrics.snapshot().values())
+    return {
+        "elapsed": elapsed,
+        "avg_samples": calls / len(items),
+        "rmse": math.sqrt(sum((r["score"] - t) ** 2 for r, t in pairs) / len(pairs)),
+        "band_accuracy": sum(band(r["score"]) == band(t) for r, t in pairs) / len(pairs),
+        "pairs": pairs
+    }
+
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    noise = float(sys.argv[2]) if len(sys.argv) > 2 else 0.8
+    delay = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+
+    # 关闭响应缓存，使单次评分模式也真实采样
+    async with mock_services(
+        rag=False,
+        llm_cache=False,
+        model=MODEL,
+        overrides={
+            "llm_fast_model": "",
+            "llm_max_in_flight": 64,
+            "evaluate_self_consistency_enabled": settings.evaluate_self_consistency_enabled,
+            "evaluate_sc_waves": settings.evaluate_sc_waves
+        },
+        llm_latency=LatencyModel("fixed", (delay,)),
+        model_profiles={MODEL: ModelProfile(sample_noise=noise, rng=random.Random(3))}
+    ):
+        waves = settings.evaluate_sc_waves
+
+        items = build_items(n)
+        print(f"🚀 多次采样评分基准: {n} 个回答, 评分抖动 σ={noise}, 单次 LLM 延迟 {delay:.2f}s, 采样波次 {waves}")
+        single = await run(items, enabled=False)
+        fixed = await run(items, enabled=True, waves=[5])
+        adaptive = await run(items, enabled=True, waves=waves)
+
+        for label, r in (("单次评分", single), ("固定 5 次采样", fixed), ("提前停止", adaptive)):
+            print(
+                f"{label}: 平均采样 {r['avg_samples']:.2f} 次, RMSE {r['rmse']:.3f}, "
+                f"分档准确率 {r['band_accuracy']:.1%}, 耗时 {r['elapsed']:.2f}s"
+            )
+        stats = self_consistency_stats.stats()
+        print(f"📐 提前停止: 达到停止条件 {stats['settled_rate']:.0%}, 估计的单次评分标准差 {stats['score_std']}")
+        for low, high in ((0.0, 0.7), (0.7, 0.9), (0.9, 1.01)):
+            bucket = [(r, t) for r, t in adaptive["pairs"] if low <= r["confidence"] < high]
+            if bucket:
+                accuracy = sum(band(r["score"]) == band(t) for r, t in bucket) / len(bucket)
+                print(f"   置信度 [{low:.1f}, {min(high, 1.0):.1f}): {len(bucket)} 题, 分档准确率 {accuracy:.0%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,156 @@
+"""
+离线端到端吞吐基准：/api/parse-jd、/api/generate-questions、/api/evaluate-answer
+
+在进程内启动 Mock 服务（OpenAI 兼容 + RAGFlow 兼容，延迟分布可配置），
+将 llm_service / rag_service 指向它，再通过 ASGI 直接调用 FastAPI 应用，
+按给定并发度压测各接口并输出吞吐、延迟分位数与上游调用情况。全程不访问外网、不消耗真实 token。
+
+用法:
+    python bench_throughput.py [--requests 20] [--concurrency 8]
+        [--llm-latency lognormal:0.8,0.5] [--rag-latency fixed:0.05]
+        [--endpoints parse-jd,generate-questions,evaluate-answer] [--cassette cassette.jsonl] [--seed 42]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from main import app
+from mock_server import BENCH_WEIGHTS, LatencyModel, MockServer, mock_services
+
+JD_TEXT = (
+    "岗位：AI 产品经理（大模型方向）。职责：负责基于大模型的智能客服与知识库产品规划，"
+    "设计 RAG 检索增强方案并推动落地；建立模型效果评估体系与数据飞轮；与算法、工程团队协作推进迭代。"
+    "要求：3 年以上产品经验，理解 Prompt 工程、向量检索与 Agent 基本原理，具备商业化与风险意识。"
+)
+
+RESUME_TEXT = (
+    "5 年 B 端 SaaS 产品经验，主导过客服机器人从 0 到 1，熟悉意图识别与知识库运营；"
+    "近一年负责大模型问答试点，搭建了离线评测集，关注幻觉与数据安全问题。"
+)
+
+def build_payloads() -> Dict[str, Callable[[int], Dict[str, Any]]]:
+    """各接口的请求体工厂；请求内容随序号变化，避免被缓存和合并掩盖真实上游负载"""
+    return {
+        "parse-jd": lambda i: {
+            "jd_text": f"{JD_TEXT}（编号 {i}）",
+            "resume_text": RESUME_TEXT
+        },
+        "generate-questions": lambda i: {
+            "ability_weights": BENCH_WEIGHTS,
+            "count": 5,
+            "resume_gap_analysis": [f"缺乏商业化经验（样本 {i}）"],
+            "company_scale": "中型公司"
+        },
+        "evaluate-answer": lambda i: {
+            "question": {"id": "q001", "text": "请解释 RAG 的原理及适用场景", "dimension": "ai_tech_understanding"},
+            "answer": f"RAG 通过检索外部知识增强生成，可以降低幻觉并让答案可溯源。（候选人 {i}）"
+        }
+    }
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_endpoint(
+    client: httpx.AsyncClient,
+    mock: MockServer,
+    name: str,
+    payload: Callable[[int], Dict[str, Any]],
+    total: int,
+    concurrency: int
+) -> Dict[str, Any]:
+    """以固定并发度发送 total 个请求"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failures = 0
+
+    async def one(i: int):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(f"/api/{name}", json=payload(i))
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200 or not response.json().get("success"):
+                failures += 1
+
+    mock.reset_stats()
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(total)])
+    elapsed = time.perf_counter() - start
+    return {
+        "endpoint": name,
+        "requests": total,
+        "failures": failures,
+        "elapsed": elapsed,
+        "throughput": total / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+        "llm_requests": mock.stats["llm_requests"],
+        "rag_requests": mock.stats["rag_requests"],
+        "peak_in_flight": mock.stats["peak_in_flight"]
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="离线端到端吞吐基准")
+    parser.add_argument("--requests", type=int, default=20, help="每个接口的请求数")
+    parser.add_argument("--concurrency", type=int, default=8, help="客户端并发度")
+    parser.add_argument("--llm-latency", default="lognormal:0.8,0.5")
+    parser.add_argument("--rag-latency", default="fixed:0.05")
+    parser.add_argument("--endpoints", default="parse-jd,generate-questions,evaluate-answer")
+    parser.add_argument("--cassette", default=None, help="Mock 服务优先回放的 cassette 文件")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # 指向 Mock 服务；关闭响应缓存以测量真实上游负载。Mock 合成的题目句式固定，彼此都会被判为近似重复，压测中关闭查重
+    async with mock_services(
+        llm_cache=False,
+        overrides={"question_dedup_enabled": False},
+        llm_latency=LatencyModel.parse(args.llm_latency, rng),
+        rag_latency=LatencyModel.parse(args.rag_latency, rng),
+        cassette_path=args.cassette
+    ) as mock:
+        payloads = build_payloads()
+        names = [n.strip() for n in args.endpoints.split(",") if n.strip()]
+        unknown = [n for n in names if n not in payloads]
+        if unknown:
+            raise SystemExit(f"未知接口: {', '.join(unknown)}（可选: {', '.join(payloads)}）")
+
+        print(f"🚀 离线吞吐基准: 每接口 {args.requests} 个请求, 并发 {args.concurrency}")
+        print(f"   LLM 延迟 {mock.llm_latency}, RAG 延迟 {mock.rag_latency}, 知识库段落 {len(mock.knowledge.paragraphs)}")
+
+        results = []
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None
+        ) as client:
+            for name in names:
+                results.append(await run_endpoint(
+                    client, mock, name, payloads[name], args.requests, args.concurrency
+                ))
+
+        print()
+        print(f"{'接口':<22}{'成功':>8}{'耗时s':>9}{'req/s':>9}{'p50 s':>8}{'p95 s':>8}{'LLM':>6}{'RAG':>6}{'峰值':>6}")
+        for r in results:
+            print(
+                f"{r['endpoint']:<22}{r['requests'] - r['failures']:>5}/{r['requests']:<3}"
+                f"{r['elapsed']:>8.2f}{r['throughput']:>9.2f}{r['p50']:>8.2f}{r['p95']:>8.2f}"
+                f"{r['llm_requests']:>6}{r['rag_requests']:>6}{r['peak_in_flight']:>6}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,7 +4,7 @@ AIPM-Scan 配置管理
 import os
 from pathlib import Path
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Optional, List, Dict
 
 # 获取当前文件所在目录的 .env 路径
 BASE_DIR = Path(__file__).resolve().parent
@@ -41,12 +41,183 @@ class Settings(BaseSettings):
     llm_api_key: str = ""
     llm_base_url: str = "https://api.deepseek.com"
     llm_model: str = "deepseek-chat"
+    llm_timeout: float = 60.0
+    llm_max_connections: int = 20
+    llm_max_keepalive_connections: int = 10
+    
+    # 附加 LLM 端点（JSON 列表，如 [{"name": "mirror", "base_url": "...", "api_key": "...", "model": "..."}]），
+    # 与主端点一起按延迟/错误率路由；对冲请求在主请求超过其 p95 时向次优端点发出副本
+    llm_endpoints: List[Dict[str, str]] = []
+    llm_hedge_enabled: bool = False
+    llm_hedge_min_delay: float = 1.0
+    llm_hedge_default_delay: float = 8.0
+    
+    # LLM 并发调度配置（requests/tokens per minute 为 0 表示不限流）
+    llm_max_in_flight: int = 16
+    llm_min_in_flight: int = 1
+    llm_requests_per_minute: float = 0
+    llm_tokens_per_minute: float = 0
+    llm_latency_target_seconds: float = 20.0
+    llm_max_retries: int = 3
+    llm_retry_budget_ratio: float = 0.2
+    llm_backoff_base: float = 0.5
+    llm_backoff_max: float = 20.0
+    
+    # LLM 单价（每 1K token，单位：元），用于按调用点估算成本；
+    # llm_model_prices 可按模型覆盖（{"模型名": {"input": 0.001, "output": 0.002}}）
+    llm_price_input_per_1k: float = 0.002
+    llm_price_output_per_1k: float = 0.008
+    llm_model_prices: Dict[str, Dict[str, float]] = {}
+    
+    # 模型分级：llm_call_site_tiers 中标为 fast 的调用点使用便宜模型 llm_fast_model（为空时全部使用 llm_model）
+    llm_fast_model: str = ""
+    llm_call_site_tiers: Dict[str, str] = {
+        "profile_parser": "fast",
+        "question_generator": "fast",
+        "question_generator_multi": "fast",
+        "evaluator_fast": "fast",
+        "evaluator_batch_fast": "fast",
+        "question_bank_rephrase": "fast"
+    }
+    
+    # 评分级联（需配置 llm_fast_model）：便宜模型先评分，分数距任一分档线（与报告的 🔴/🟡/🟢 分档一致）
+    # 不超过 borderline_margin、输出不合法或与启发式分数相差超过 heuristic_tolerance 时升级到主模型重评。
+    # 未升级的题目按 audit_rate 抽样同时请主模型评分，分差不超过 agreement_tolerance 计为一致；
+    # 抽样数达到 audit_min_samples 且一致率低于 min_agreement 时停用级联，全部直接用主模型
+    llm_cascade_enabled: bool = True
+    llm_cascade_borderline_scores: List[float] = [5.0, 7.0]
+    llm_cascade_borderline_margin: float = 0.5
+    llm_cascade_heuristic_tolerance: float = 4.0
+    llm_cascade_audit_rate: float = 0.05
+    llm_cascade_agreement_tolerance: float = 1.0
+    llm_cascade_min_agreement: float = 0.85
+    llm_cascade_audit_min_samples: int = 20
+    
+    # LLM 响应缓存配置
+    llm_cache_enabled: bool = True
+    llm_cache_path: str = str(BASE_DIR / "llm_cache.db")
+    llm_cache_memory_size: int = 256
+    llm_cache_ttl_seconds: int = 7 * 24 * 3600
+    llm_cache_max_entries: int = 10000
+    
+    # 相同并发请求合并（LLM 仅对开启 use_cache 的调用生效）
+    llm_singleflight_enabled: bool = True
+    rag_singleflight_enabled: bool = True
+    
+    # 检索结果缓存（内存 TTL + LRU），知识库重新索引后调用 POST /api/rag-cache/invalidate 失效
+    rag_cache_enabled: bool = True
+    rag_cache_ttl_seconds: float = 3600.0
+    rag_cache_max_entries: int = 512
+    
+    # Prompt 压缩（各调用点的 token 预算，0 表示不限制）
+    prompt_compaction_enabled: bool = True
+    prompt_budget_question_context: int = 800
+    prompt_budget_evaluate_context: int = 600
+    prompt_budget_jd: int = 1500
+    prompt_budget_resume: int = 1500
+    
+    # 批量评分：多道题打包进一次 LLM 调用，按输入 token 预算与题数上限切分批次
+    evaluate_batch_enabled: bool = True
+    evaluate_batch_token_budget: int = 6000
+    evaluate_batch_max_items: int = 10
+    evaluate_batch_output_tokens_per_item: int = 500
+    
+    # 多题评估时同时进行的 LLM 调用数上限
+    evaluate_concurrency: int = 5
+    
+    # 多次采样评分（单题评估）：按 evaluate_sc_waves 分波次并发采样，平均分的标准误低于 se_target
+    # 或所在分档的置信度达到 confidence_target 时停止；prior_std 为首批题目前假定的单次评分标准差
+    evaluate_self_consistency_enabled: bool = False
+    evaluate_sc_waves: List[int] = [1, 1, 2]
+    evaluate_sc_temperature: float = 0.3
+    evaluate_sc_se_target: float = 0.4
+    evaluate_sc_confidence_target: float = 0.9
+    evaluate_sc_prior_std: float = 0.6
+    
+    # 出题时同一轮内同时进行的单题生成（检索 + LLM）数上限
+    question_gen_concurrency: int = 10
+    # 每个维度的题目用一次结构化 JSON 调用生成（解析失败时逐题回退）；默认关闭，保持逐题生成
+    question_gen_single_call: bool = False
+    # 出题检索参考资料的时间预算（秒）：超时则不带参考资料出题，不让检索拖慢整轮出题
+    question_gen_rag_budget_seconds: float = 5.0
+    
+    # 预生成题库：后台线程把各（维度, 难度, 公司规模）的未用题目补到 target，低于 low_water 时触发；
+    # 出题时优先取题库，有简历差距分析时每个维度末尾 live_per_dimension 道题仍实时生成
+    question_pool_enabled: bool = False
+    question_pool_low_water: int = 3
+    question_pool_target: int = 8
+    question_pool_check_interval: float = 60.0
+    question_pool_live_per_dimension: int = 1
+    question_pool_scales: List[str] = ["初创公司", "小型公司", "中型公司", "大型公司"]
+    
+    # 结构化题库：knowledge_base/02-面试题库/ 解析为按（维度, 难度）索引的题目，出题时最先取用（早于预生成题库），
+    # 期望回答要点作为 reference_context；rephrase 开启时每个维度用一次便宜模型调用按公司规模改写题目场景。
+    # 有简历差距分析时每个维度末尾 live_per_dimension 道题仍实时生成
+    question_bank_enabled: bool = False
+    question_bank_dir: str = str(BASE_DIR.parent / "knowledge_base" / "02-面试题库")
+    question_bank_rephrase: bool = False
+    question_bank_live_per_dimension: int = 1
+    
+    # 题目近似重复检测：字符 n-gram 的 MinHash LSH（num_perm 个哈希分 bands 段），
+    # 估计 Jaccard 不低于 threshold 视为重复；同一场面试内的重复题最多重新生成 max_retries 次，仍重复则丢弃
+    question_dedup_enabled: bool = True
+    question_dedup_ngram: int = 2
+    question_dedup_num_perm: int = 128
+    question_dedup_bands: int = 32
+    question_dedup_threshold: float = 0.3
+    question_dedup_max_retries: int = 1
+    
+    # 自适应面试：各维度能力估计的标准误降到 se_target 以下即停止该维度；
+    # score_noise 为评分噪声（0-1 标度的标准差），决定每道题的信息量
+    adaptive_se_target: float = 0.3
+    adaptive_score_noise: float = 0.12
+    adaptive_max_questions: int = 18
+    adaptive_max_per_dimension: int = 4
+    adaptive_max_sessions: int = 1000
+    
+    # Streamlit 面试流程中后台预取下一轮题目（等待预取结果的最长时间，超时则重新生成）
+    round_prefetch_enabled: bool = True
+    round_prefetch_workers: int = 4
+    round_prefetch_wait_seconds: float = 120.0
+    
+    # LLM / RAG 请求录制回放（off / record / replay），用于离线压测与基准测试
+    cassette_mode: str = "off"
+    cassette_path: str = str(BASE_DIR / "cassette.jsonl")
+    
+    # 检索后端：ragflow（远程 RAGFlow）/ local（进程内检索 knowledge_base/）/
+    # auto（配置了 RAGFlow API Key 与 Dataset ID 时用 RAGFlow，否则用本地检索）
+    rag_backend: str = "auto"
+    
+    # 本地检索：markdown 按标题切片（每片不超过 chunk_chars 字符），字符 bigram 的 BM25 索引
+    local_rag_dir: str = str(BASE_DIR.parent / "knowledge_base")
+    local_rag_chunk_chars: int = 600
+    local_rag_bm25_k1: float = 1.2
+    local_rag_bm25_b: float = 0.75
+    
+    # 结构化检索过滤：片段按维度 / 难度 / 文档类型打标签，出题检索只在对应维度与难度的片段中排序。
+    # 本地检索先按标签划出候选集再打分；RAGFlow 多取 overfetch 倍结果后按标签过滤
+    rag_filter_enabled: bool = True
+    rag_filter_overfetch: int = 3
     
     # RAGFlow API 配置
     ragflow_api_key: str = ""
     ragflow_api_base: str = "http://localhost:9380"
     ragflow_dataset_id: str = ""
     
+    # RAGFlow 客户端：同一事件循环内复用 keep-alive 连接池（空闲连接超过 keepalive 上限会被立即关闭，
+    # 因此与 max_connections 取相同值）；ragflow_http2 需安装 h2，未安装时回退 HTTP/1.1
+    ragflow_http2: bool = True
+    ragflow_max_connections: int = 20
+    ragflow_max_keepalive_connections: int = 20
+    ragflow_keepalive_expiry: float = 30.0
+    ragflow_connect_timeout: float = 3.0
+    ragflow_timeout: float = 10.0
+    # 单次检索的总时限（含重试，调用方可传入更短的剩余预算）；连接错误、超时与 429/5xx 按全抖动指数退避重试
+    ragflow_deadline_seconds: float = 15.0
+    ragflow_max_retries: int = 2
+    ragflow_backoff_base: float = 0.2
+    ragflow_backoff_max: float = 2.0
+    
     # 应用配置
     app_debug: bool = True
     app_host: str = "0.0.0.0"
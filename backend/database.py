@@ -3,7 +3,7 @@
 支持 PostgreSQL (云端) 和 SQLite (本地开发)
 """
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Float, Text, ForeignKey, JSON, DateTime, Enum as SAEnum
+from sqlalchemy import create_engine, Column, Integer, String, Float, Text, ForeignKey, JSON, DateTime, Index, Enum as SAEnum
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
@@ -146,6 +146,24 @@ class QuestionRecord(Base):
     
     round = relationship("InterviewRound", back_populates="questions")
 
+class PooledQuestion(Base):
+    """预生成题库表（通用题目，按维度/难度/公司规模取用，取出后标记 used_at）"""
+    __tablename__ = "question_pool"
+    __table_args__ = (
+        Index("ix_question_pool_slot", "dimension", "difficulty", "company_scale", "used_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    dimension = Column(String)
+    difficulty = Column(String)
+    company_scale = Column(String)
+    
+    text = Column(Text)
+    reference_context = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.now)
+    used_at = Column(DateTime, nullable=True)
+
 # --- Utils ---
 
 # 数据库可用性标志
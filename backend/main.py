@@ -2,8 +2,11 @@
 AIPM-Scan 后端主入口
 FastAPI 应用
 """
+import asyncio
+import json
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from datetime import datetime
 from contextlib import asynccontextmanager
 from sqlalchemy.orm import Session
@@ -14,13 +17,24 @@ from database import init_db, get_db
 from models.schemas import (
     ParseJDRequest, ParseJDResponse, JobProfile, AbilityWeights,
     GenerateQuestionsRequest, GenerateQuestionsResponse,
-    EvaluateAnswerRequest, EvaluateAnswerResponse
+    EvaluateAnswerRequest, EvaluateAnswerResponse, EvaluateBatchRequest,
+    AdaptiveStartRequest, AdaptiveAnswerRequest, AdaptiveNextRequest, AdaptiveInterviewResponse
 )
 # Services
 from services.profile_parser import parse_profile
-from services.question_generator import generate_questions
-from services.evaluator import evaluate_answer
+from services.question_generator import generate_questions, generate_questions_stream
+from services.evaluator import evaluate_answer, evaluate_answer_stream, evaluate_batch_stream
 from services.history_service import history_service
+from services.llm_service import llm_service
+from services.model_cascade import model_cascade
+from services.self_consistency import self_consistency_stats
+from services.rag_service import rag_service
+from services.local_retriever import local_retriever
+from services.prompt_compactor import compaction_stats
+from services.question_dedup import dedup_stats
+from services.question_pool import question_pool, pool_replenisher
+from services.question_bank import question_bank
+from services.adaptive_interview import AdaptiveInterview, QuestionGenerationError, adaptive_sessions
 
 
 @asynccontextmanager
@@ -31,7 +45,12 @@ async def lifespan(app: FastAPI):
     init_db()
     print("💾 数据库初始化完成/已连接")
     print(f"📍 API 文档: http://{settings.app_host}:{settings.app_port}/docs")
+    if settings.question_pool_enabled:
+        pool_replenisher.start()
     yield
+    pool_replenisher.stop()
+    await llm_service.aclose()
+    await rag_service.aclose()
     print("👋 AIPM-Scan 服务关闭")
 
 
@@ -110,62 +129,6 @@ async def api_parse_jd(request: ParseJDRequest):
         )
 
 
-@app.post("/api/generate-questions", response_model=GenerateQuestionsResponse)
-async def api_generate_questions(request: GenerateQuestionsRequest):
-    """
-    题库生成 API
-    """
-    try:
-        logging_info = "Generating questions..."
-        # 提取 gap_analysis 和 company_scale (需要在 Request 中扩展这些字段，或者暂时从其他地方传？)
-        # 修正: GenerateQuestionsRequest 需要更新，但为了不破坏旧前端，我们暂且假设 request body 尽量匹配
-        # 这里实际上 schema 还没更新 GenerateQuestionsRequest，我们需要先更新 schema 
-        # 或者我们在这里做一个 workaround，假设 request 可能包含额外字段 (Hack)
-        # 但正确做法是更新 Schema。为了简单，我们在 Schema 更新前先只用默认值
-        
-        # 实际上用户这次改动要求增加 company_scale 和 resume context。
-        # 我们需要在 models/schemas.py 里更新 GenerateQuestionsRequest。
-        # 但为了避免来回改文件，我们先假设 Question Generator 已经改为接收这些参数，
-        # 而 Schema 还没改。这会报错。
-        # 刚才我已经看了一眼 schemas.py (step 125)，GenerateQuestionsRequest 并没有 gap_analysis 字段。
-        # 必须先更新 Schema！
-        
-        # 让我先回退一下。GenerateQuestionsRequest 在 125 步显示如下：
-        # class GenerateQuestionsRequest(BaseModel):
-        #    ability_weights: AbilityWeights
-        #    count: int
-        
-        # 我需要先给它加上 resume_gap_analysis 和 company_scale。
-        pass 
-        # (Wait, I cannot execute verify logic inside replace_file_content prompt)
-        
-    except Exception as e:
-        # 临时 Hack: 把 interview_id 放在 timestamp 里传回去？或者改 Response 模型？
-        # 正确做法是改 Response 模型。
-        # 但为了不改前端太多，我们先把 ID 放在 JobProfile 里? JobProfile 没有 id 字段。
-        # 我们把 interview_id 打印出来，前端目前还不需要 interview_id 来生成题目，因为题目生成是独立的。
-        # 等题目生成时，我们再创建 round。
-        # 实际上，我们需要把 interview_id 传给前端，以便后续保存。
-        # 让我们把 timestamp 暂时用作传递 ID 的通道 (Bad practice but quick for MVP without changing frontend type)
-        # 或者更好：我们在 ParseJDResponse 增加一个字段？
-        # 不，ParseJDResponse 定义在 schemas.py，我们刚才改了吗？没有。
-        # 让我们在 timestamp 里附带 ID: "2024-01-01T...|ID:1"
-        
-        return ParseJDResponse(
-            success=True,
-            data=job_profile,
-            interview_id=interview.id,
-            timestamp=datetime.now().isoformat()
-        )
-        
-    except Exception as e:
-        return ParseJDResponse(
-            success=False,
-            error=f"解析错误: {str(e)}",
-            timestamp=datetime.now().isoformat()
-        )
-
-
 @app.post("/api/generate-questions", response_model=GenerateQuestionsResponse)
 async def api_generate_questions(request: GenerateQuestionsRequest, db: Session = Depends(get_db)):
     """
@@ -183,7 +146,8 @@ async def api_generate_questions(request: GenerateQuestionsRequest, db: Session
             ability_weights=weights,
             count=request.count,
             resume_gap_analysis=gap_analysis,
-            company_scale=company_scale
+            company_scale=company_scale,
+            asked_questions=request.asked_questions
         )
         
         # 如果能在请求里拿到 interview_id 就好了。目前没传。
@@ -258,8 +222,377 @@ async def api_evaluate_answer(request: EvaluateAnswerRequest, db: Session = Depe
             timestamp=datetime.now().isoformat()
         )
 
+# --- Streaming (SSE) APIs ---
+
+def _sse(event: str, data) -> str:
+    """格式化一条 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/evaluate-answer/stream")
+async def api_evaluate_answer_stream(request: EvaluateAnswerRequest):
+    """
+    能力评估 API（SSE 流式版本）
+    
+    事件: delta（增量文本）/ field（已完整的字段，如 score）→ result（评估结果）；出错时为 error
+    """
+    async def events():
+        try:
+            async for item in evaluate_answer_stream(
+                question=request.question.model_dump(),
+                answer=request.answer
+            ):
+                yield _sse(item["type"], item["data"])
+        except Exception as e:
+            yield _sse("error", f"评估错误: {str(e)}")
+    
+    return _sse_response(events())
+
+
+@app.post("/api/evaluate-batch/stream")
+async def api_evaluate_batch_stream(request: EvaluateBatchRequest):
+    """
+    批量能力评估 API（SSE 流式版本）
+    
+    事件: evaluation（按完成顺序逐题，含题目序号、评估结果与当前综合评估）→ result（综合评估结果）；出错时为 error
+    """
+    async def events():
+        try:
+            async for item in evaluate_batch_stream(
+                [item.model_dump() for item in request.items],
+                batched=request.batched
+            ):
+                yield _sse(item["type"], item["data"])
+        except Exception as e:
+            yield _sse("error", f"评估错误: {str(e)}")
+    
+    return _sse_response(events())
+
+
+@app.post("/api/generate-questions/stream")
+async def api_generate_questions_stream(request: GenerateQuestionsRequest):
+    """
+    题库生成 API（SSE 流式版本）
+    
+    事件: start → question（逐题）→ result（完整题目列表）；出错时为 error
+    """
+    async def events():
+        yield _sse("start", {"count": request.count})
+        try:
+            company_scale = request.company_scale.value if request.company_scale else "中型公司"
+            async for item in generate_questions_stream(
+                ability_weights=request.ability_weights.model_dump(),
+                count=request.count,
+                resume_gap_analysis=request.resume_gap_analysis,
+                company_scale=company_scale,
+                asked_questions=request.asked_questions
+            ):
+                yield _sse(item["type"], item["data"])
+        except Exception as e:
+            yield _sse("error", f"题目生成错误: {str(e)}")
+    
+    return _sse_response(events())
+
+
+@app.post("/api/adaptive/start", response_model=AdaptiveInterviewResponse)
+async def api_adaptive_start(request: AdaptiveStartRequest):
+    """
+    开始一场自适应面试，返回会话 ID 与第一题
+    
+    之后每次作答调用 /api/adaptive/answer，按各维度能力估计选择下一题的维度与难度
+    """
+    try:
+        interview = AdaptiveInterview(
+            ability_weights=request.ability_weights.model_dump(),
+            resume_gap_analysis=request.resume_gap_analysis,
+            company_scale=request.company_scale.value if request.company_scale else "中型公司"
+        )
+        try:
+            question = await interview.next_question()
+        except QuestionGenerationError:
+            question = None
+        if question is None:
+            return AdaptiveInterviewResponse(
+                success=False,
+                error="题目生成失败",
+                timestamp=datetime.now().isoformat()
+            )
+        session_id = adaptive_sessions.create(interview)
+        return AdaptiveInterviewResponse(
+            success=True,
+            data={"session_id": session_id, "question": question, "summary": interview.summary()},
+            timestamp=datetime.now().isoformat()
+        )
+    except Exception as e:
+        return AdaptiveInterviewResponse(
+            success=False,
+            error=f"自适应面试启动错误: {str(e)}",
+            timestamp=datetime.now().isoformat()
+        )
+
+
+@app.post("/api/adaptive/answer", response_model=AdaptiveInterviewResponse)
+async def api_adaptive_answer(request: AdaptiveAnswerRequest):
+    """
+    提交当前题目的回答：评估后更新能力估计并返回下一题
+    
+    所有维度的标准误达标（或题数达到上限）时 finished 为 true、question 为空；
+    下一题生成失败时 success 为 false（data 中仍带本题评估），回答已记录，调用 /api/adaptive/next 重试出题
+    """
+    interview = adaptive_sessions.get(request.session_id)
+    if interview is None:
+        return AdaptiveInterviewResponse(
+            success=False,
+            error="会话不存在或已过期",
+            timestamp=datetime.now().isoformat()
+        )
+    try:
+        async with adaptive_sessions.lock(request.session_id):
+            question = interview.current
+            if question is None:
+                return AdaptiveInterviewResponse(
+                    success=False,
+                    error="面试已结束" if interview.finished else "当前没有待答题目，请调用 /api/adaptive/next 获取下一题",
+                    timestamp=datetime.now().isoformat()
+                )
+            evaluation = await evaluate_answer(question=question, answer=request.answer)
+            if evaluation is None:
+                return AdaptiveInterviewResponse(
+                    success=False,
+                    error="评估失败，请重新提交",
+                    timestamp=datetime.now().isoformat()
+                )
+            interview.record(question, evaluation["score"])
+            try:
+                next_question = await interview.next_question()
+            except QuestionGenerationError as e:
+                return AdaptiveInterviewResponse(
+                    success=False,
+                    data={
+                        "evaluation": evaluation,
+                        "question": None,
+                        "finished": False,
+                        "summary": interview.summary()
+                    },
+                    error=f"{str(e)}，请调用 /api/adaptive/next 重试",
+                    timestamp=datetime.now().isoformat()
+                )
+            return AdaptiveInterviewResponse(
+                success=True,
+                data={
+                    "evaluation": evaluation,
+                    "question": next_question,
+                    "finished": next_question is None,
+                    "summary": interview.summary()
+                },
+                timestamp=datetime.now().isoformat()
+            )
+    except Exception as e:
+        return AdaptiveInterviewResponse(
+            success=False,
+            error=f"自适应面试错误: {str(e)}",
+            timestamp=datetime.now().isoformat()
+        )
+
+
+@app.post("/api/adaptive/next", response_model=AdaptiveInterviewResponse)
+async def api_adaptive_next(request: AdaptiveNextRequest):
+    """
+    获取当前待答题目；没有待答题目（上次下一题生成失败）时重新生成
+    
+    面试已结束时 finished 为 true、question 为空
+    """
+    interview = adaptive_sessions.get(request.session_id)
+    if interview is None:
+        return AdaptiveInterviewResponse(
+            success=False,
+            error="会话不存在或已过期",
+            timestamp=datetime.now().isoformat()
+        )
+    try:
+        async with adaptive_sessions.lock(request.session_id):
+            question = interview.current or await interview.next_question()
+            return AdaptiveInterviewResponse(
+                success=True,
+                data={
+                    "question": question,
+                    "finished": question is None,
+                    "summary": interview.summary()
+                },
+                timestamp=datetime.now().isoformat()
+            )
+    except QuestionGenerationError as e:
+        return AdaptiveInterviewResponse(
+            success=False,
+            error=f"{str(e)}，请重试",
+            timestamp=datetime.now().isoformat()
+        )
+    except Exception as e:
+        return AdaptiveInterviewResponse(
+            success=False,
+            error=f"自适应面试错误: {str(e)}",
+            timestamp=datetime.now().isoformat()
+        )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus 指标：按调用点的 LLM token / 耗时 / 排队 / 解析失败 / 成本，以及调度器实时状态"""
+    governor = llm_service.governor.stats()
+    gauges = [
+        ("aipm_llm_in_flight", "当前在途 LLM 请求数", governor["in_flight"]),
+        ("aipm_llm_queue_depth", "当前排队中的 LLM 请求数", governor["queue_depth"]),
+        ("aipm_llm_concurrency_limit", "当前自适应并发上限", governor["concurrency_limit"]),
+    ]
+    lines = []
+    for metric, help_text, value in gauges:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value}")
+    return llm_service.metrics.render_prometheus() + "\n".join(lines) + "\n"
+
+
+@app.get("/api/llm-cache/stats")
+async def llm_cache_stats():
+    """LLM 响应缓存命中统计"""
+    cache = llm_service.cache
+    return {
+        "success": True,
+        "data": await asyncio.to_thread(cache.stats) if cache is not None else None
+    }
+
+
+@app.get("/api/rag-cache/stats")
+async def rag_cache_stats():
+    """检索结果缓存命中统计"""
+    return {
+        "success": True,
+        "data": rag_service.cache.stats()
+    }
+
+
+@app.get("/api/rag/backend")
+async def rag_backend_info():
+    """当前检索后端与本地检索索引状态"""
+    return {
+        "success": True,
+        "data": {"backend": rag_service.backend, "local": local_retriever.stats()}
+    }
+
+
+@app.post("/api/rag-cache/invalidate")
+async def rag_cache_invalidate(dataset_id: str = None):
+    """知识库重新索引后失效检索缓存（不传 dataset_id 时全部失效）"""
+    return {
+        "success": True,
+        "data": {"removed": rag_service.invalidate_cache(dataset_id)}
+    }
+
+
+@app.get("/api/llm-governor/stats")
+async def llm_governor_stats():
+    """LLM 并发调度统计（在途数、排队深度、等待时间、429 与重试）"""
+    return {
+        "success": True,
+        "data": llm_service.governor.stats()
+    }
+
+
+@app.get("/api/llm-router/stats")
+async def llm_router_stats():
+    """LLM 端点路由统计（各端点 p50/p95 延迟、错误率、对冲次数）"""
+    return {
+        "success": True,
+        "data": llm_service.router.stats()
+    }
+
+
+@app.get("/api/prompt-compaction/stats")
+async def prompt_compaction_stats():
+    """Prompt 压缩统计（各调用点压缩前后的估算 token 数）"""
+    return {
+        "success": True,
+        "data": compaction_stats.snapshot()
+    }
+
+
+@app.get("/api/question-dedup/stats")
+async def question_dedup_stats():
+    """出题查重统计（判为近似重复次数、重新生成次数、重试用尽后保留的近似题数与丢弃数）"""
+    return {
+        "success": True,
+        "data": dedup_stats.stats()
+    }
+
+
+@app.get("/api/singleflight/stats")
+async def singleflight_stats():
+    """相同并发请求合并统计（coalesced 为被合并、未发起上游调用的请求数）"""
+    return {
+        "success": True,
+        "data": {
+            "llm": llm_service.singleflight.stats(),
+            "rag": rag_service.singleflight.stats()
+        }
+    }
+
+
+@app.get("/api/llm-cascade/stats")
+async def llm_cascade_stats():
+    """评分级联统计（升级率、各升级原因、抽样对比的一致率）"""
+    return {
+        "success": True,
+        "data": model_cascade.stats()
+    }
+
+
+@app.get("/api/self-consistency/stats")
+async def self_consistency_stats_api():
+    """多次采样评分统计（平均采样数、提前停止比例、估计的单次评分标准差）"""
+    return {
+        "success": True,
+        "data": self_consistency_stats.stats()
+    }
+
+
+@app.get("/api/question-pool/stats")
+async def question_pool_stats():
+    """预生成题库统计（未用题目数、低于低水位的槽位数与补货线程状态）"""
+    return {
+        "success": True,
+        "data": await asyncio.to_thread(question_pool.stats)
+    }
+
+
+@app.get("/api/question-bank/stats")
+async def question_bank_stats():
+    """结构化题库统计（题目总数与各（维度, 难度）的题数）"""
+    return {
+        "success": True,
+        "data": await asyncio.to_thread(question_bank.stats)
+    }
+
+
 # --- History APIs ---
 
+@app.get("/api/history/dedup-report")
+async def get_history_dedup_report(threshold: float = None, db: Session = Depends(get_db)):
+    """历史题目近似重复报告（重复组数、可去掉的重复题目数与最大的若干组）"""
+    try:
+        report = await asyncio.to_thread(history_service.dedup_report, db, threshold)
+        return {"success": True, "data": report}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
 @app.get("/api/history")
 async def get_history(db: Session = Depends(get_db)):
     """获取所有面试历史"""
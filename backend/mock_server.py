@@ -0,0 +1,510 @@
+"""
+本地 Mock 服务：OpenAI 兼容 /chat/completions 与 RAGFlow 兼容 /api/v1/retrieval/{dataset_id}
+
+- 延迟分布可配置: fixed:0.5 / uniform:0.2,1.5 / lognormal:0.8,0.5（中位数秒, sigma）/ exp:0.5（均值秒）
+- 可加载 cassette 文件按请求内容回放录制的真实响应；未命中时按 prompt 类型生成合成响应
+- 检索接口从 knowledge_base/ 的 markdown 段落中按字符 bigram 重合度返回 top_k 片段
+- 支持 keep-alive 与 stream=True 的 SSE 流式输出，响应附带 usage，便于统计 token
+
+用法: python mock_server.py [--port 8001] [--llm-latency lognormal:0.8,0.5] [--rag-latency fixed:0.05] [--cassette cassette.jsonl]
+然后将 LLM_BASE_URL 与 RAGFLOW_HOST 指向 http://127.0.0.1:<port>
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import ABILITY_DIMENSIONS, BASE_DIR, settings
+from services.cassette import rag_request_key
+from services.llm_cache import make_cache_key
+from services.text_utils import char_ngram_set
+from services.token_estimator import estimate_tokens
+
+KNOWLEDGE_DIR = BASE_DIR.parent / "knowledge_base"
+BATCH_ITEM_RE = re.compile(r"【第 (\d+) 题】")
+DIFFICULTY_SCHEDULE_RE = re.compile(r"难度依次为：(.+)")
+BANK_ITEM_RE = re.compile(r"^\[(Q\d-[A-Z]\d+)\] (.+)$", re.MULTILINE)
+
+# 基准脚本出题用的能力权重
+BENCH_WEIGHTS = {
+    "business_decomposition": 0.2,
+    "ai_tech_understanding": 0.3,
+    "business_awareness": 0.1,
+    "system_thinking": 0.2,
+    "execution_power": 0.1,
+    "risk_awareness": 0.1
+}
+
+
+class LatencyModel:
+    """延迟分布"""
+
+    def __init__(self, kind: str = "fixed", params: Tuple[float, ...] = (0.0,), rng: Optional[random.Random] = None):
+        self.kind = kind
+        self.params = params
+        self.rng = rng or random.Random()
+
+    @classmethod
+    def parse(cls, spec: str, rng: Optional[random.Random] = None) -> "LatencyModel":
+        """解析 "kind:p1,p2" 格式；纯数字视为固定延迟"""
+        kind, _, raw = spec.partition(":")
+        if not raw:
+            kind, raw = "fixed", kind
+        params = tuple(float(p) for p in raw.split(",") if p)
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2, "exp": 1}
+        if kind not in expected or len(params) != expected[kind]:
+            raise ValueError(f"无法解析延迟分布: {spec}（支持 fixed:s / uniform:lo,hi / lognormal:median,sigma / exp:mean）")
+        return cls(kind, params, rng)
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return self.rng.uniform(*self.params)
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return self.rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        return self.rng.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0.0
+
+    def __repr__(self):
+        return f"{self.kind}:{','.join(str(p) for p in self.params)}"
+
+
+def _stable_fraction(text: str) -> float:
+    """由文本得到稳定的 [0, 1) 伪随机数，使同一请求的合成响应可复现"""
+    return int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16) / 0x100000000
+
+
+class ModelProfile:
+    """
+    按请求中的模型名区分的合成行为（用于模拟便宜模型）：
+    延迟、评分偏差（在 ±score_noise 内按请求稳定地偏移）、每次请求独立的评分抖动
+    （正态，标准差 sample_noise，模拟非零温度下的采样波动）与输出被截断成不合法 JSON 的比例
+    """
+
+    def __init__(
+        self,
+        latency: Optional[LatencyModel] = None,
+        score_noise: float = 0.0,
+        malformed_rate: float = 0.0,
+        sample_noise: float = 0.0,
+        rng: Optional[random.Random] = None
+    ):
+        self.latency = latency
+        self.score_noise = score_noise
+        self.malformed_rate = malformed_rate
+        self.sample_noise = sample_noise
+        self.rng = rng or random.Random()
+
+    def _distort_item(self, item: Any, salt: str) -> Any:
+        if isinstance(item, dict) and isinstance(item.get("score"), (int, float)):
+            offset = self.score_noise * (2 * _stable_fraction(f"{salt}#noise") - 1)
+            if self.sample_noise:
+                offset += self.rng.gauss(0, self.sample_noise)
+            item["score"] = round(min(10.0, max(0.0, item["score"] + offset)), 1)
+        return item
+
+    def distort(self, content: str, key: str) -> str:
+        """只改动 JSON 响应（评估结果），出题等纯文本响应原样返回"""
+        if not content.lstrip().startswith(("{", "[")):
+            return content
+        if self.malformed_rate and _stable_fraction(f"{key}#malformed") < self.malformed_rate:
+            return content[:len(content) // 2]
+        if not self.score_noise and not self.sample_noise:
+            return content
+        try:
+            parsed = json.loads(content)
+        except ValueError:
+            return content
+        if isinstance(parsed, list):
+            parsed = [self._distort_item(item, f"{key}#{i}") for i, item in enumerate(parsed)]
+        else:
+            parsed = self._distort_item(parsed, key)
+        return json.dumps(parsed, ensure_ascii=False)
+
+
+def _synthesize_evaluation(prompt: str) -> Dict[str, Any]:
+    return {
+        "score": round(4 + _stable_fraction(prompt) * 5, 1),
+        "dimension": "",
+        "evidence_sentences": ["「通过检索外部知识降低幻觉」- 理解准确✓"],
+        "strengths": ["概念清晰", "有落地意识"],
+        "weaknesses": ["缺少量化指标"],
+        "comment": "Mock 服务生成的评估结果。"
+    }
+
+
+def synthesize_reply(system_prompt: str, user_prompt: str) -> str:
+    """按 prompt 类型生成合成响应（岗位解析 / 答案评估返回 JSON，出题返回题目文本）"""
+    prompt = system_prompt + user_prompt
+    fraction = _stable_fraction(prompt)
+    if "JSON 数组" in user_prompt and '"score"' in user_prompt:
+        # 批量评估：每道题一个评估对象
+        blocks = BATCH_ITEM_RE.split(user_prompt)
+        return json.dumps([
+            dict(_synthesize_evaluation(blocks[i + 1]), index=int(blocks[i]))
+            for i in range(1, len(blocks) - 1, 2)
+        ], ensure_ascii=False)
+    if "ability_weights" in user_prompt:
+        weight = round(1 / len(ABILITY_DIMENSIONS), 4)
+        return json.dumps({
+            "job_title": "AI 产品经理",
+            "responsibilities": ["负责大模型应用的产品规划与落地", "推动数据飞轮与效果评估"],
+            "skills": ["RAG", "Prompt 工程", "数据分析"],
+            "experience": "3 年以上产品经验",
+            "ability_weights": {dim: weight for dim in ABILITY_DIMENSIONS},
+            "resume_summary": "具备 AI 产品从 0 到 1 的落地经验",
+            "match_score": 60 + int(fraction * 35),
+            "gap_analysis": ["缺乏 B 端商业化经验", "对模型评估体系理解较浅"]
+        }, ensure_ascii=False)
+    if '"score"' in prompt:
+        return json.dumps(_synthesize_evaluation(prompt), ensure_ascii=False)
+    if "【待改写题目】" in user_prompt:
+        # 题库题目改写：保持题号，在题目前加上公司规模场景
+        scale = re.search(r"公司规模：(\S+)", system_prompt)
+        return json.dumps([
+            {"id": bank_id, "text": f"在{scale.group(1) if scale else '当前公司'}的场景下，{text}"}
+            for bank_id, text in BANK_ITEM_RE.findall(user_prompt)
+        ], ensure_ascii=False)
+    schedule = DIFFICULTY_SCHEDULE_RE.search(user_prompt)
+    if schedule and "JSON 数组" in user_prompt:
+        # 单次生成一个维度的多道题
+        return json.dumps([
+            {"difficulty": level, "text": _synthesize_question(f"{prompt}#{i}")}
+            for i, level in enumerate(schedule.group(1).strip().split("、"))
+        ], ensure_ascii=False)
+    return _synthesize_question(prompt)
+
+
+def _synthesize_question(prompt: str) -> str:
+    topics = ["RAG 召回率", "Agent 任务拆解", "模型评估指标", "数据飞轮", "商业化定价", "幻觉治理"]
+    topic = topics[int(_stable_fraction(prompt) * len(topics))]
+    return f"请结合你做过的项目，谈谈你会如何设计并衡量「{topic}」相关的产品方案？"
+
+
+class KnowledgeIndex:
+    """knowledge_base/ markdown 段落的 bigram 重合度检索"""
+
+    def __init__(self, root: Path = KNOWLEDGE_DIR):
+        self.paragraphs: List[Tuple[str, str, set]] = []
+        if root.exists():
+            for path in sorted(root.rglob("*.md")):
+                for block in path.read_text(encoding="utf-8").split("\n\n"):
+                    block = block.strip()
+                    if len(block) >= 20:
+                        self.paragraphs.append((path.name, block, char_ngram_set(block)))
+
+    def search(self, query: str, top_k: int) -> List[Dict[str, Any]]:
+        query_grams = char_ngram_set(query)
+        if not query_grams:
+            return []
+        scored = []
+        for idx, (doc, text, grams) in enumerate(self.paragraphs):
+            overlap = len(query_grams & grams)
+            if overlap:
+                scored.append((overlap / len(query_grams), idx, doc, text))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [
+            {
+                "id": f"mock-{idx}",
+                "content_with_weight": text,
+                "document_keyword": doc,
+                "similarity": round(score, 4)
+            }
+            for score, idx, doc, text in scored[:top_k]
+        ]
+
+
+class MockServer:
+    """OpenAI / RAGFlow 兼容的本地 Mock 服务"""
+
+    def __init__(
+        self,
+        llm_latency: Optional[LatencyModel] = None,
+        rag_latency: Optional[LatencyModel] = None,
+        cassette_path: Optional[str] = None,
+        knowledge: Optional[KnowledgeIndex] = None,
+        stream_chunk_chars: int = 16,
+        model_profiles: Optional[Dict[str, ModelProfile]] = None,
+        rag_error_rate: float = 0.0,
+        rng: Optional[random.Random] = None
+    ):
+        self.llm_latency = llm_latency or LatencyModel()
+        self.model_profiles = model_profiles or {}
+        # 检索请求按该比例返回 503（模拟 RAGFlow 的瞬时故障）
+        self.rag_error_rate = rag_error_rate
+        self.rng = rng or random.Random()
+        self.rag_latency = rag_latency or LatencyModel()
+        self.knowledge = knowledge or KnowledgeIndex()
+        self.stream_chunk_chars = stream_chunk_chars
+        self.recorded: Dict[str, List[Any]] = {}
+        self._cursors: Dict[str, int] = {}
+        if cassette_path and os.path.exists(cassette_path):
+            with open(cassette_path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.recorded.setdefault(f"{entry['kind']}:{entry['key']}", []).append(entry["response"])
+        self.stats = {
+            "connections": 0,
+            "llm_requests": 0,
+            "rag_requests": 0,
+            "rag_errors": 0,
+            "replayed": 0,
+            "in_flight": 0,
+            "peak_in_flight": 0
+        }
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> "MockServer":
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def reset_stats(self):
+        for key in self.stats:
+            if key != "in_flight":
+                self.stats[key] = 0
+
+    def _replay(self, kind: str, key: str) -> Optional[Any]:
+        responses = self.recorded.get(f"{kind}:{key}")
+        if not responses:
+            return None
+        cursor = self._cursors.get(f"{kind}:{key}", 0)
+        self._cursors[f"{kind}:{key}"] = cursor + 1
+        self.stats["replayed"] += 1
+        return responses[cursor % len(responses)]
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats["connections"] += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                method, path = lines[0].split(" ")[:2]
+                length = 0
+                for line in lines[1:]:
+                    if line.lower().startswith("content-length:"):
+                        length = int(line.split(":", 1)[1])
+                body = json.loads(await reader.readexactly(length) or b"{}")
+
+                self.stats["in_flight"] += 1
+                self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.stats["in_flight"])
+                try:
+                    if method == "POST" and path.endswith("/chat/completions"):
+                        await self._chat_completions(body, writer)
+                    elif method == "POST" and "/api/v1/retrieval/" in path:
+                        await self._retrieval(path.rsplit("/", 1)[-1], body, writer)
+                    else:
+                        self._write_json(writer, {"error": {"message": f"not found: {path}"}}, status="404 Not Found")
+                finally:
+                    self.stats["in_flight"] -= 1
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _write_json(writer: asyncio.StreamWriter, payload: Dict[str, Any], status: str = "200 OK"):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1")
+            + body
+        )
+
+    @staticmethod
+    def _write_chunk(writer: asyncio.StreamWriter, data: bytes):
+        writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+
+    async def _chat_completions(self, body: Dict[str, Any], writer: asyncio.StreamWriter):
+        self.stats["llm_requests"] += 1
+        messages = body.get("messages", [])
+        system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user_prompt = next((m["content"] for m in messages if m["role"] == "user"), "")
+        model = body.get("model", "mock")
+
+        key = make_cache_key(model, system_prompt, user_prompt, body.get("temperature"), body.get("max_tokens"))
+        profile = self.model_profiles.get(model)
+        content = self._replay("llm", key)
+        if content is None:
+            content = synthesize_reply(system_prompt, user_prompt)
+            if profile is not None:
+                content = profile.distort(content, key)
+        usage = {
+            "prompt_tokens": estimate_tokens(system_prompt) + estimate_tokens(user_prompt),
+            "completion_tokens": estimate_tokens(content)
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"mock-{key[:12]}"
+        created = int(time.time())
+
+        latency = profile.latency if profile is not None and profile.latency is not None else self.llm_latency
+        await asyncio.sleep(latency.sample())
+
+        if not body.get("stream"):
+            self._write_json(writer, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content}
+                }],
+                "usage": usage
+            })
+            return
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n"
+        )
+        step = self.stream_chunk_chars
+        for i in range(0, len(content), step):
+            event = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": content[i:i + step]}, "finish_reason": None}]
+            }
+            self._write_chunk(writer, f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+            await writer.drain()
+        if (body.get("stream_options") or {}).get("include_usage"):
+            event = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [],
+                "usage": usage
+            }
+            self._write_chunk(writer, f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+        self._write_chunk(writer, b"data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+
+    async def _retrieval(self, dataset_id: str, body: Dict[str, Any], writer: asyncio.StreamWriter):
+        self.stats["rag_requests"] += 1
+        query = body.get("question", "")
+        top_k = int(body.get("top_k", 5))
+        threshold = float(body.get("similarity_threshold", 0.5))
+
+        chunks = self._replay("rag", rag_request_key(dataset_id, query, top_k, threshold))
+        if chunks is None:
+            chunks = self.knowledge.search(query, top_k)
+
+        await asyncio.sleep(self.rag_latency.sample())
+        if self.rag_error_rate and self.rng.random() < self.rag_error_rate:
+            self.stats["rag_errors"] += 1
+            self._write_json(writer, {"code": 503, "message": "mock transient error"}, status="503 Service Unavailable")
+            return
+        self._write_json(writer, {"code": 0, "data": {"chunks": chunks, "total": len(chunks)}})
+
+
+@asynccontextmanager
+async def mock_services(
+    llm: bool = True,
+    rag: bool = True,
+    llm_cache: bool = True,
+    model: Optional[str] = None,
+    overrides: Optional[Dict[str, Any]] = None,
+    **server_kwargs
+) -> AsyncIterator[MockServer]:
+    """
+    基准脚本用：启动 Mock 服务（server_kwargs 传给 MockServer），把 llm_service / rag_service 指向它，
+    并按 overrides 临时修改 settings；llm_cache=False 时关闭 LLM 响应缓存以测量真实上游负载，
+    model 非空时替换主模型名。
+    退出时关闭连接池与 Mock 服务，恢复被修改的服务属性与配置
+    """
+    from services.llm_service import llm_service
+    from services.rag_service import rag_service
+
+    server = await MockServer(**server_kwargs).start()
+    saved: List[Tuple[Any, str, Any]] = []
+
+    def patch(target: Any, name: str, value: Any):
+        saved.append((target, name, getattr(target, name)))
+        setattr(target, name, value)
+
+    if llm:
+        patch(llm_service, "api_key", "bench")
+        patch(llm_service, "base_url", server.base_url)
+        patch(llm_service, "_router", None)
+        if not llm_cache:
+            patch(llm_service, "cache", None)
+        if model:
+            patch(llm_service, "model_name", model)
+    if rag:
+        patch(rag_service, "api_key", "bench")
+        patch(rag_service, "base_url", server.base_url)
+        patch(rag_service, "dataset_id", rag_service.dataset_id or "bench-dataset")
+        patch(settings, "rag_backend", "ragflow")
+    for name, value in (overrides or {}).items():
+        patch(settings, name, value)
+    try:
+        yield server
+    finally:
+        if llm:
+            await llm_service.aclose()
+        if rag:
+            await rag_service.aclose()
+        await server.close()
+        for target, name, value in reversed(saved):
+            setattr(target, name, value)
+
+async def main():
+    parser = argparse.ArgumentParser(description="OpenAI / RAGFlow 兼容的本地 Mock 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--llm-latency", default="lognormal:0.8,0.5")
+    parser.add_argument("--rag-latency", default="fixed:0.05")
+    parser.add_argument("--rag-error-rate", type=float, default=0.0, help="检索请求返回 503 的比例")
+    parser.add_argument("--cassette", default=None, help="回放的 cassette 文件（JSONL）")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    server = await MockServer(
+        llm_latency=LatencyModel.parse(args.llm_latency, rng),
+        rag_latency=LatencyModel.parse(args.rag_latency, rng),
+        cassette_path=args.cassette,
+        rag_error_rate=args.rag_error_rate,
+        rng=rng
+    ).start(args.host, args.port)
+    print(f"🚀 Mock 服务已启动: http://{args.host}:{server.port}")
+    print(f"   LLM 延迟 {server.llm_latency}, RAG 延迟 {server.rag_latency}, 知识库段落 {len(server.knowledge.paragraphs)}")
+    if server.recorded:
+        print(f"   已加载 cassette 录制记录 {sum(len(v) for v in server.recorded.values())} 条")
+    await server._server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
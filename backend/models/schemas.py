@@ -80,6 +80,7 @@ class GenerateQuestionsRequest(BaseModel):
     count: int = Field(default=10, ge=5, le=20, description="生成题目数量")
     resume_gap_analysis: List[str] = Field(default_factory=list, description="简历能力差距分析")
     company_scale: Optional[CompanyScale] = Field(default=CompanyScale.MEDIUM, description="公司规模")
+    asked_questions: List[str] = Field(default_factory=list, description="本场面试已出过的题目（用于近似重复过滤）")
 
 
 class Question(BaseModel):
@@ -98,6 +99,34 @@ class GenerateQuestionsResponse(BaseModel):
     timestamp: str = ""
 
 
+# ===== 自适应面试相关 =====
+
+class AdaptiveStartRequest(BaseModel):
+    """自适应面试开始请求"""
+    ability_weights: AbilityWeights = Field(..., description="六维能力权重")
+    resume_gap_analysis: List[str] = Field(default_factory=list, description="简历能力差距分析")
+    company_scale: Optional[CompanyScale] = Field(default=CompanyScale.MEDIUM, description="公司规模")
+
+
+class AdaptiveAnswerRequest(BaseModel):
+    """自适应面试作答请求"""
+    session_id: str = Field(..., description="自适应面试会话ID")
+    answer: str = Field(..., min_length=10, description="对当前题目的回答")
+
+
+class AdaptiveNextRequest(BaseModel):
+    """自适应面试获取下一题请求（下一题生成失败后重试）"""
+    session_id: str = Field(..., description="自适应面试会话ID")
+
+
+class AdaptiveInterviewResponse(BaseModel):
+    """自适应面试响应"""
+    success: bool = True
+    data: Optional[Dict] = None
+    error: Optional[str] = None
+    timestamp: str = ""
+
+
 # ===== 能力评估相关 =====
 
 class QuestionInfo(BaseModel):
@@ -113,6 +142,12 @@ class EvaluateAnswerRequest(BaseModel):
     answer: str = Field(..., min_length=10, description="用户回答")
 
 
+class EvaluateBatchRequest(BaseModel):
+    """批量能力评估请求（一轮结束后统一评分）"""
+    items: List[EvaluateAnswerRequest] = Field(..., min_length=1, description="问题和回答列表")
+    batched: Optional[bool] = Field(default=None, description="是否把多道题打包进一次 LLM 调用评分；为空时取配置")
+
+
 class EvaluationResult(BaseModel):
     """评估结果"""
     score: float = Field(ge=0, le=10, description="得分(0-10)")
@@ -121,6 +156,8 @@ class EvaluationResult(BaseModel):
     strengths: List[str] = Field(default_factory=list, description="优势")
     weaknesses: List[str] = Field(default_factory=list, description="不足")
     comment: str = Field(default="", description="综合评价")
+    confidence: Optional[float] = Field(default=None, description="多次采样评分时分数所在分档的置信度")
+    samples: Optional[int] = Field(default=None, description="多次采样评分的采样数")
 
 
 class EvaluateAnswerResponse(BaseModel):
@@ -0,0 +1,230 @@
+"""
+自适应面试（IRT 风格）
+按已有评估结果为每个能力维度估计能力值 θ，逐题选择"信息量最大"的维度与难度：
+- 得分 x = score / 10 视为 P(θ) = σ(a·(θ - b)) 加上评分噪声（正态，标准差 score_noise），
+  b 为题目难度参数；先验 θ ~ N(0, 1)，用 Fisher scoring 求最大后验估计
+- 一道题的信息量为 (a·P·(1-P))² / noise²，难度与 θ 越接近信息量越大：
+  强候选人不再消耗在基础题上，弱候选人也不会反复被高级题"打满"
+- 维度的标准误降到 adaptive_se_target 以下（或题数达到上限）即停止该维度
+"""
+import asyncio
+import math
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from config import settings, ABILITY_DIMENSIONS
+from services.question_generator import generate_question_at
+
+# 各难度的 IRT 难度参数 b（θ 的标度与先验一致：0 为平均水平）
+DIFFICULTY_PARAMS = {"基础": -1.0, "进阶": 0.0, "高级": 1.0}
+# 区分度参数 a（logistic 标度常数）
+DISCRIMINATION = 1.7
+THETA_BOUND = 4.0
+
+
+class QuestionGenerationError(Exception):
+    """下一题生成失败（面试尚未结束，可重试）"""
+
+
+def _sigmoid(x: float) -> float:
+    return 1.0 / (1.0 + math.exp(-x))
+
+
+def item_information(theta: float, difficulty: str, noise: Optional[float] = None) -> float:
+    """难度为 difficulty 的题目在能力 θ 处的 Fisher 信息量"""
+    noise = noise or settings.adaptive_score_noise
+    p = _sigmoid(DISCRIMINATION * (theta - DIFFICULTY_PARAMS[difficulty]))
+    return (DISCRIMINATION * p * (1 - p)) ** 2 / noise ** 2
+
+
+def estimate_ability(
+    responses: List[Tuple[str, float]],
+    noise: Optional[float] = None
+) -> Tuple[float, float]:
+    """
+    由 [(难度, 0-10 得分)] 估计 θ，返回 (θ, 标准误)
+
+    先验 N(0, 1)；没有作答时返回先验 (0, 1)
+    """
+    noise = noise or settings.adaptive_score_noise
+    theta = 0.0
+    for _ in range(25):
+        gradient = -theta
+        information = 1.0
+        for difficulty, score in responses:
+            p = _sigmoid(DISCRIMINATION * (theta - DIFFICULTY_PARAMS[difficulty]))
+            slope = DISCRIMINATION * p * (1 - p)
+            gradient += (min(max(score / 10, 0.0), 1.0) - p) * slope / noise ** 2
+            information += slope ** 2 / noise ** 2
+        step = gradient / information
+        theta = min(max(theta + step, -THETA_BOUND), THETA_BOUND)
+        if abs(step) < 1e-4:
+            break
+    information = 1.0 + sum(item_information(theta, d, noise) for d, _ in responses)
+    return theta, 1 / math.sqrt(information)
+
+
+def theta_to_score(theta: float) -> float:
+    """θ 换算为 0-10 分（平均难度题目上的期望得分）"""
+    return round(10 * _sigmoid(DISCRIMINATION * theta), 1)
+
+
+class AdaptiveInterview:
+    """
+    一场自适应面试的状态：各维度的作答记录、当前待答题目与停止判定
+
+    ability_weights 中权重为 0 的维度不考察；select_next 在所有维度都停止或总题数达到上限时返回 None
+    """
+
+    def __init__(
+        self,
+        ability_weights: Dict[str, float],
+        resume_gap_analysis: Optional[List[str]] = None,
+        company_scale: str = "中型公司",
+        max_questions: Optional[int] = None,
+        se_target: Optional[float] = None,
+        max_per_dimension: Optional[int] = None
+    ):
+        self.weights = {
+            dim: weight for dim, weight in ability_weights.items()
+            if dim in ABILITY_DIMENSIONS and weight > 0
+        }
+        self.resume_gap_analysis = resume_gap_analysis or []
+        self.company_scale = company_scale
+        self.max_questions = max_questions or settings.adaptive_max_questions
+        self.se_target = se_target or settings.adaptive_se_target
+        self.max_per_dimension = max_per_dimension or settings.adaptive_max_per_dimension
+
+        self.responses: Dict[str, List[Tuple[str, float]]] = {dim: [] for dim in self.weights}
+        self.questions: List[Dict[str, Any]] = []
+        self.current: Optional[Dict[str, Any]] = None
+
+    def estimate(self, dimension: str) -> Tuple[float, float]:
+        return estimate_ability(self.responses[dimension])
+
+    def dimension_done(self, dimension: str) -> bool:
+        answered = len(self.responses[dimension])
+        if answered >= self.max_per_dimension:
+            return True
+        return answered > 0 and self.estimate(dimension)[1] <= self.se_target
+
+    @property
+    def finished(self) -> bool:
+        return self.select_next() is None
+
+    def select_next(self) -> Optional[Tuple[str, str]]:
+        """
+        选择下一题的 (维度, 难度)
+
+        维度取 权重 × 方差 最大的未停止维度（最不确定且最重要），
+        难度取在该维度当前 θ 估计处信息量最大的难度
+        """
+        if len(self.questions) >= self.max_questions:
+            return None
+        open_dims = [dim for dim in self.weights if not self.dimension_done(dim)]
+        if not open_dims:
+            return None
+        estimates = {dim: self.estimate(dim) for dim in open_dims}
+        dimension = max(open_dims, key=lambda dim: self.weights[dim] * estimates[dim][1] ** 2)
+        theta = estimates[dimension][0]
+        difficulty = max(DIFFICULTY_PARAMS, key=lambda level: item_information(theta, level))
+        return dimension, difficulty
+
+    async def next_question(self) -> Optional[Dict[str, Any]]:
+        """
+        生成并返回下一题；面试结束时返回 None
+
+        生成失败时抛出 QuestionGenerationError，此时 current 为空但面试未结束，可再次调用重试
+        """
+        # 先清空当前题目：已作答的题目无论生成成功与否都不能再被作答一次
+        self.current = None
+        slot = self.select_next()
+        if slot is None:
+            return None
+        dimension, difficulty = slot
+        label = f"{ABILITY_DIMENSIONS[dimension]['name']} / {difficulty}"
+        try:
+            question = await generate_question_at(
+                dimension=dimension,
+                difficulty=difficulty,
+                question_id=f"q{len(self.questions) + 1:03d}",
+                resume_gap_analysis=self.resume_gap_analysis,
+                company_scale=self.company_scale,
+                asked_questions=[q["text"] for q in self.questions]
+            )
+        except Exception as e:
+            raise QuestionGenerationError(f"题目生成失败: {label}（{type(e).__name__}）") from e
+        if question is None:
+            raise QuestionGenerationError(f"题目生成失败: {label}")
+        self.questions.append(question)
+        self.current = question
+        return question
+
+    def record(self, question: Dict[str, Any], score: float):
+        """记录一道题的评分（0-10）"""
+        dimension = question.get("dimension")
+        if dimension in self.responses:
+            self.responses[dimension].append((question.get("difficulty", "进阶"), float(score)))
+
+    def summary(self) -> Dict[str, Any]:
+        dimensions = {}
+        for dim in self.weights:
+            theta, se = self.estimate(dim)
+            dimensions[dim] = {
+                "dimension_name": ABILITY_DIMENSIONS[dim]["name"],
+                "theta": round(theta, 3),
+                "standard_error": round(se, 3),
+                "score": theta_to_score(theta),
+                "score_interval": [theta_to_score(theta - 1.96 * se), theta_to_score(theta + 1.96 * se)],
+                "answered": len(self.responses[dim]),
+                "done": self.dimension_done(dim)
+            }
+        total_weight = sum(self.weights.values()) or 1
+        return {
+            "questions_asked": len(self.questions),
+            "finished": self.finished,
+            "overall_score": round(
+                sum(self.weights[dim] * d["score"] for dim, d in dimensions.items()) / total_weight, 1
+            ),
+            "dimensions": dimensions
+        }
+
+
+class AdaptiveSessionStore:
+    """进程内的自适应面试会话（超过 adaptive_max_sessions 时淘汰最久未访问的会话）"""
+
+    def __init__(self):
+        self._sessions: "OrderedDict[str, AdaptiveInterview]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._guard = threading.Lock()
+
+    def create(self, interview: AdaptiveInterview) -> str:
+        session_id = uuid.uuid4().hex
+        with self._guard:
+            self._sessions[session_id] = interview
+            while len(self._sessions) > settings.adaptive_max_sessions:
+                evicted, _ = self._sessions.popitem(last=False)
+                self._locks.pop(evicted, None)
+        return session_id
+
+    def get(self, session_id: str) -> Optional[AdaptiveInterview]:
+        with self._guard:
+            interview = self._sessions.get(session_id)
+            if interview is not None:
+                self._sessions.move_to_end(session_id)
+            return interview
+
+    def lock(self, session_id: str) -> asyncio.Lock:
+        """同一会话的作答串行处理"""
+        with self._guard:
+            return self._locks.setdefault(session_id, asyncio.Lock())
+
+    def discard(self, session_id: str):
+        with self._guard:
+            self._sessions.pop(session_id, None)
+            self._locks.pop(session_id, None)
+
+
+# 全局实例
+adaptive_sessions = AdaptiveSessionStore()
@@ -0,0 +1,102 @@
+"""
+LLM / RAG 请求录制与回放（cassette）
+- record: 每次上游调用后将 (请求摘要, 响应) 追加写入 JSONL 文件
+- replay: 按请求内容哈希从文件中取响应，不访问网络；同一请求录制多次时按顺序循环回放
+用于离线、可复现地压测与基准测试，避免消耗真实 token
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+from config import settings
+
+MODE_OFF = "off"
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+
+
+class CassetteMiss(Exception):
+    """回放模式下找不到对应的录制记录"""
+
+
+def rag_request_key(dataset_id: str, query: str, top_k: int, similarity_threshold: float) -> str:
+    raw = json.dumps([dataset_id, query, int(top_k), float(similarity_threshold)], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """JSONL 格式的请求/响应日志"""
+
+    def __init__(self, path: str, mode: str = MODE_OFF):
+        self.path = path
+        self.mode = mode if path else MODE_OFF
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, List[Any]]] = None
+        self._cursors: Dict[str, int] = {}
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == MODE_RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == MODE_REPLAY
+
+    def _load(self) -> Dict[str, List[Any]]:
+        """读取录制文件（调用方持锁）"""
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.path):
+                with open(self.path, encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        entry = json.loads(line)
+                        self._entries.setdefault(f"{entry['kind']}:{entry['key']}", []).append(entry["response"])
+        return self._entries
+
+    def record(self, kind: str, key: str, request: Dict[str, Any], response: Any):
+        """追加一条录制记录"""
+        if not self.recording:
+            return
+        line = json.dumps(
+            {"kind": kind, "key": key, "request": request, "response": response},
+            ensure_ascii=False,
+            separators=(",", ":")
+        )
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            if self._entries is not None:
+                self._entries.setdefault(f"{kind}:{key}", []).append(response)
+            self.recorded += 1
+
+    def lookup(self, kind: str, key: str) -> Any:
+        """回放一条记录，找不到时抛出 CassetteMiss"""
+        with self._lock:
+            responses = self._load().get(f"{kind}:{key}")
+            if not responses:
+                self.misses += 1
+                raise CassetteMiss(f"cassette 中没有 {kind} 请求 {key[:12]} 的录制记录")
+            cursor = self._cursors.get(f"{kind}:{key}", 0)
+            self._cursors[f"{kind}:{key}"] = cursor + 1
+            self.replayed += 1
+            return responses[cursor % len(responses)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "path": self.path,
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "misses": self.misses
+        }
+
+
+# 全局 cassette 实例（默认关闭）
+cassette = Cassette(settings.cassette_path, settings.cassette_mode)
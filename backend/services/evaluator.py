@@ -2,9 +2,19 @@
 能力评估服务
 基于 LLM + 知识库进行结构化评分
 """
-from typing import Dict, Any, Optional
+import asyncio
+from typing import Dict, Any, Optional, AsyncIterator, List, Tuple
+from pydantic import ValidationError
+from models.schemas import EvaluationResult
 from services.llm_service import llm_service
-from config import ABILITY_DIMENSIONS
+from services.model_cascade import model_cascade
+from services.self_consistency import self_consistency_stats
+from services.prompt_compactor import compact_text
+from services.token_estimator import estimate_tokens
+from config import ABILITY_DIMENSIONS, settings
+
+# 单次批量评分的输出 token 上限（受模型最大输出长度限制）
+BATCH_MAX_OUTPUT_TOKENS = 8000
 
 
 # 评估的系统提示
@@ -64,6 +74,97 @@ EVALUATE_USER_PROMPT = """请评估候选人对以下问题的回答。
 3. 评价要具体客观，有建设性"""
 
 
+# 批量评估：多道题打包进一次调用，共享同一份系统提示
+EVALUATE_BATCH_USER_PROMPT = """请分别评估候选人对以下 {count} 道问题的回答，每道题独立评分，互不影响。
+
+{items}
+
+【输出要求】
+以严格的 JSON 数组格式输出，按题目顺序每题一个对象，共 {count} 个：
+[
+  {{
+    "index": 1,
+    "score": X.X,
+    "dimension": "该题的考察维度标识",
+    "evidence_sentences": [
+      "「引用原文1」- 说明亮点/不足✓/✗",
+      "「引用原文2」- 说明亮点/不足✓/✗"
+    ],
+    "strengths": ["优势1", "优势2"],
+    "weaknesses": ["不足1"],
+    "comment": "综合评价（100-150字）"
+  }}
+]
+
+注意：
+1. index 与题目编号一致
+2. 分数必须是 0.0 到 10.0 之间的浮点数
+3. 证据句必须是该题候选人回答的原文
+4. 评价要具体客观，有建设性"""
+
+
+EVALUATE_BATCH_ITEM = """【第 {index} 题】
+面试问题：{question_text}
+考察维度：{dimension}（{dimension_name}）
+参考资料：{context}
+候选人回答：{answer}"""
+
+
+def _prompt_fields(question: Dict[str, Any], answer: str) -> Dict[str, str]:
+    """单题评估 prompt 的填充字段"""
+    dimension = question.get("dimension", "")
+    dimension_info = ABILITY_DIMENSIONS.get(dimension, {})
+    
+    # 获取参考上下文（历史题目可能带有未压缩的长上下文，按题目文本挑选相关句子）
+    context = compact_text(
+        question.get("reference_context") or "无参考资料",
+        query=question.get("text", ""),
+        budget=settings.prompt_budget_evaluate_context,
+        call_site="evaluator"
+    )
+    
+    return {
+        "question_text": question.get("text", ""),
+        "dimension": dimension,
+        "dimension_name": dimension_info.get("name", dimension),
+        "context": context,
+        "answer": answer
+    }
+
+
+def build_evaluate_prompt(question: Dict[str, Any], answer: str) -> str:
+    """构建评估的用户提示"""
+    return EVALUATE_USER_PROMPT.format(**_prompt_fields(question, answer))
+
+
+def normalize_evaluation(result: Optional[Dict[str, Any]], dimension: str) -> Optional[Dict[str, Any]]:
+    """校正 LLM 返回的评估结果（分数范围、维度、缺失字段）；不是非空对象时返回 None"""
+    if not isinstance(result, dict) or not result:
+        return None
+    
+    # 确保分数在合理范围
+    score = result.get("score", 0)
+    if isinstance(score, (int, float)):
+        result["score"] = max(0, min(10, float(score)))
+    else:
+        result["score"] = 0.0
+    
+    # 确保维度正确
+    result["dimension"] = dimension
+    
+    # 确保列表字段存在
+    if "evidence_sentences" not in result:
+        result["evidence_sentences"] = []
+    if "strengths" not in result:
+        result["strengths"] = []
+    if "weaknesses" not in result:
+        result["weaknesses"] = []
+    if "comment" not in result:
+        result["comment"] = ""
+    
+    return result
+
+
 async def evaluate_answer(
     question: Dict[str, Any],
     answer: str
@@ -78,97 +179,422 @@ async def evaluate_answer(
     Returns:
         评估结果字典
     """
-    dimension = question.get("dimension", "")
-    dimension_info = ABILITY_DIMENSIONS.get(dimension, {})
-    dimension_name = dimension_info.get("name", dimension)
+    if settings.evaluate_self_consistency_enabled:
+        return await evaluate_answer_consistent(question, answer)
+    if not model_cascade.active:
+        return await _grade(question, answer, "evaluator")
     
-    # 获取参考上下文
-    context = question.get("reference_context", "无参考资料")
+    try:
+        fast = await _grade(question, answer, "evaluator_fast", strict=True)
+    except Exception as e:
+        print(f"⚠️ 便宜模型评分失败，升级到主模型: {str(e)}")
+        fast = None
+    return await _settle_cascade(question, answer, fast)
+
+
+async def _grade(
+    question: Dict[str, Any],
+    answer: str,
+    call_site: str,
+    strict: bool = False,
+    temperature: float = 0.3,
+    use_cache: bool = True
+) -> Optional[Dict[str, Any]]:
+    """单题评分；strict 时缺少数值分数的结果视为不合法，返回 None"""
+    result = await llm_service.chat_completion_json(
+        system_prompt=EVALUATE_SYSTEM_PROMPT,
+        user_prompt=build_evaluate_prompt(question, answer),
+        temperature=temperature,
+        use_cache=use_cache,
+        call_site=call_site,
+        root="{"
+    )
+    if strict and (not isinstance(result, dict) or not isinstance(result.get("score"), (int, float))):
+        return None
+    return normalize_evaluation(result, question.get("dimension", ""))
+
+
+async def evaluate_answer_consistent(
+    question: Dict[str, Any],
+    answer: str
+) -> Optional[Dict[str, Any]]:
+    """
+    多次采样评分：按 evaluate_sc_waves 分波次并发采样（不走响应缓存），每波后判断是否已足够确定。
+    返回的 score 为各次采样的平均分，confidence 为分数所在分档的置信度，samples 为采样数；
+    证据句与评语取分数最接近平均分的那次采样
+    """
+    aggregate = self_consistency_stats.aggregate()
+    samples = []
+    for size in settings.evaluate_sc_waves:
+        wave = await asyncio.gather(*[
+            _grade(
+                question, answer, "evaluator_sc", strict=True,
+                temperature=settings.evaluate_sc_temperature, use_cache=False
+            )
+            for _ in range(size)
+        ], return_exceptions=True)
+        for result in wave:
+            if isinstance(result, dict):
+                samples.append(result)
+                aggregate.add(result["score"])
+        if aggregate.settled():
+            break
     
-    user_prompt = EVALUATE_USER_PROMPT.format(
-        question_text=question.get("text", ""),
-        dimension=dimension,
-        dimension_name=dimension_name,
-        context=context,
-        answer=answer
+    if not samples:
+        return None
+    self_consistency_stats.record(aggregate)
+    representative = min(samples, key=lambda r: abs(r["score"] - aggregate.mean))
+    return dict(
+        representative,
+        score=round(aggregate.mean, 1),
+        confidence=round(aggregate.confidence, 3),
+        samples=aggregate.n
     )
+
+
+async def _settle_cascade(
+    question: Dict[str, Any],
+    answer: str,
+    fast: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """
+    决定是否采用便宜模型的评分：需要升级时改用主模型评分；
+    直接采用的结果按 llm_cascade_audit_rate 抽样与主模型对比，抽中时返回主模型结果
+    """
+    reason = model_cascade.escalation_reason(fast, question, answer)
+    model_cascade.record(reason)
+    if reason is not None:
+        return await _grade(question, answer, "evaluator")
     
-    result = await llm_service.chat_completion_json(
+    if model_cascade.should_audit():
+        try:
+            strong = await _grade(question, answer, "evaluator")
+        except Exception as e:
+            print(f"⚠️ 抽样对比评分失败: {str(e)}")
+            return fast
+        if strong:
+            model_cascade.record_audit(fast["score"], strong["score"])
+            return strong
+    return fast
+
+
+async def evaluate_answer_stream(
+    question: Dict[str, Any],
+    answer: str
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    流式评估候选人回答
+    
+    依次产出 {"type": "delta", "data": 增量文本}、
+    {"type": "field", "data": {"key", "value"}}（score、dimension 等字段完整即产出），
+    最后产出 {"type": "result", "data": 评估结果字典}
+    """
+    dimension = question.get("dimension", "")
+    user_prompt = build_evaluate_prompt(question, answer)
+    
+    async for item in llm_service.chat_completion_json_stream(
         system_prompt=EVALUATE_SYSTEM_PROMPT,
         user_prompt=user_prompt,
-        temperature=0.3
+        temperature=0.3,
+        use_cache=True,
+        call_site="evaluator",
+        root="{"
+    ):
+        if item["type"] == "result":
+            item = {"type": "result", "data": normalize_evaluation(item["data"], dimension)}
+        elif item["type"] == "field" and item["data"]["key"] == "dimension":
+            item = {"type": "field", "data": {"key": "dimension", "value": dimension}}
+        yield item
+
+
+def plan_batches(item_blocks: List[str], token_budget: int, max_items: int) -> List[List[int]]:
+    """
+    按输入 token 预算把题目切分为批次（保持原顺序）
+    
+    每批的系统提示 + 批量模板 + 各题内容不超过 token_budget，且题数不超过 max_items；
+    单题就超出预算时独占一批
+    """
+    overhead = estimate_tokens(EVALUATE_SYSTEM_PROMPT) + estimate_tokens(EVALUATE_BATCH_USER_PROMPT)
+    batches: List[List[int]] = []
+    current: List[int] = []
+    used = overhead
+    for idx, block in enumerate(item_blocks):
+        cost = estimate_tokens(block)
+        if current and (used + cost > token_budget or len(current) >= max_items):
+            batches.append(current)
+            current, used = [], overhead
+        current.append(idx)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _validate_batch_item(item: Any, dimension: str) -> Optional[Dict[str, Any]]:
+    """校验批量结果中的单项，不合法时返回 None"""
+    if not isinstance(item, dict) or not isinstance(item.get("score"), (int, float)):
+        return None
+    try:
+        result = normalize_evaluation(dict(item), dimension)
+        result.pop("index", None)
+        return EvaluationResult(**result).model_dump()
+    except ValidationError:
+        return None
+
+
+async def _evaluate_one_batch(
+    questions_and_answers: list,
+    item_blocks: List[str],
+    call_site: str = "evaluator_batch"
+) -> List[Optional[Dict[str, Any]]]:
+    """一次 LLM 调用评估一批题目；整体解析失败时返回全 None，由调用方逐题回退"""
+    user_prompt = EVALUATE_BATCH_USER_PROMPT.format(
+        count=len(item_blocks),
+        items="\n\n".join(item_blocks)
     )
+    try:
+        parsed = await llm_service.chat_completion_json(
+            system_prompt=EVALUATE_SYSTEM_PROMPT,
+            user_prompt=user_prompt,
+            temperature=0.3,
+            use_cache=True,
+            call_site=call_site,
+            max_tokens=min(
+                BATCH_MAX_OUTPUT_TOKENS,
+                settings.evaluate_batch_output_tokens_per_item * len(item_blocks)
+            )
+        )
+    except Exception as e:
+        print(f"⚠️ 批量评估失败，逐题回退: {str(e)}")
+        return [None] * len(item_blocks)
+    
+    if isinstance(parsed, dict):
+        parsed = parsed.get("results") or parsed.get("evaluations")
+    if not isinstance(parsed, list):
+        print("⚠️ 批量评估未返回 JSON 数组，逐题回退")
+        return [None] * len(item_blocks)
     
-    if result:
-        # 确保分数在合理范围
-        score = result.get("score", 0)
-        if isinstance(score, (int, float)):
-            result["score"] = max(0, min(10, float(score)))
-        else:
-            result["score"] = 0.0
+    # 优先按 index 对齐；缺少 index 且数量一致时按顺序对齐
+    by_index = {
+        item["index"]: item for item in parsed
+        if isinstance(item, dict) and isinstance(item.get("index"), int)
+    }
+    results = []
+    for pos, qa in enumerate(questions_and_answers):
+        item = by_index.get(pos + 1)
+        if item is None and not by_index and len(parsed) == len(item_blocks):
+            item = parsed[pos]
+        results.append(_validate_batch_item(item, qa["question"].get("dimension", "")))
+    return results
+
+
+async def _evaluate_single_safe(question: Dict[str, Any], answer: str) -> Optional[Dict[str, Any]]:
+    try:
+        return await evaluate_answer(question=question, answer=answer)
+    except Exception as e:
+        print(f"❌ 单题评估失败: {str(e)}")
+        return None
+
+
+class RunningReport:
+    """
+    增量汇总评估结果
+    
+    每收到一个结果即更新各维度平均分与总分，报告可以在最慢的一题返回前先行渲染
+    """
+    
+    def __init__(self, total: int = 0):
+        self.total = total
+        self._results: List[Tuple[int, Dict[str, Any]]] = []
+        self._dimension_scores: Dict[str, List[float]] = {}
+        self.completed = 0
+    
+    def add(self, index: int, result: Optional[Dict[str, Any]]):
+        """记录第 index 题的结果（失败为 None，只计入完成数）"""
+        self.completed += 1
+        if not result:
+            return
+        self._results.append((index, result))
+        
+        # 汇总各维度得分
+        dim = result.get("dimension", "")
+        if dim not in self._dimension_scores:
+            self._dimension_scores[dim] = []
+        self._dimension_scores[dim].append(result.get("score", 0))
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """当前的综合评估结果（individual_results 按题目原顺序排列）"""
+        results = [r for _, r in sorted(self._results, key=lambda item: item[0])]
+        
+        # 计算各维度平均分
+        dimension_averages = {}
+        for dim, scores in self._dimension_scores.items():
+            dimension_averages[dim] = {
+                "average_score": round(sum(scores) / len(scores), 1),
+                "question_count": len(scores)
+            }
         
-        # 确保维度正确
-        result["dimension"] = dimension
+        # 计算加权总分
+        total_score = 0
+        total_questions = len(results)
+        if total_questions > 0:
+            total_score = round(sum(r.get("score", 0) for r in results) / total_questions, 1)
         
-        # 确保列表字段存在
-        if "evidence_sentences" not in result:
-            result["evidence_sentences"] = []
-        if "strengths" not in result:
-            result["strengths"] = []
-        if "weaknesses" not in result:
-            result["weaknesses"] = []
-        if "comment" not in result:
-            result["comment"] = ""
+        return {
+            "overall_score": total_score,
+            "dimension_scores": dimension_averages,
+            "individual_results": results,
+            "total_questions": total_questions
+        }
+
+
+async def _evaluate_single_task(
+    index: int,
+    qa: Dict[str, Any],
+    semaphore: asyncio.Semaphore
+) -> List[Tuple[int, Optional[Dict[str, Any]]]]:
+    async with semaphore:
+        return [(index, await _evaluate_single_safe(qa["question"], qa["answer"]))]
+
+
+async def _settle_cascade_task(
+    index: int,
+    qa: Dict[str, Any],
+    fast: Optional[Dict[str, Any]],
+    semaphore: asyncio.Semaphore
+) -> Optional[Dict[str, Any]]:
+    async with semaphore:
+        try:
+            return await _settle_cascade(qa["question"], qa["answer"], fast)
+        except Exception as e:
+            print(f"❌ 单题评估失败: {str(e)}")
+            return None
+
+
+async def _evaluate_batch_task(
+    indices: List[int],
+    questions_and_answers: list,
+    fields: List[Dict[str, str]],
+    semaphore: asyncio.Semaphore
+) -> List[Tuple[int, Optional[Dict[str, Any]]]]:
+    """
+    评估一个批次；缺失或不合法的题目在释放名额后逐题并发回退。
+    启用评分级联时批次交给便宜模型，每道题的结果再逐题过级联判定（缺失的题目直接升级到主模型）
+    """
+    # 批内题号从 1 开始编号
+    blocks = [EVALUATE_BATCH_ITEM.format(index=n + 1, **fields[i]) for n, i in enumerate(indices)]
+    cascade = model_cascade.active
+    async with semaphore:
+        batch = await _evaluate_one_batch(
+            [questions_and_answers[i] for i in indices],
+            blocks,
+            call_site="evaluator_batch_fast" if cascade else "evaluator_batch"
+        )
+    results = list(zip(indices, batch))
     
-    return result
+    if cascade:
+        settled = await asyncio.gather(*[
+            _settle_cascade_task(i, questions_and_answers[i], r, semaphore) for i, r in results
+        ])
+        return list(zip(indices, settled))
+    
+    fallback = [i for i, r in results if r is None]
+    if fallback:
+        print(f"↩️ {len(fallback)} 道题批量结果缺失或不合法，改为单题评估")
+        retried = await asyncio.gather(*[
+            _evaluate_single_task(i, questions_and_answers[i], semaphore) for i in fallback
+        ])
+        retried_by_index = dict(pair for pairs in retried for pair in pairs)
+        results = [(i, retried_by_index.get(i, r)) for i, r in results]
+    return results
+
+
+def _build_evaluation_tasks(
+    questions_and_answers: list,
+    batched: bool,
+    semaphore: asyncio.Semaphore
+) -> list:
+    """
+    构建评估任务：批量模式按 token 预算打包（单题批次直接单题评估），否则每题一个任务；
+    每个任务返回 [(题目序号, 评估结果)]
+    """
+    if not batched or len(questions_and_answers) <= 1:
+        return [_evaluate_single_task(i, qa, semaphore) for i, qa in enumerate(questions_and_answers)]
+    
+    fields = [_prompt_fields(qa["question"], qa["answer"]) for qa in questions_and_answers]
+    batches = plan_batches(
+        [EVALUATE_BATCH_ITEM.format(index=i + 1, **f) for i, f in enumerate(fields)],
+        settings.evaluate_batch_token_budget,
+        settings.evaluate_batch_max_items
+    )
+    return [
+        _evaluate_single_task(indices[0], questions_and_answers[indices[0]], semaphore)
+        if len(indices) == 1
+        else _evaluate_batch_task(indices, questions_and_answers, fields, semaphore)
+        for indices in batches
+    ]
+
+
+async def evaluate_batch_stream(
+    questions_and_answers: list,
+    batched: Optional[bool] = None,
+    concurrency: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    并发评估多道题目，按完成顺序产出结果
+    
+    每道题完成后产出 {"type": "evaluation", "data": {"index": 题目序号, "result": 评估结果或 None,
+    "report": 当前的综合评估结果}}，全部完成后产出 {"type": "result", "data": 综合评估结果}
+    
+    Args:
+        questions_and_answers: 问题和回答列表 [{"question": {...}, "answer": "..."}]
+        batched: 是否把多道题打包进一次 LLM 调用评分；None 时取配置 evaluate_batch_enabled
+        concurrency: 同时进行的评估调用数上限；None 时取配置 evaluate_concurrency
+    """
+    if batched is None:
+        batched = settings.evaluate_batch_enabled
+    semaphore = asyncio.Semaphore(max(1, concurrency or settings.evaluate_concurrency))
+    report = RunningReport(total=len(questions_and_answers))
+    
+    tasks = [
+        asyncio.ensure_future(coro)
+        for coro in _build_evaluation_tasks(questions_and_answers, batched, semaphore)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            for index, result in await next_done:
+                report.add(index, result)
+                yield {
+                    "type": "evaluation",
+                    "data": {"index": index, "result": result, "report": report.snapshot()}
+                }
+    finally:
+        # 调用方提前退出时取消尚未完成的评估任务
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+    
+    yield {"type": "result", "data": report.snapshot()}
 
 
 async def evaluate_batch(
-    questions_and_answers: list
+    questions_and_answers: list,
+    batched: Optional[bool] = None,
+    concurrency: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     批量评估多道题目
     
     Args:
         questions_and_answers: 问题和回答列表 [{"question": {...}, "answer": "..."}]
+        batched: 是否把多道题打包进一次 LLM 调用评分；None 时取配置 evaluate_batch_enabled
+        concurrency: 同时进行的评估调用数上限；None 时取配置 evaluate_concurrency
         
     Returns:
         综合评估结果
     """
-    results = []
-    dimension_scores = {}
-    
-    for qa in questions_and_answers:
-        result = await evaluate_answer(
-            question=qa["question"],
-            answer=qa["answer"]
-        )
-        if result:
-            results.append(result)
-            
-            # 汇总各维度得分
-            dim = result.get("dimension", "")
-            if dim not in dimension_scores:
-                dimension_scores[dim] = []
-            dimension_scores[dim].append(result.get("score", 0))
-    
-    # 计算各维度平均分
-    dimension_averages = {}
-    for dim, scores in dimension_scores.items():
-        dimension_averages[dim] = {
-            "average_score": round(sum(scores) / len(scores), 1),
-            "question_count": len(scores)
-        }
-    
-    # 计算加权总分
-    total_score = 0
-    total_questions = len(results)
-    if total_questions > 0:
-        total_score = round(sum(r.get("score", 0) for r in results) / total_questions, 1)
-    
-    return {
-        "overall_score": total_score,
-        "dimension_scores": dimension_averages,
-        "individual_results": results,
-        "total_questions": total_questions
-    }
+    report = None
+    async for item in evaluate_batch_stream(questions_and_answers, batched, concurrency):
+        if item["type"] == "result":
+            report = item["data"]
+    return report
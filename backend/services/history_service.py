@@ -5,6 +5,7 @@ from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
 from database import Candidate, Interview, InterviewRound, QuestionRecord, CompanyScale
 from models.schemas import EvaluationResult
+from services.question_dedup import dedup_report
 import json
 
 class HistoryService:
@@ -92,4 +93,9 @@ class HistoryService:
     def get_all_interviews(self, db: Session) -> List[Interview]:
          return db.query(Interview).order_by(Interview.created_at.desc()).all()
 
+    def dedup_report(self, db: Session, threshold: Optional[float] = None) -> Dict[str, Any]:
+        """全部历史题目的近似重复报告，组内 key 为题目记录 ID"""
+        rows = db.query(QuestionRecord.id, QuestionRecord.text).order_by(QuestionRecord.id).yield_per(1000)
+        return dedup_report(((row.id, row.text or "") for row in rows), threshold=threshold)
+
 history_service = HistoryService()
@@ -0,0 +1,185 @@
+"""
+增量 JSON 解析器
+逐段消费 LLM 流式输出，顶层字段（或数组元素）一旦完整即产出；
+容忍 markdown 代码块包裹，并能修复被截断的尾部 JSON
+"""
+import json
+from typing import Any, List, Optional, Tuple
+
+_CLOSERS = {"{": "}", "[": "]"}
+# 左括号之后第一个非空白字符属于这些字符时才视为 JSON 的开始（排除说明文字里的「[注]」之类）
+_JSON_STARTS = {
+    "{": set('"}'),
+    "[": set('{["]-0123456789tfn')
+}
+
+
+class StreamingJSONParser:
+    """
+    增量解析顶层 JSON 对象/数组
+
+    用法:
+        parser = StreamingJSONParser()
+        for delta in stream:
+            for key, value in parser.feed(delta):
+                ...  # 对象产出 (字段名, 值)，数组产出 (下标, 元素)
+        result = parser.finish()
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        """
+        Args:
+            root: 期望的顶层容器 "{" 或 "["；为 None 时取输出中先出现的、后面紧跟 JSON 内容的那个
+        """
+        self.root = root
+        # 已看到、但还没确认后面是否为 JSON 内容的左括号
+        self._pending: Optional[str] = None
+        self._failed = 0
+        self._started = False
+        self._done = False
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        # 当前顶层成员的原始文本（不含分隔逗号）
+        self._member: List[str] = []
+        self._items: list = []
+        self._fields: dict = {}
+
+    @property
+    def is_array(self) -> bool:
+        return self.root == "["
+
+    def feed(self, chunk: str) -> List[Tuple[Any, Any]]:
+        """消费一段增量文本，返回本次新完成的顶层成员"""
+        emitted = []
+        for ch in chunk:
+            if self._done:
+                break
+
+            if not self._started:
+                # 跳过代码块标记和前置说明文字：左括号后第一个非空白字符像 JSON 才开始解析
+                if self._pending is not None:
+                    if ch.isspace():
+                        continue
+                    if ch in _JSON_STARTS[self._pending]:
+                        self.root = self._pending
+                        self._started = True
+                        self._stack.append(self._pending)
+                    self._pending = None
+                if not self._started:
+                    if ch in _CLOSERS and (self.root is None or ch == self.root):
+                        self._pending = ch
+                    continue
+
+            if self._in_string:
+                self._member.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in _CLOSERS:
+                self._stack.append(ch)
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if not self._stack:
+                    self._done = True
+                    member = self._complete_member()
+                    if member is not None:
+                        emitted.append(member)
+                    break
+            elif ch == "," and len(self._stack) == 1:
+                member = self._complete_member()
+                if member is not None:
+                    emitted.append(member)
+                continue
+
+            self._member.append(ch)
+        return emitted
+
+    def _decode_member(self, text: str) -> Optional[Tuple[Any, Any]]:
+        """将一个顶层成员的文本解析为 (键, 值)；空白返回 None，无法解析时抛出 json.JSONDecodeError"""
+        if not text.strip():
+            return None
+        if self.is_array:
+            return len(self._items), json.loads(text)
+        obj = json.loads("{" + text + "}")
+        if not obj:
+            return None
+        return next(iter(obj.items()))
+
+    def _store(self, member: Tuple[Any, Any]):
+        key, value = member
+        if self.is_array:
+            self._items.append(value)
+        else:
+            self._fields[key] = value
+
+    def _complete_member(self) -> Optional[Tuple[Any, Any]]:
+        text = "".join(self._member)
+        self._member = []
+        try:
+            member = self._decode_member(text)
+        except json.JSONDecodeError:
+            self._failed += 1
+            return None
+        if member is not None:
+            self._store(member)
+        return member
+
+    def _repair_partial(self) -> Optional[Tuple[Any, Any]]:
+        """尝试补全被截断的最后一个成员：闭合字符串与括号，失败则丢弃"""
+        text = "".join(self._member)
+        if self._in_string:
+            if self._escape:
+                text = text[:-1]
+            text += '"'
+        closers = "".join(_CLOSERS[c] for c in reversed(self._stack[1:]))
+        candidates = [text + closers, text.rstrip().rstrip(",") + closers]
+        for candidate in candidates:
+            try:
+                member = self._decode_member(candidate)
+            except json.JSONDecodeError:
+                continue
+            if member is not None:
+                return member
+        return None
+
+    def finish(self) -> Any:
+        """
+        结束解析并返回完整结果
+
+        输出被截断时尽量补全最后一个成员（补不全则丢弃该成员）。以下情况抛出 ValueError：
+        没有找到 JSON、有成员无法解析、或没有解析出任何成员
+        """
+        if not self._started:
+            raise ValueError("无法解析 LLM 响应为 JSON: 未找到 JSON 对象")
+
+        if not self._done:
+            member = self._repair_partial()
+            if member is not None:
+                self._store(member)
+            self._member = []
+            self._done = True
+
+        if self._failed:
+            raise ValueError(f"无法解析 LLM 响应为 JSON: {self._failed} 个成员格式错误")
+        if not self._items and not self._fields:
+            raise ValueError("无法解析 LLM 响应为 JSON: 没有解析出任何字段")
+
+        if self.is_array:
+            return list(self._items)
+        return dict(self._fields)
+
+
+def parse_json_lenient(text: str, root: Optional[str] = None) -> Any:
+    """一次性解析完整文本，规则同 StreamingJSONParser"""
+    parser = StreamingJSONParser(root=root)
+    parser.feed(text)
+    return parser.finish()
@@ -0,0 +1,278 @@
+"""
+LLM 响应缓存
+按 (model, system_prompt, user_prompt, temperature, max_tokens) 的内容哈希缓存完整响应文本，
+分为内存 LRU 层和 SQLite 磁盘层（带 TTL 与条目数上限淘汰）
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+from config import settings
+
+
+def make_cache_key(
+    model: str,
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float,
+    max_tokens: int
+) -> str:
+    """生成内容寻址的缓存键"""
+    raw = json.dumps(
+        [model, system_prompt, user_prompt, round(float(temperature), 4), int(max_tokens)],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    两级 LLM 响应缓存：内存 LRU + SQLite
+
+    事件循环中使用 aget / aset / adelete：内存层命中直接返回，磁盘层的查询与提交放到线程池执行，
+    不阻塞事件循环。磁盘命中时的 accessed_at 更新先记在内存里，随下一次写入（或积累到
+    TOUCH_FLUSH_SIZE 条时）批量提交，不为每次读取单独 commit
+    """
+
+    # 积累多少条待写回的 accessed_at 后单独提交一次
+    TOUCH_FLUSH_SIZE = 64
+
+    def __init__(
+        self,
+        db_path: str,
+        memory_size: int = 256,
+        ttl_seconds: int = 7 * 24 * 3600,
+        max_entries: int = 10000
+    ):
+        self.db_path = db_path
+        self.memory_size = memory_size
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        # _lock 保护内存层与计数，_disk_lock 保护 SQLite 连接；磁盘操作不阻塞内存层命中
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes_since_evict = 0
+        self._touched: Dict[str, float] = {}
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def has_disk(self) -> bool:
+        return bool(self.db_path)
+
+    def _get_conn(self) -> Optional[sqlite3.Connection]:
+        """懒加载 SQLite 连接，失败时退化为仅内存缓存（调用方持 _disk_lock）"""
+        if self._conn is None and self.db_path:
+            try:
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache ("
+                    " key TEXT PRIMARY KEY,"
+                    " value TEXT NOT NULL,"
+                    " created_at REAL NOT NULL,"
+                    " accessed_at REAL NOT NULL)"
+                )
+                self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed_at)")
+                self._conn.commit()
+            except Exception as e:
+                print(f"[LLMCache] 磁盘缓存不可用，仅使用内存缓存: {e}")
+                self._conn = None
+                self.db_path = ""
+        return self._conn
+
+    def _remember(self, key: str, value: str, created_at: float):
+        """写入内存 LRU 层（调用方持 _lock）"""
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+        return None
+
+    def _flush_touched(self, conn: sqlite3.Connection):
+        """把积累的 accessed_at 写回（不提交，调用方持 _disk_lock）"""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            conn.executemany(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in touched.items()]
+            )
+
+    def _disk_get(self, key: str, now: float) -> Optional[str]:
+        """磁盘层查询（阻塞，事件循环中经 aget 在线程池执行）"""
+        value = None
+        with self._disk_lock:
+            conn = self._get_conn()
+            if conn is not None:
+                row = conn.execute(
+                    "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if now - row[1] <= self.ttl_seconds:
+                        value = row[0]
+                    else:
+                        conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                        conn.commit()
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self._remember(key, value, row[1])
+            self._touched[key] = now
+            self.disk_hits += 1
+            flush = len(self._touched) >= self.TOUCH_FLUSH_SIZE
+        if flush:
+            with self._disk_lock:
+                conn = self._get_conn()
+                if conn is not None:
+                    self._flush_touched(conn)
+                    conn.commit()
+        return value
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，未命中或已过期返回 None（阻塞版本，供线程中使用）"""
+        now = time.time()
+        value = self._memory_get(key, now)
+        return value if value is not None else self._disk_get(key, now)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """事件循环中读取缓存：内存层直接返回，磁盘层在线程池查询"""
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is not None:
+            return value
+        if not self.has_disk:
+            with self._lock:
+                self.misses += 1
+            return None
+        return await asyncio.to_thread(self._disk_get, key, now)
+
+    def _disk_set(self, key: str, value: str, now: float):
+        with self._disk_lock:
+            conn = self._get_conn()
+            if conn is None:
+                return
+            self._flush_touched(conn)
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            conn.commit()
+            self._writes_since_evict += 1
+            if self._writes_since_evict >= 50:
+                self._evict(conn, now)
+
+    def set(self, key: str, value: str):
+        """写入缓存（阻塞版本，供线程中使用）"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+        self._disk_set(key, value, now)
+
+    async def aset(self, key: str, value: str):
+        """事件循环中写入缓存：内存层立即生效，磁盘写入与提交在线程池执行"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+        if self.has_disk:
+            await asyncio.to_thread(self._disk_set, key, value, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """淘汰过期条目，并按最近访问时间裁剪到 max_entries（调用方持 _disk_lock）"""
+        self._writes_since_evict = 0
+        self._flush_touched(conn)
+        cur = conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        evicted = cur.rowcount
+        count = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            cur = conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,)
+            )
+            evicted += cur.rowcount
+        conn.commit()
+        with self._lock:
+            self.evictions += evicted
+
+    def _disk_delete(self, key: str):
+        with self._disk_lock:
+            conn = self._get_conn()
+            if conn is not None:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+
+    def delete(self, key: str):
+        """删除单个条目"""
+        with self._lock:
+            self._memory.pop(key, None)
+            self._touched.pop(key, None)
+        self._disk_delete(key)
+
+    async def adelete(self, key: str):
+        with self._lock:
+            self._memory.pop(key, None)
+            self._touched.pop(key, None)
+        if self.has_disk:
+            await asyncio.to_thread(self._disk_delete, key)
+
+    def clear(self):
+        """清空两级缓存"""
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+        with self._disk_lock:
+            conn = self._get_conn()
+            if conn is not None:
+                conn.execute("DELETE FROM llm_cache")
+                conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计，用于评估缓存容量（查询磁盘条目数，事件循环中经线程池调用）"""
+        disk_entries = 0
+        with self._disk_lock:
+            conn = self._get_conn()
+            if conn is not None:
+                disk_entries = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries
+            }
+
+
+# 全局 LLM 缓存实例
+llm_cache = LLMCache(
+    db_path=settings.llm_cache_path,
+    memory_size=settings.llm_cache_memory_size,
+    ttl_seconds=settings.llm_cache_ttl_seconds,
+    max_entries=settings.llm_cache_max_entries
+)
@@ -0,0 +1,282 @@
+"""
+LLM 全局并发调度器
+- 进程级在途请求上限（AIMD 自适应：成功时加性增长，429/高延迟时乘性收缩）
+- 每分钟请求数 / token 数令牌桶限流
+- 全局重试预算：预算耗尽时快速失败，避免 429 风暴下的重试放大
+
+注意：Streamlit 每次 run_async 都会新建事件循环，且不同会话运行在不同线程，
+因此这里不使用绑定事件循环的 asyncio.Semaphore，而是以线程锁保护状态、
+按等待者所在的事件循环唤醒。
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Optional, Dict, Any
+from config import settings
+
+
+class TokenBucket:
+    """令牌桶（允许透支，透支部分通过等待偿还，保证先到先得）"""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self.level = rate_per_minute
+        self.updated_at = time.monotonic()
+
+    def reserve(self, amount: float) -> float:
+        """预留额度，返回需要等待的秒数（调用方持锁）"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        self.level -= amount
+        if self.level >= 0:
+            return 0.0
+        return -self.level / self.rate
+
+    def try_reserve(self, amount: float) -> bool:
+        """额度足够时立即预留并返回 True，否则不预留、返回 False（调用方持锁）"""
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.level < amount:
+            return False
+        self.level -= amount
+        return True
+
+    def adjust(self, amount: float):
+        """按实际用量修正预留额度（正数为补扣，负数为退还）"""
+        if self.rate > 0:
+            self.level = min(self.capacity, self.level - amount)
+
+
+class LLMGovernor:
+    """进程级 LLM 请求调度器"""
+
+    def __init__(
+        self,
+        max_in_flight: int = 16,
+        min_in_flight: int = 1,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        latency_target: float = 20.0,
+        retry_budget_ratio: float = 0.2,
+        retry_budget_min: float = 10.0
+    ):
+        self.max_in_flight = max_in_flight
+        self.min_in_flight = min_in_flight
+        self.latency_target = latency_target
+        self.retry_budget_ratio = retry_budget_ratio
+        self.retry_budget_min = retry_budget_min
+
+        self._lock = threading.Lock()
+        self._limit = float(max_in_flight)
+        self._in_flight = 0
+        self._waiters: deque = deque()
+        self._request_bucket = TokenBucket(requests_per_minute)
+        self._token_bucket = TokenBucket(tokens_per_minute)
+        self._retry_budget = retry_budget_min
+
+        self.total_requests = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.budget_exhausted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.peak_queue_depth = 0
+        self.hedges_denied = 0
+
+    @property
+    def limit(self) -> int:
+        """当前自适应并发上限"""
+        return max(self.min_in_flight, int(self._limit))
+
+    # --- 并发槽位 ---
+
+    async def _acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return
+            waiter = _Waiter(loop.create_future())
+            self._waiters.append(waiter)
+            self.peak_queue_depth = max(self.peak_queue_depth, len(self._waiters))
+        try:
+            # 被唤醒时名额已由 _wake_locked 代为占用
+            await waiter.fut
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    # 已分到名额却被取消，把名额让给下一个等待者
+                    self._in_flight -= 1
+                    self._wake_locked()
+                elif waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            raise
+
+    def _wake_locked(self):
+        """按当前上限唤醒等待者，并为其预占名额（调用方持锁）"""
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            fut_loop = waiter.fut.get_loop()
+            if waiter.fut.done() or fut_loop.is_closed():
+                continue
+            waiter.granted = True
+            self._in_flight += 1
+            fut_loop.call_soon_threadsafe(_set_waiter_result, waiter.fut)
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._wake_locked()
+
+    @asynccontextmanager
+    async def slot(self):
+        """占用一个在途请求名额，并记录排队等待时间"""
+        start = time.perf_counter()
+        await self._acquire()
+        wait = time.perf_counter() - start
+        with self._lock:
+            self.total_requests += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self._retry_budget = min(
+                self._retry_budget + self.retry_budget_ratio,
+                max(self.retry_budget_min, self.max_in_flight * 2.0)
+            )
+        try:
+            yield wait
+        finally:
+            self._release()
+
+    def try_hedge_slot(self, estimated_tokens: int) -> Optional[Callable[[], None]]:
+        """
+        为对冲副本非阻塞地申请名额与限流额度：有请求排队、并发已满或令牌桶额度不足时不发对冲（返回 None），
+        否则占用一个在途名额并预留一次请求与 estimated_tokens 的额度，返回释放名额的回调
+        """
+        with self._lock:
+            if self._waiters or self._in_flight >= self.limit:
+                self.hedges_denied += 1
+                return None
+            if not self._request_bucket.try_reserve(1):
+                self.hedges_denied += 1
+                return None
+            if not self._token_bucket.try_reserve(estimated_tokens):
+                self._request_bucket.adjust(-1)
+                self.hedges_denied += 1
+                return None
+            self._in_flight += 1
+            self.total_requests += 1
+        return self._release
+
+    # --- 限流 ---
+
+    async def throttle(self, estimated_tokens: int) -> float:
+        """按每分钟请求数 / token 数限流，返回等待秒数"""
+        with self._lock:
+            delay = max(
+                self._request_bucket.reserve(1),
+                self._token_bucket.reserve(estimated_tokens)
+            )
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def settle_tokens(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """用 response.usage 的实际 token 数修正预估"""
+        if actual_tokens is None:
+            return
+        with self._lock:
+            self._token_bucket.adjust(actual_tokens - estimated_tokens)
+
+    # --- AIMD 信号 ---
+
+    def on_success(self, latency: float):
+        with self._lock:
+            if self.latency_target > 0 and latency > self.latency_target:
+                self._limit = max(float(self.min_in_flight), self._limit * 0.9)
+            else:
+                self._limit = min(float(self.max_in_flight), self._limit + 1.0 / max(self._limit, 1.0))
+                self._wake_locked()
+
+    def on_failure(self, rate_limited: bool):
+        with self._lock:
+            if rate_limited:
+                self.rate_limited += 1
+                self._limit = max(float(self.min_in_flight), self._limit * 0.5)
+
+    def take_retry(self) -> bool:
+        """消耗一次重试预算；预算耗尽返回 False（调用方应快速失败）"""
+        with self._lock:
+            if self._retry_budget >= 1.0:
+                self._retry_budget -= 1.0
+                self.retries += 1
+                return True
+            self.budget_exhausted += 1
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "queue_depth": len(self._waiters),
+                "peak_queue_depth": self.peak_queue_depth,
+                "concurrency_limit": self.limit,
+                "max_in_flight": self.max_in_flight,
+                "total_requests": self.total_requests,
+                "avg_wait_seconds": round(self.total_wait / self.total_requests, 4) if self.total_requests else 0.0,
+                "max_wait_seconds": round(self.max_wait, 4),
+                "rate_limited": self.rate_limited,
+                "retries": self.retries,
+                "retry_budget": round(self._retry_budget, 2),
+                "retry_budget_exhausted": self.budget_exhausted,
+                "hedges_denied": self.hedges_denied
+            }
+
+
+class _Waiter:
+    """排队中的请求"""
+    __slots__ = ("fut", "granted")
+
+    def __init__(self, fut: asyncio.Future):
+        self.fut = fut
+        self.granted = False
+
+
+def _set_waiter_result(fut: asyncio.Future):
+    if not fut.done():
+        fut.set_result(None)
+
+
+def backoff_delay(
+    attempt: int,
+    retry_after: Optional[float] = None,
+    base: Optional[float] = None,
+    cap: Optional[float] = None
+) -> float:
+    """指数退避 + 全抖动；服务端给出 Retry-After 时以其为下限。base/cap 默认取 LLM 的退避配置"""
+    base = settings.llm_backoff_base if base is None else base
+    cap = settings.llm_backoff_max if cap is None else cap
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
+
+
+# 全局调度器实例
+llm_governor = LLMGovernor(
+    max_in_flight=settings.llm_max_in_flight,
+    min_in_flight=settings.llm_min_in_flight,
+    requests_per_minute=settings.llm_requests_per_minute,
+    tokens_per_minute=settings.llm_tokens_per_minute,
+    latency_target=settings.llm_latency_target_seconds,
+    retry_budget_ratio=settings.llm_retry_budget_ratio
+)
@@ -0,0 +1,188 @@
+"""
+LLM 调用埋点
+按调用点（profile_parser / question_generator / evaluator …）聚合：
+调用次数、错误、缓存命中、prompt/completion token、耗时与排队等待直方图、JSON 解析失败、预估成本
+"""
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+from config import settings
+
+# 直方图桶上界（秒）
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0]
+
+
+class Histogram:
+    """固定桶直方图"""
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """按桶上界近似分位数"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def cumulative(self) -> List[int]:
+        result, seen = [], 0
+        for c in self.counts:
+            seen += c
+            result.append(seen)
+        return result
+
+
+class CallSiteStats:
+    """单个调用点的聚合数据"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.parse_failures = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queue_wait = Histogram(LATENCY_BUCKETS)
+        # 按每次调用所用模型的单价累计（同一调用点可能分别走便宜模型与主模型）
+        self.cost = 0.0
+
+
+def model_price(model: Optional[str]) -> Tuple[float, float]:
+    """模型的 (输入, 输出) 每 1K token 单价；未在 llm_model_prices 中配置的用默认单价"""
+    prices = settings.llm_model_prices.get(model or "", {})
+    return (
+        prices.get("input", settings.llm_price_input_per_1k),
+        prices.get("output", settings.llm_price_output_per_1k)
+    )
+
+
+class LLMMetrics:
+    """按调用点聚合的 LLM 指标"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sites: Dict[str, CallSiteStats] = {}
+
+    def _site(self, call_site: str) -> CallSiteStats:
+        site = self._sites.get(call_site)
+        if site is None:
+            site = self._sites[call_site] = CallSiteStats()
+        return site
+
+    def record_call(
+        self,
+        call_site: str,
+        wall_time: float,
+        queue_wait: float = 0.0,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        error: bool = False,
+        model: Optional[str] = None
+    ):
+        """记录一次上游调用（model 用于按模型单价计算成本）"""
+        input_price, output_price = model_price(model)
+        with self._lock:
+            site = self._site(call_site)
+            site.calls += 1
+            if error:
+                site.errors += 1
+            site.latency.observe(wall_time)
+            site.queue_wait.observe(queue_wait)
+            site.prompt_tokens += prompt_tokens or 0
+            site.completion_tokens += completion_tokens or 0
+            site.cost += (
+                (prompt_tokens or 0) / 1000 * input_price
+                + (completion_tokens or 0) / 1000 * output_price
+            )
+
+    def record_cache_hit(self, call_site: str):
+        with self._lock:
+            self._site(call_site).cache_hits += 1
+
+    def record_parse_failure(self, call_site: str):
+        with self._lock:
+            self._site(call_site).parse_failures += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """各调用点的汇总（供 JSON 接口和 Streamlit 侧边栏展示）"""
+        with self._lock:
+            result = {}
+            for name, site in sorted(self._sites.items()):
+                result[name] = {
+                    "calls": site.calls,
+                    "errors": site.errors,
+                    "cache_hits": site.cache_hits,
+                    "parse_failures": site.parse_failures,
+                    "prompt_tokens": site.prompt_tokens,
+                    "completion_tokens": site.completion_tokens,
+                    "avg_latency_seconds": round(site.latency.total / site.latency.count, 3) if site.latency.count else 0.0,
+                    "p50_latency_seconds": site.latency.quantile(0.5),
+                    "p95_latency_seconds": site.latency.quantile(0.95),
+                    "avg_queue_wait_seconds": round(site.queue_wait.total / site.queue_wait.count, 3) if site.queue_wait.count else 0.0,
+                    "estimated_cost": round(site.cost, 4)
+                }
+            return result
+
+    def render_prometheus(self) -> str:
+        """Prometheus 文本格式输出"""
+        lines = []
+        with self._lock:
+            sites = sorted(self._sites.items())
+
+            counters = [
+                ("aipm_llm_calls_total", "LLM 上游调用次数", lambda s: s.calls),
+                ("aipm_llm_errors_total", "LLM 调用失败次数", lambda s: s.errors),
+                ("aipm_llm_cache_hits_total", "LLM 响应缓存命中次数", lambda s: s.cache_hits),
+                ("aipm_llm_parse_failures_total", "LLM JSON 解析失败次数", lambda s: s.parse_failures),
+                ("aipm_llm_prompt_tokens_total", "prompt token 总数", lambda s: s.prompt_tokens),
+                ("aipm_llm_completion_tokens_total", "completion token 总数", lambda s: s.completion_tokens),
+                ("aipm_llm_cost_total", "按配置单价估算的累计成本", lambda s: round(s.cost, 6)),
+            ]
+            for metric, help_text, getter in counters:
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for name, site in sites:
+                    lines.append(f'{metric}{{call_site="{name}"}} {getter(site)}')
+
+            histograms = [
+                ("aipm_llm_latency_seconds", "LLM 调用耗时", lambda s: s.latency),
+                ("aipm_llm_queue_wait_seconds", "LLM 调度排队等待时间", lambda s: s.queue_wait),
+            ]
+            for metric, help_text, getter in histograms:
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} histogram")
+                for name, site in sites:
+                    hist = getter(site)
+                    cumulative = hist.cumulative()
+                    for bound, value in zip(hist.buckets + ["+Inf"], cumulative):
+                        lines.append(f'{metric}_bucket{{call_site="{name}",le="{bound}"}} {value}')
+                    lines.append(f'{metric}_sum{{call_site="{name}"}} {round(hist.total, 6)}')
+                    lines.append(f'{metric}_count{{call_site="{name}"}} {hist.count}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._sites.clear()
+
+
+# 全局指标实例
+llm_metrics = LLMMetrics()
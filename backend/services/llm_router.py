@@ -0,0 +1,267 @@
+"""
+多端点 LLM 路由
+- 维护多个 OpenAI 兼容端点（DeepSeek 及自建镜像等）各自的滚动 p50/p95 延迟与错误率
+- 每次调用路由到当前最优端点；失败后下次重试自然转向其他端点
+- 可选对冲请求：首个请求超过其 p95 仍未返回时向次优端点发出副本，先返回者胜出，另一个取消
+"""
+import asyncio
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from config import settings
+
+# 错误样本的有效期：超过该时间的失败不再影响路由，使故障端点有机会被重新探测
+ERROR_WINDOW_SECONDS = 300.0
+
+
+class LLMEndpoint:
+    """单个 OpenAI 兼容端点及其滚动统计"""
+
+    def __init__(self, name: str, base_url: str, api_key: str, model: str, window: int = 200):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self._latencies: deque = deque(maxlen=window)
+        self._outcomes: deque = deque(maxlen=50)
+        # 每个事件循环各自的客户端（循环被回收后条目自动消失）
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+        self._clients_lock = threading.Lock()
+
+    def get_client(self) -> AsyncOpenAI:
+        """
+        获取当前事件循环的异步客户端
+
+        同一事件循环内共享一个 keep-alive 连接池；Streamlit 每次 run_async 会新建事件循环，
+        题目预取、题库补货在后台线程中各自运行事件循环，因此按循环分别持有客户端，
+        不同循环（线程）之间互不替换、不共用绑定在其他循环上的连接。
+        """
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            client = self._clients.get(loop)
+            if client is None:
+                if not self.api_key:
+                    raise ValueError("LLM API Key 未配置，请在 .env 文件中设置 LLM_API_KEY")
+                client = AsyncOpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    timeout=settings.llm_timeout,
+                    max_retries=0,  # 重试由调度器统一处理
+                    http_client=DefaultAsyncHttpxClient(
+                        limits=httpx.Limits(
+                            max_connections=settings.llm_max_connections,
+                            max_keepalive_connections=settings.llm_max_keepalive_connections
+                        )
+                    )
+                )
+                self._clients[loop] = client
+        return client
+
+    async def aclose(self):
+        """关闭当前事件循环的客户端（事件循环结束前调用）；已关闭循环上的客户端无法再使用，一并丢弃"""
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            client = self._clients.pop(loop, None)
+            for stale in [l for l in self._clients if l.is_closed()]:
+                del self._clients[stale]
+        if client is not None:
+            await client.close()
+
+    def _percentile(self, q: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def p50(self) -> Optional[float]:
+        return self._percentile(0.5)
+
+    @property
+    def p95(self) -> Optional[float]:
+        return self._percentile(0.95)
+
+    @property
+    def error_rate(self) -> float:
+        cutoff = time.monotonic() - ERROR_WINDOW_SECONDS
+        recent = [ok for ts, ok in self._outcomes if ts >= cutoff]
+        if not recent:
+            return 0.0
+        return 1.0 - sum(recent) / len(recent)
+
+    def score(self) -> float:
+        """路由得分，越小越优：延迟按错误率和当前在途数加权"""
+        p50 = self.p50
+        error_rate = self.error_rate
+        if p50 is None:
+            # 尚无成功样本：全失败的端点排到最后，未探测过的端点优先探测
+            return float("inf") if error_rate > 0 else 0.0
+        return p50 * (1 + 4 * error_rate) * (1 + 0.25 * self.in_flight)
+
+    def record(self, latency: Optional[float], ok: bool):
+        self.requests += 1
+        self._outcomes.append((time.monotonic(), ok))
+        if ok:
+            if latency is not None:
+                self._latencies.append(latency)
+        else:
+            self.errors += 1
+
+    def record_censored(self, elapsed: float):
+        """记录一次被取消请求的已耗时（真实延迟至少为该值）"""
+        self._latencies.append(elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95 = self.p50, self.p95
+        return {
+            "name": self.name,
+            "base_url": self.base_url,
+            "model": self.model,
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.error_rate, 4),
+            "p50_seconds": round(p50, 3) if p50 is not None else None,
+            "p95_seconds": round(p95, 3) if p95 is not None else None,
+            "in_flight": self.in_flight
+        }
+
+
+class LLMRouter:
+    """按延迟与错误率在多个端点间路由，支持对冲请求"""
+
+    def __init__(self, endpoints: List[LLMEndpoint], hedge_enabled: bool = False):
+        if not endpoints:
+            raise ValueError("LLMRouter 至少需要一个端点")
+        self.endpoints = endpoints
+        self.hedge_enabled = hedge_enabled
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.hedges_skipped = 0
+
+    @property
+    def primary(self) -> LLMEndpoint:
+        return self.endpoints[0]
+
+    def rank(self) -> List[LLMEndpoint]:
+        """按得分排序端点（得分相同保持配置顺序）"""
+        return sorted(self.endpoints, key=lambda ep: (ep.score(), ep.in_flight))
+
+    def _hedge_delay(self, endpoint: LLMEndpoint) -> float:
+        p95 = endpoint.p95
+        if p95 is None:
+            return settings.llm_hedge_default_delay
+        return max(settings.llm_hedge_min_delay, p95)
+
+    async def _attempt(
+        self,
+        endpoint: LLMEndpoint,
+        fn: Callable[[LLMEndpoint], Awaitable[Any]],
+        observe_latency: bool
+    ) -> Any:
+        endpoint.in_flight += 1
+        start = time.perf_counter()
+        try:
+            result = await fn(endpoint)
+        except asyncio.CancelledError:
+            # 对冲落败被取消：已耗时是真实延迟的下界，计入统计以免该端点永远被当作"未探测"
+            endpoint.record_censored(time.perf_counter() - start)
+            raise
+        except Exception:
+            endpoint.record(None, ok=False)
+            raise
+        finally:
+            endpoint.in_flight -= 1
+        endpoint.record(time.perf_counter() - start if observe_latency else None, ok=True)
+        return result
+
+    async def call(
+        self,
+        fn: Callable[[LLMEndpoint], Awaitable[Any]],
+        hedge: Optional[bool] = None,
+        observe_latency: bool = True,
+        hedge_slot: Optional[Callable[[], Optional[Callable[[], None]]]] = None
+    ) -> Any:
+        """
+        在最优端点上执行 fn(endpoint)
+
+        Args:
+            fn: 以端点为参数的协程工厂
+            hedge: 是否允许对冲；None 时取全局配置
+            observe_latency: 是否将耗时计入延迟统计（流式调用只反映首包时间，不计入）
+            hedge_slot: 发对冲副本前调用，为副本申请调度器名额与限流额度；返回 None 时不发对冲，
+                否则返回副本结束后释放名额的回调
+        """
+        ranked = self.rank()
+        hedge = self.hedge_enabled if hedge is None else hedge
+        if not hedge or len(ranked) < 2:
+            return await self._attempt(ranked[0], fn, observe_latency)
+
+        primary, backup = ranked[0], ranked[1]
+        first = asyncio.ensure_future(self._attempt(primary, fn, observe_latency))
+        second = None
+        try:
+            done, _ = await asyncio.wait({first}, timeout=self._hedge_delay(primary))
+            if done:
+                return first.result()
+
+            release = hedge_slot() if hedge_slot is not None else None
+            if hedge_slot is not None and release is None:
+                # 调度器已在排队或限流：副本会让上游压力翻倍，只等首个请求
+                self.hedges_skipped += 1
+                return await first
+            self.hedges_fired += 1
+            second = asyncio.ensure_future(self._attempt(backup, fn, observe_latency))
+            if release is not None:
+                second.add_done_callback(lambda _: release())
+            pending = {first, second}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedges_won += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # 取消落败者（以及调用方被取消时仍在进行的请求）
+            for task in (first, second):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def aclose(self):
+        for endpoint in self.endpoints:
+            await endpoint.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hedge_enabled": self.hedge_enabled,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "hedges_skipped": self.hedges_skipped,
+            "endpoints": [ep.stats() for ep in self.endpoints]
+        }
+
+
+def build_endpoints(api_key: str, base_url: str, model: str) -> List[LLMEndpoint]:
+    """
+    由配置构建端点列表：主端点来自 llm_base_url/llm_model，
+    附加端点来自 llm_endpoints（缺省字段继承主端点）
+    """
+    endpoints = [LLMEndpoint("default", base_url, api_key, model)]
+    for i, extra in enumerate(settings.llm_endpoints):
+        endpoints.append(LLMEndpoint(
+            name=extra.get("name") or f"endpoint-{i + 1}",
+            base_url=extra.get("base_url") or base_url,
+            api_key=extra.get("api_key") or api_key,
+            model=extra.get("model") or model
+        ))
+    return endpoints
@@ -1,38 +1,126 @@
 """
 LLM 服务层 - 使用 OpenAI 兼容 API 调用（支持 DeepSeek 等）
 """
+import asyncio
 import json
-from typing import Optional, Dict, Any
-from openai import OpenAI
+import time
+from typing import Optional, Dict, Any, AsyncIterator
+from openai import RateLimitError, APIConnectionError, InternalServerError
 from config import settings
+from services.llm_cache import LLMCache, llm_cache, make_cache_key
+from services.cassette import Cassette, cassette as default_cassette
+from services.llm_governor import LLMGovernor, llm_governor, backoff_delay
+from services.llm_router import LLMRouter, build_endpoints
+from services.llm_metrics import LLMMetrics, llm_metrics
+from services.json_stream import StreamingJSONParser, parse_json_lenient
+from services.singleflight import SingleFlight
+from services.token_estimator import estimate_tokens
+
+# 可重试的上游错误（429、连接/超时、5xx），由调度器统一退避重试
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """读取 429 响应中的 Retry-After（秒）"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
 
 
 class LLMService:
     """OpenAI 兼容 LLM 服务封装"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        cache: Optional[LLMCache] = None,
+        governor: Optional[LLMGovernor] = None,
+        metrics: Optional[LLMMetrics] = None,
+        cassette: Optional[Cassette] = None
+    ):
         self.api_key = settings.llm_api_key
         self.base_url = settings.llm_base_url
         self.model_name = settings.llm_model
-        self._client = None
+        self.cache = cache
+        self.governor = governor or LLMGovernor(max_in_flight=settings.llm_max_in_flight)
+        self.singleflight = SingleFlight("llm")
+        self.metrics = metrics or LLMMetrics()
+        self.cassette = cassette
+        self._router: Optional[LLMRouter] = None
         
-    def _get_client(self) -> OpenAI:
-        """获取 OpenAI 客户端"""
-        if self._client is None:
-            if not self.api_key:
-                raise ValueError("LLM API Key 未配置，请在 .env 文件中设置 LLM_API_KEY")
-            self._client = OpenAI(
-                api_key=self.api_key,
-                base_url=self.base_url
+    @property
+    def router(self) -> LLMRouter:
+        """
+        端点路由器（首次调用时按当前 api_key/base_url/model_name 与 llm_endpoints 构建）
+        """
+        if self._router is None:
+            self._router = LLMRouter(
+                build_endpoints(self.api_key, self.base_url, self.model_name),
+                hedge_enabled=settings.llm_hedge_enabled
             )
-        return self._client
+        return self._router
+    
+    def model_for(self, call_site: str) -> str:
+        """调用点使用的模型：标为 fast 且配置了便宜模型时用 llm_fast_model，否则用主模型"""
+        if settings.llm_fast_model and settings.llm_call_site_tiers.get(call_site) == "fast":
+            return settings.llm_fast_model
+        return self.model_name
+    
+    async def _create_completion(
+        self,
+        estimated_tokens: int,
+        hedge: Optional[bool] = None,
+        observe_latency: bool = True,
+        model: Optional[str] = None,
+        **kwargs
+    ):
+        """
+        发起一次 completions 请求（调用方需已持有调度器名额）
+        
+        每次尝试都经路由器选择当前最优端点（可选对冲，对冲副本另行申请调度器名额与限流额度）；按令牌桶限流；
+        429 / 连接错误 / 5xx 按指数退避重试，超过单次重试上限或全局重试预算耗尽时快速失败。
+        model 为空或为主模型时使用各端点自己配置的模型名
+        """
+        override = model if model and model != self.model_name else None
+        attempt = 0
+        while True:
+            await self.governor.throttle(estimated_tokens)
+            start = time.perf_counter()
+            try:
+                response = await self.router.call(
+                    lambda ep: ep.get_client().chat.completions.create(model=override or ep.model, **kwargs),
+                    hedge=hedge,
+                    observe_latency=observe_latency,
+                    hedge_slot=lambda: self.governor.try_hedge_slot(estimated_tokens)
+                )
+            except RETRYABLE_ERRORS as e:
+                self.governor.on_failure(rate_limited=isinstance(e, RateLimitError))
+                attempt += 1
+                if attempt > settings.llm_max_retries or not self.governor.take_retry():
+                    raise
+                delay = backoff_delay(attempt, _retry_after(e))
+                print(f"⚠️ LLM 请求失败（{type(e).__name__}），{delay:.1f}s 后第 {attempt} 次重试")
+                await asyncio.sleep(delay)
+                continue
+            self.governor.on_success(time.perf_counter() - start)
+            return response
+    
+    async def aclose(self):
+        """关闭各端点在当前事件循环上的连接池（FastAPI lifespan 结束、后台线程的事件循环结束前调用）"""
+        if self._router is not None:
+            await self._router.aclose()
         
     async def chat_completion(
         self,
         system_prompt: str,
         user_prompt: str,
         temperature: float = 0.7,
-        max_tokens: int = 2000
+        max_tokens: int = 2000,
+        use_cache: bool = False,
+        call_site: str = "default"
     ) -> Optional[str]:
         """
         调用 LLM 完成对话
@@ -42,35 +130,216 @@ class LLMService:
             user_prompt: 用户提示
             temperature: 温度参数
             max_tokens: 最大输出 token 数
+            use_cache: 是否使用响应缓存（由调用方按需开启，高温度的生成类调用通常不开启）；
+                开启时相同的并发请求也会被合并为一次上游调用
+            call_site: 调用点标签，用于按调用点统计 token、耗时与成本
             
         Returns:
             LLM 响应文本
         """
+        if not use_cache:
+            return await self._chat_completion_uncached(
+                system_prompt, user_prompt, temperature, max_tokens, None, call_site
+            )
+        
+        cache_key = make_cache_key(self.model_for(call_site), system_prompt, user_prompt, temperature, max_tokens)
+        if self.cache is not None and settings.llm_cache_enabled:
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                self.metrics.record_cache_hit(call_site)
+                return cached
+        
+        if settings.llm_singleflight_enabled:
+            return await self.singleflight.do(
+                cache_key,
+                lambda: self._chat_completion_uncached(
+                    system_prompt, user_prompt, temperature, max_tokens, cache_key, call_site
+                )
+            )
+        return await self._chat_completion_uncached(
+            system_prompt, user_prompt, temperature, max_tokens, cache_key, call_site
+        )
+    
+    async def _chat_completion_uncached(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        cache_key: Optional[str],
+        call_site: str
+    ) -> Optional[str]:
+        """实际调用上游 LLM；cache_key 不为空时写入响应缓存"""
+        start = time.perf_counter()
+        queue_wait = 0.0
+        model = self.model_for(call_site)
+        cassette_key = self._cassette_key(model, system_prompt, user_prompt, temperature, max_tokens)
+        if cassette_key and self.cassette.replaying:
+            content = self.cassette.lookup("llm", cassette_key)
+            self.metrics.record_call(call_site, wall_time=time.perf_counter() - start)
+            return content
         try:
-            client = self._get_client()
-            
-            response = client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens
+            estimated = estimate_tokens(system_prompt) + estimate_tokens(user_prompt) + max_tokens
+            async with self.governor.slot() as queue_wait:
+                response = await self._create_completion(
+                    estimated,
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    temperature=temperature,
+                    max_tokens=max_tokens
+                )
+            usage = getattr(response, "usage", None)
+            self.governor.settle_tokens(estimated, usage.total_tokens if usage else None)
+            self.metrics.record_call(
+                call_site,
+                wall_time=time.perf_counter() - start,
+                queue_wait=queue_wait,
+                prompt_tokens=usage.prompt_tokens if usage else None,
+                completion_tokens=usage.completion_tokens if usage else None,
+                model=model
             )
             
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
+            if cache_key and content and self.cache is not None and settings.llm_cache_enabled:
+                await self.cache.aset(cache_key, content)
+            if cassette_key and content:
+                self._record_cassette(cassette_key, call_site, model, temperature, max_tokens, content)
+            return content
             
         except Exception as e:
+            self.metrics.record_call(
+                call_site, wall_time=time.perf_counter() - start, queue_wait=queue_wait, error=True, model=model
+            )
             print(f"LLM API 调用异常: {str(e)}")
             raise
     
+    async def chat_completion_stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        use_cache: bool = False,
+        call_site: str = "default"
+    ) -> AsyncIterator[str]:
+        """
+        流式调用 LLM，逐段产出增量文本
+        
+        参数同 chat_completion；命中缓存时一次性产出完整文本，
+        流结束后将完整文本写入缓存。
+        """
+        model = self.model_for(call_site)
+        cache_key = None
+        if use_cache and self.cache is not None and settings.llm_cache_enabled:
+            cache_key = make_cache_key(model, system_prompt, user_prompt, temperature, max_tokens)
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                self.metrics.record_cache_hit(call_site)
+                yield cached
+                return
+        
+        parts = []
+        usage = None
+        start = time.perf_counter()
+        queue_wait = 0.0
+        cassette_key = self._cassette_key(model, system_prompt, user_prompt, temperature, max_tokens)
+        if cassette_key and self.cassette.replaying:
+            content = self.cassette.lookup("llm", cassette_key)
+            self.metrics.record_call(call_site, wall_time=time.perf_counter() - start)
+            yield content
+            return
+        try:
+            estimated = estimate_tokens(system_prompt) + estimate_tokens(user_prompt) + max_tokens
+            # 流式输出期间持续占用名额
+            async with self.governor.slot() as queue_wait:
+                stream = await self._create_completion(
+                    estimated,
+                    hedge=False,
+                    observe_latency=False,
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                
+                async for chunk in stream:
+                    if getattr(chunk, "usage", None):
+                        usage = chunk.usage
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+                    
+        except Exception as e:
+            self.metrics.record_call(
+                call_site, wall_time=time.perf_counter() - start, queue_wait=queue_wait, error=True, model=model
+            )
+            print(f"LLM API 流式调用异常: {str(e)}")
+            raise
+        
+        self.governor.settle_tokens(estimated, usage.total_tokens if usage else None)
+        self.metrics.record_call(
+            call_site,
+            wall_time=time.perf_counter() - start,
+            queue_wait=queue_wait,
+            prompt_tokens=usage.prompt_tokens if usage else None,
+            completion_tokens=usage.completion_tokens if usage else None,
+            model=model
+        )
+        if cache_key and parts:
+            await self.cache.aset(cache_key, "".join(parts))
+        if cassette_key and parts:
+            self._record_cassette(cassette_key, call_site, model, temperature, max_tokens, "".join(parts))
+    
+    def _cassette_key(
+        self,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        max_tokens: int
+    ) -> Optional[str]:
+        """录制/回放开启时返回请求键（与响应缓存键一致），否则返回 None"""
+        if self.cassette is None or not (self.cassette.recording or self.cassette.replaying):
+            return None
+        return make_cache_key(model, system_prompt, user_prompt, temperature, max_tokens)
+    
+    def _record_cassette(
+        self,
+        key: str,
+        call_site: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        content: str
+    ):
+        self.cassette.record(
+            "llm",
+            key,
+            {"call_site": call_site, "model": model, "temperature": temperature, "max_tokens": max_tokens},
+            content
+        )
+    
     async def chat_completion_json(
         self,
         system_prompt: str,
         user_prompt: str,
-        temperature: float = 0.3
-    ) -> Optional[Dict[str, Any]]:
+        temperature: float = 0.3,
+        use_cache: bool = False,
+        call_site: str = "default",
+        max_tokens: int = 2000,
+        root: Optional[str] = None
+    ) -> Any:
         """
         调用 LLM 并解析 JSON 响应
         
@@ -78,39 +347,104 @@ class LLMService:
             system_prompt: 系统提示
             user_prompt: 用户提示
             temperature: 温度参数（JSON 输出建议用较低温度）
+            use_cache: 是否使用响应缓存
+            call_site: 调用点标签
+            max_tokens: 最大输出 token 数
+            root: 期望的顶层容器 "{" 或 "["（说明文字里带括号时据此找到真正的 JSON）
             
         Returns:
-            解析后的 JSON 对象
+            解析后的 JSON 对象（或数组）
         """
         response = await self.chat_completion(
             system_prompt=system_prompt,
             user_prompt=user_prompt,
-            temperature=temperature
+            temperature=temperature,
+            max_tokens=max_tokens,
+            use_cache=use_cache,
+            call_site=call_site
         )
         
         if not response:
             return None
         
-        # 尝试提取 JSON
+        try:
+            return self.parse_json_response(response, root)
+        except Exception:
+            self.metrics.record_parse_failure(call_site)
+            await self._evict_cached(use_cache, call_site, system_prompt, user_prompt, temperature, max_tokens)
+            raise
+    
+    async def chat_completion_json_stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float = 0.3,
+        max_tokens: int = 2000,
+        use_cache: bool = False,
+        call_site: str = "default",
+        root: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式调用 LLM 并增量解析 JSON 响应（root 同 chat_completion_json）
+        
+        依次产出:
+            {"type": "delta", "data": 增量文本}
+            {"type": "field", "data": {"key": 字段名, "value": 值}}  顶层字段完整时立即产出
+            {"type": "result", "data": 解析后的 JSON 对象}  截断的尾部会被尽量补全
+        """
+        parser = StreamingJSONParser(root=root)
+        async for delta in self.chat_completion_stream(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            use_cache=use_cache,
+            call_site=call_site
+        ):
+            yield {"type": "delta", "data": delta}
+            for key, value in parser.feed(delta):
+                yield {"type": "field", "data": {"key": key, "value": value}}
+        
+        try:
+            result = parser.finish()
+        except Exception:
+            self.metrics.record_parse_failure(call_site)
+            await self._evict_cached(use_cache, call_site, system_prompt, user_prompt, temperature, max_tokens)
+            raise
+        yield {"type": "result", "data": result}
+    
+    async def _evict_cached(
+        self,
+        use_cache: bool,
+        call_site: str,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        max_tokens: int
+    ):
+        """解析失败的响应不应留在缓存里被反复命中"""
+        if use_cache and self.cache is not None:
+            await self.cache.adelete(
+                make_cache_key(self.model_for(call_site), system_prompt, user_prompt, temperature, max_tokens)
+            )
+    
+    @staticmethod
+    def parse_json_response(response: str, root: Optional[str] = None) -> Any:
+        """
+        从 LLM 响应文本中提取 JSON
+        
+        先直接解析；失败时交给宽松解析器处理代码块包裹、前后说明文字和截断的尾部
+        （root 为期望的顶层容器 "{" 或 "["）。有字段格式错误或没有解析出任何字段时抛出 ValueError
+        """
         try:
             # 尝试直接解析
             return json.loads(response)
         except json.JSONDecodeError:
-            # 尝试从 markdown 代码块中提取
-            if "```json" in response:
-                json_str = response.split("```json")[1].split("```")[0].strip()
-                return json.loads(json_str)
-            elif "```" in response:
-                json_str = response.split("```")[1].split("```")[0].strip()
-                return json.loads(json_str)
-            else:
-                # 尝试找到 JSON 对象的开始和结束
-                start = response.find("{")
-                end = response.rfind("}") + 1
-                if start != -1 and end > start:
-                    return json.loads(response[start:end])
+            try:
+                return parse_json_lenient(response, root)
+            except ValueError:
                 raise ValueError(f"无法解析 LLM 响应为 JSON: {response[:200]}")
 
 
 # 全局 LLM 服务实例
-llm_service = LLMService()
+llm_service = LLMService(cache=llm_cache, governor=llm_governor, metrics=llm_metrics, cassette=default_cassette)
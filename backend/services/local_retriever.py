@@ -0,0 +1,274 @@
+"""
+本地检索引擎
+把 knowledge_base/ 下的 markdown 按标题切成片段，建字符 bigram 的 BM25 倒排索引，进程内检索，
+不依赖 RAGFlow。返回与 RAGFlow 检索 API 相同形状的片段（content_with_weight / document_keyword / similarity）。
+切片时按文档位置与标题给片段打上维度 / 难度 / 文档类型标签，检索可按标签先划出候选集再打分
+"""
+import math
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+from config import settings
+from services.question_bank import LETTER_DIMENSION, LEVEL_DIFFICULTY, dimension_by_name
+from services.text_utils import char_ngrams
+
+_HEADING_RE = re.compile(r"^(#{1,3})\s+(.*)$")
+_RULE_RE = re.compile(r"^\s*(-{3,}|\*{3,})\s*$")
+# 片段正文短于该字符数时不单独成片（只有标题或分隔线的节）
+MIN_CHUNK_CHARS = 20
+
+# 知识库顶层目录对应的文档类型
+DOC_TYPES = {
+    "01-能力模型": "ability_model",
+    "02-面试题库": "question_bank",
+    "03-评分标准": "scoring_standard"
+}
+TAG_FIELDS = ("dimension", "difficulty", "doc_type")
+_BANK_FILE_RE = re.compile(r"^(基础|进阶|高级)题")
+_BANK_ID_RE = re.compile(r"Q([1-3])-([A-Z])\d+")
+
+
+def chunk_markdown(text: str, max_chars: int) -> List[Tuple[List[str], str]]:
+    """
+    按 #/##/### 标题切分为 [(标题路径, 正文)]；超过 max_chars 的节再按空行分段打包。
+    正文前会拼上标题路径，使片段脱离上下文后仍可读
+    """
+    sections: List[Tuple[List[str], List[str]]] = []
+    path: List[str] = []
+    lines: List[str] = []
+    for line in text.splitlines():
+        heading = _HEADING_RE.match(line)
+        if heading:
+            sections.append((list(path), lines))
+            level = len(heading.group(1))
+            path = path[:level - 1] + [heading.group(2).strip()]
+            lines = []
+        elif not _RULE_RE.match(line):
+            lines.append(line)
+    sections.append((list(path), lines))
+
+    chunks = []
+    for headings, body_lines in sections:
+        body = "\n".join(body_lines).strip()
+        if len(body) < MIN_CHUNK_CHARS:
+            continue
+        paragraphs = [p.strip() for p in re.split(r"\n\s*\n", body) if p.strip()]
+        packed, size = [], 0
+        for paragraph in paragraphs:
+            if packed and size + len(paragraph) > max_chars:
+                chunks.append((headings, "\n\n".join(packed)))
+                packed, size = [], 0
+            packed.append(paragraph)
+            size += len(paragraph)
+        if packed:
+            chunks.append((headings, "\n\n".join(packed)))
+    return [
+        (headings, f"{' > '.join(headings)}\n{body}" if headings else body)
+        for headings, body in chunks
+    ]
+
+
+def tag_chunk(document_path: str, headings: List[str], content: str = "") -> Dict[str, Optional[str]]:
+    """
+    片段的维度 / 难度 / 文档类型标签（无法判断的为 None）：
+    - doc_type：顶层目录；只有文件名（RAGFlow 片段）时按文件名推断
+    - dimension：标题路径中最深的维度名标题（能力模型的一级标题、题库的维度分组标题），其次为文件名，
+      最后为题号中的维度字母
+    - difficulty：题库文件名（基础题 / 进阶题 / 高级题），其次为题号中的难度位
+    """
+    path = Path(document_path)
+    bank_file = _BANK_FILE_RE.match(path.stem)
+    doc_type = DOC_TYPES.get(path.parts[0]) if len(path.parts) > 1 else None
+    if doc_type is None:
+        if bank_file:
+            doc_type = "question_bank"
+        elif dimension_by_name(path.stem):
+            doc_type = "ability_model"
+        elif "评分标准" in path.stem:
+            doc_type = "scoring_standard"
+    
+    dimension = next((dim for dim in map(dimension_by_name, reversed(headings)) if dim), None)
+    dimension = dimension or dimension_by_name(path.stem)
+    bank_id = _BANK_ID_RE.search(" ".join(headings)) or _BANK_ID_RE.search(content)
+    if dimension is None and bank_id:
+        dimension = LETTER_DIMENSION.get(bank_id.group(2))
+    if bank_file:
+        difficulty = bank_file.group(1)
+    else:
+        difficulty = LEVEL_DIFFICULTY[bank_id.group(1)] if bank_id else None
+    return {"dimension": dimension, "difficulty": difficulty, "doc_type": doc_type}
+
+
+def tag_remote_chunk(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """给 RAGFlow 返回的片段打标签（标题取正文中的 markdown 标题行）"""
+    content = chunk.get("content_with_weight", "") or ""
+    headings = [m.group(2).strip() for m in map(_HEADING_RE.match, content.splitlines()) if m]
+    return dict(chunk, **tag_chunk(chunk.get("document_keyword", "") or "", headings, content))
+
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Dict[str, FrozenSet]:
+    """
+    检索过滤条件 → 各字段允许的标签集合，如 {"dimension": "system_thinking", "difficulty": ["进阶", None]}；
+    列表中的 None 表示也接受未打该标签的片段（如能力模型片段没有难度）
+    """
+    normalized = {}
+    for field, value in (filters or {}).items():
+        if field not in TAG_FIELDS:
+            raise ValueError(f"不支持的检索过滤字段: {field}")
+        normalized[field] = frozenset(value if isinstance(value, (list, tuple, set, frozenset)) else [value])
+    return normalized
+
+
+def matches_filters(chunk: Dict[str, Any], filters: Dict[str, FrozenSet]) -> bool:
+    return all(chunk.get(field) in allowed for field, allowed in filters.items())
+
+
+class LocalRetriever:
+    """
+    knowledge_base/ 的 BM25 检索（线程安全，首次检索时建索引）
+
+    similarity 为 BM25 分数除以本次检索的最高分，similarity_threshold 按这一相对分数过滤。
+    带过滤条件时先按标签分区取候选片段，只对候选片段打分
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or settings.local_rag_dir)
+        self._lock = threading.Lock()
+        self._built = False
+        self.chunks: List[Dict[str, Any]] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._term_counts: List[Dict[str, int]] = []
+        self._partitions: Dict[Tuple[str, Optional[str]], Set[int]] = {}
+        self._idf: Dict[str, float] = {}
+        self._lengths: List[int] = []
+        self._avg_length = 0.0
+        self.build_seconds = 0.0
+
+    def _build(self):
+        """切片并建倒排索引（调用方持锁）"""
+        start = time.perf_counter()
+        chunks, postings, lengths, term_counts, partitions = [], {}, [], [], {}
+        if self.root.exists():
+            for path in sorted(self.root.rglob("*.md")):
+                text = path.read_text(encoding="utf-8")
+                for headings, content in chunk_markdown(text, settings.local_rag_chunk_chars):
+                    idx = len(chunks)
+                    tokens = char_ngrams(content)
+                    counts: Dict[str, int] = {}
+                    for token in tokens:
+                        counts[token] = counts.get(token, 0) + 1
+                    for token, tf in counts.items():
+                        postings.setdefault(token, []).append((idx, tf))
+                    lengths.append(len(tokens))
+                    term_counts.append(counts)
+                    document_path = str(path.relative_to(self.root))
+                    tags = tag_chunk(document_path, headings, content)
+                    for field, value in tags.items():
+                        partitions.setdefault((field, value), set()).add(idx)
+                    chunks.append({
+                        "id": f"local-{idx}",
+                        "content_with_weight": content,
+                        "document_keyword": path.name,
+                        "document_path": document_path,
+                        "headings": headings,
+                        **tags
+                    })
+        n = len(chunks)
+        self.chunks = chunks
+        self._postings = postings
+        self._term_counts = term_counts
+        self._partitions = partitions
+        self._idf = {
+            token: math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for token, plist in postings.items()
+        }
+        self._lengths = lengths
+        self._avg_length = sum(lengths) / n if n else 0.0
+        self._built = True
+        self.build_seconds = time.perf_counter() - start
+        print(f"📚 本地知识库索引完成: {n} 个片段, 耗时 {self.build_seconds * 1000:.0f}ms")
+
+    def ensure_index(self):
+        with self._lock:
+            if not self._built:
+                self._build()
+
+    def reload(self):
+        """知识库文件更新后重建索引（下次检索时重建）"""
+        with self._lock:
+            self._built = False
+
+    def candidates(self, filters: Dict[str, FrozenSet]) -> Set[int]:
+        """满足过滤条件的片段（各字段内取并集，字段间取交集）"""
+        self.ensure_index()
+        selected: Optional[Set[int]] = None
+        for field, allowed in filters.items():
+            ids = set().union(*(self._partitions.get((field, value), set()) for value in allowed))
+            selected = ids if selected is None else selected & ids
+        return set(range(len(self.chunks))) if selected is None else selected
+
+    def scores(self, query: str, candidates: Optional[Set[int]] = None) -> Dict[int, float]:
+        """
+        各片段的 BM25 分数（只含至少命中一个 bigram 的片段）
+
+        candidates 为空时遍历倒排表；否则只查候选片段各自的词频，分区越小越快
+        """
+        self.ensure_index()
+        k1, b = settings.local_rag_bm25_k1, settings.local_rag_bm25_b
+        avg = self._avg_length or 1.0
+        tokens = [token for token in set(char_ngrams(query)) if token in self._idf]
+        if candidates is None:
+            hits = (
+                (idx, token, tf) for token in tokens for idx, tf in self._postings[token]
+            )
+        else:
+            hits = (
+                (idx, token, self._term_counts[idx][token])
+                for idx in candidates for token in tokens if token in self._term_counts[idx]
+            )
+        scores: Dict[int, float] = {}
+        for idx, token, tf in hits:
+            norm = k1 * (1 - b + b * self._lengths[idx] / avg)
+            scores[idx] = scores.get(idx, 0.0) + self._idf[token] * tf * (k1 + 1) / (tf + norm)
+        return scores
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        similarity_threshold: float = 0.0,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        filters = normalize_filters(filters)
+        scores = self.scores(query, self.candidates(filters) if filters else None)
+        if not scores:
+            return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        best = ranked[0][1]
+        results = []
+        for idx, score in ranked:
+            similarity = score / best
+            if similarity < similarity_threshold:
+                break
+            results.append(dict(self.chunks[idx], similarity=round(similarity, 4), score=round(score, 4)))
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "root": str(self.root),
+            "built": self._built,
+            "chunks": len(self.chunks),
+            "terms": len(self._postings),
+            "partitions": {
+                f"{field}={value}": len(ids) for (field, value), ids in sorted(
+                    self._partitions.items(), key=lambda item: (item[0][0], str(item[0][1]))
+                )
+            },
+            "build_seconds": round(self.build_seconds, 4)
+        }
+
+
+# 全局实例
+local_retriever = LocalRetriever()
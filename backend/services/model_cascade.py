@@ -0,0 +1,111 @@
+"""
+评分模型级联
+便宜模型先评分，以下情况升级到主模型重评：
+- 输出不合法（解析失败、缺少分数）
+- 分数贴近分档线（默认 5 分、7 分 ±0.5，分档结果最敏感）
+- 与不调用 LLM 的启发式分数相差过大
+未升级的题目按比例抽样同时请主模型评分，持续统计两者一致率；一致率低于阈值时自动停用级联
+"""
+import random
+import threading
+from collections import Counter
+from typing import Any, Dict, Optional
+from config import settings, ABILITY_DIMENSIONS
+from services.text_utils import char_ngram_set, normalize_text
+
+REASON_MALFORMED = "malformed"
+REASON_BORDERLINE = "borderline"
+REASON_HEURISTIC = "heuristic"
+
+
+def heuristic_score(question: Dict[str, Any], answer: str) -> float:
+    """粗略的 0-10 分：回答长度、维度关键词覆盖与参考资料的字符 bigram 重合"""
+    text = normalize_text(answer)
+    length = min(1.0, len(text) / 200)
+    keywords = ABILITY_DIMENSIONS.get(question.get("dimension", ""), {}).get("keywords", [])
+    keyword_coverage = min(1.0, sum(k.lower() in text for k in keywords) / 3) if keywords else 0.5
+    reference = char_ngram_set(question.get("reference_context") or "")
+    reference_coverage = min(1.0, len(char_ngram_set(answer) & reference) / 40) if reference else 0.5
+    return round(10 * (0.4 * length + 0.3 * keyword_coverage + 0.3 * reference_coverage), 1)
+
+
+class ModelCascade:
+    """级联判定与统计（升级率、各升级原因、抽样一致率）"""
+
+    def __init__(self, rng: Optional[random.Random] = None):
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.graded = 0
+            self.escalations: Counter = Counter()
+            self.audits = 0
+            self.agreements = 0
+            self.disabled = False
+
+    @property
+    def active(self) -> bool:
+        return bool(settings.llm_cascade_enabled and settings.llm_fast_model and not self.disabled)
+
+    def escalation_reason(
+        self,
+        result: Optional[Dict[str, Any]],
+        question: Dict[str, Any],
+        answer: str
+    ) -> Optional[str]:
+        """便宜模型的评分需要升级时返回原因，可以直接采用时返回 None"""
+        if not result or not isinstance(result.get("score"), (int, float)):
+            return REASON_MALFORMED
+        score = float(result["score"])
+        if any(abs(score - line) <= settings.llm_cascade_borderline_margin for line in settings.llm_cascade_borderline_scores):
+            return REASON_BORDERLINE
+        if abs(score - heuristic_score(question, answer)) > settings.llm_cascade_heuristic_tolerance:
+            return REASON_HEURISTIC
+        return None
+
+    def record(self, reason: Optional[str]):
+        with self._lock:
+            self.graded += 1
+            if reason:
+                self.escalations[reason] += 1
+
+    def should_audit(self) -> bool:
+        return self._rng.random() < settings.llm_cascade_audit_rate
+
+    def record_audit(self, fast_score: float, strong_score: float):
+        """记录一次抽样对比；一致率低于 llm_cascade_min_agreement 时停用级联"""
+        with self._lock:
+            self.audits += 1
+            if abs(fast_score - strong_score) <= settings.llm_cascade_agreement_tolerance:
+                self.agreements += 1
+            if (
+                not self.disabled
+                and self.audits >= settings.llm_cascade_audit_min_samples
+                and self.agreements / self.audits < settings.llm_cascade_min_agreement
+            ):
+                self.disabled = True
+                print(
+                    f"⚠️ 便宜模型与主模型评分一致率 {self.agreements / self.audits:.0%} "
+                    f"低于 {settings.llm_cascade_min_agreement:.0%}，停用评分级联"
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            escalated = sum(self.escalations.values())
+            return {
+                "active": self.active,
+                "fast_model": settings.llm_fast_model,
+                "graded": self.graded,
+                "escalated": escalated,
+                "escalation_rate": round(escalated / self.graded, 4) if self.graded else 0.0,
+                "escalations_by_reason": dict(self.escalations),
+                "audits": self.audits,
+                "agreement_rate": round(self.agreements / self.audits, 4) if self.audits else None,
+                "disabled": self.disabled
+            }
+
+
+# 全局实例
+model_cascade = ModelCascade()
@@ -3,7 +3,8 @@
 """
 from typing import Dict, Any, Optional
 from services.llm_service import llm_service
-from config import ABILITY_DIMENSIONS
+from services.prompt_compactor import compact_text
+from config import ABILITY_DIMENSIONS, settings
 
 # JD + Resume Matching Prompt
 PROFILE_MATCH_SYSTEM_PROMPT = """你是一位资深的 AI 产品经理面试官。
@@ -45,6 +46,14 @@ async def parse_profile(jd_text: str, resume_text: Optional[str] = None) -> Dict
     """
     解析 JD 和 简历（如果有）
     """
+    # 超长输入按预算压缩：JD 保留最相关的句子（以能力模型关键词为查询），简历保留与 JD 最相关的句子
+    keywords = " ".join(k for dim in ABILITY_DIMENSIONS.values() for k in dim["keywords"])
+    jd_text = compact_text(jd_text, query=keywords, budget=settings.prompt_budget_jd, call_site="profile_parser")
+    if resume_text:
+        resume_text = compact_text(
+            resume_text, query=jd_text, budget=settings.prompt_budget_resume, call_site="profile_parser"
+        )
+    
     if not resume_text:
         # 仅解析 JD (复用原有逻辑，为了保持兼容，还是用新的 JSON 结构)
         # 这里为了简化，我们让 LLM 即使没有简历也返回统一结构，只是 resume 部分为空
@@ -70,7 +79,10 @@ async def parse_profile(jd_text: str, resume_text: Optional[str] = None) -> Dict
     result = await llm_service.chat_completion_json(
         system_prompt=PROFILE_MATCH_SYSTEM_PROMPT,
         user_prompt=user_prompt,
-        temperature=0.3
+        temperature=0.3,
+        use_cache=True,
+        call_site="profile_parser",
+        root="{"
     )
     
     if result:
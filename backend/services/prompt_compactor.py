@@ -0,0 +1,135 @@
+"""
+Prompt 压缩
+按调用点的 token 预算压缩 RAG 参考资料、简历与 JD：
+1. 去重：删除完全重复或字符 bigram 高度重叠的片段
+2. 预算内原样保留；超出时按与查询的 bigram 重合度挑选最相关的句子（保持原文顺序）
+3. 仍超出时截断
+"""
+import threading
+from typing import Dict, Any, List
+from config import settings
+from services.text_utils import char_ngram_set, split_sentences
+from services.token_estimator import estimate_tokens
+
+TRUNCATION_MARK = "……（已截断）"
+
+
+class CompactionStats:
+    """按调用点统计压缩前后的 token 数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sites: Dict[str, Dict[str, int]] = {}
+
+    def record(self, call_site: str, tokens_in: int, tokens_out: int):
+        with self._lock:
+            site = self._sites.setdefault(call_site, {"calls": 0, "tokens_in": 0, "tokens_out": 0})
+            site["calls"] += 1
+            site["tokens_in"] += tokens_in
+            site["tokens_out"] += tokens_out
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                name: dict(site, saved_ratio=round(1 - site["tokens_out"] / site["tokens_in"], 4) if site["tokens_in"] else 0.0)
+                for name, site in self._sites.items()
+            }
+
+
+compaction_stats = CompactionStats()
+
+
+def _overlap(a: set, b: set) -> float:
+    """包含度：较小集合有多少比例出现在较大集合中"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def dedupe_chunks(chunks: List[str], threshold: float = 0.8) -> List[str]:
+    """删除重复与高度重叠的片段（保留先出现的）"""
+    kept: List[str] = []
+    kept_grams: List[set] = []
+    for chunk in chunks:
+        text = (chunk or "").strip()
+        if not text:
+            continue
+        grams = char_ngram_set(text)
+        if any(_overlap(grams, other) >= threshold for other in kept_grams):
+            continue
+        kept.append(text)
+        kept_grams.append(grams)
+    return kept
+
+
+def truncate_to_budget(text: str, budget: int) -> str:
+    """按 token 预算截断文本"""
+    if estimate_tokens(text) <= budget:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo].rstrip() + TRUNCATION_MARK
+
+
+def select_relevant_sentences(text: str, query: str, budget: int) -> str:
+    """挑选与查询最相关的句子，总量不超过预算，输出保持原文顺序"""
+    sentences = split_sentences(text)
+    if not sentences:
+        return truncate_to_budget(text, budget)
+
+    query_grams = char_ngram_set(query)
+    scored = []
+    seen = set()
+    for idx, sentence in enumerate(sentences):
+        if sentence in seen:
+            continue
+        seen.add(sentence)
+        grams = char_ngram_set(sentence)
+        relevance = len(grams & query_grams) / (len(grams) ** 0.5) if grams else 0.0
+        scored.append((relevance, -idx, idx, sentence))
+    scored.sort(reverse=True)
+
+    chosen = []
+    used = 0
+    for _, _, idx, sentence in scored:
+        cost = estimate_tokens(sentence)
+        if used + cost > budget:
+            continue
+        chosen.append((idx, sentence))
+        used += cost
+    if not chosen:
+        return truncate_to_budget(sentences[0], budget)
+    chosen.sort()
+    return "\n".join(sentence for _, sentence in chosen)
+
+
+def compact_text(text: str, query: str, budget: int, call_site: str) -> str:
+    """将单段文本压缩到预算内"""
+    if not text:
+        return text
+    tokens_in = estimate_tokens(text)
+    if not settings.prompt_compaction_enabled or budget <= 0 or tokens_in <= budget:
+        compaction_stats.record(call_site, tokens_in, tokens_in)
+        return text
+    result = select_relevant_sentences(text, query, budget)
+    compaction_stats.record(call_site, tokens_in, estimate_tokens(result))
+    return result
+
+
+def compact_chunks(chunks: List[str], query: str, budget: int, call_site: str) -> str:
+    """去重并合并多个检索片段，再压缩到预算内"""
+    raw = "\n".join(c for c in chunks if c)
+    tokens_in = estimate_tokens(raw)
+    if not settings.prompt_compaction_enabled or budget <= 0:
+        compaction_stats.record(call_site, tokens_in, tokens_in)
+        return raw
+    merged = "\n".join(dedupe_chunks(chunks))
+    if estimate_tokens(merged) > budget:
+        merged = select_relevant_sentences(merged, query, budget)
+    compaction_stats.record(call_site, tokens_in, estimate_tokens(merged))
+    return merged
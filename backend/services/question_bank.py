@@ -0,0 +1,202 @@
+"""
+结构化题库
+解析 knowledge_base/02-面试题库/ 下的题库文件（### Q1-B01 标题、**题目**、**考察点**、**期望回答要点**，
+按 ## 维度标题分组），编译为按（维度, 难度）索引的题目记录。出题时可直接取用，
+期望回答要点原样作为评估用的 reference_context
+"""
+import random
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from pydantic import BaseModel, Field
+from config import settings, ABILITY_DIMENSIONS
+from services.question_dedup import MinHashIndex
+
+# 题号中的难度位与维度字母（标题缺失或无法识别时的后备）
+ID_RE = re.compile(r"^Q(?P<level>[1-3])-(?P<dim>[A-Z])(?P<num>\d+)\s*(?P<title>.*)$")
+LEVEL_DIFFICULTY = {"1": "基础", "2": "进阶", "3": "高级"}
+LETTER_DIMENSION = {
+    "B": "business_decomposition",
+    "T": "ai_tech_understanding",
+    "C": "business_awareness",
+    "S": "system_thinking",
+    "E": "execution_power",
+    "R": "risk_awareness"
+}
+FIELD_RE = re.compile(r"^\*\*(?P<name>[^*]+)\*\*[：:]\s*(?P<value>.*)$")
+# 列表项只认「- 」或「* 」开头（「**文档结束**」这类加粗行不是列表项）
+LIST_ITEM_RE = re.compile(r"^[-*]\s+(?P<item>.+)$")
+BOLD_RE = re.compile(r"\*\*(?P<text>.+?)\*\*")
+_DIMENSION_BY_NAME = {info["name"].replace(" ", ""): dim for dim, info in ABILITY_DIMENSIONS.items()}
+
+
+def _strip_bold(text: str) -> str:
+    """去掉成对的 ** 加粗标记，保留其中的文字"""
+    return BOLD_RE.sub(r"\g<text>", text).strip()
+
+
+def dimension_by_name(title: str) -> Optional[str]:
+    """按维度中文名识别标题对应的维度（忽略空格与括号后缀，如「AI 技术理解（3道）」）"""
+    name = re.sub(r"[（(].*$", "", title).replace(" ", "").strip()
+    return _DIMENSION_BY_NAME.get(name)
+
+
+class BankQuestion(BaseModel):
+    """题库中的一道题"""
+    bank_id: str = Field(..., description="题号，如 Q1-B01")
+    title: str = Field(default="", description="题目标题")
+    dimension: str = Field(..., description="能力维度")
+    difficulty: str = Field(..., description="难度")
+    text: str = Field(..., description="题目")
+    focus: str = Field(default="", description="考察点")
+    expected_points: List[str] = Field(default_factory=list, description="期望回答要点")
+    follow_ups: List[str] = Field(default_factory=list, description="追问方向")
+    source: str = Field(default="", description="来源文件")
+
+    def reference_context(self) -> str:
+        """评估用参考：考察点、期望回答要点与追问方向"""
+        parts = [f"【题库 {self.bank_id}】{self.title}".strip()]
+        if self.focus:
+            parts.append(f"考察点：{self.focus}")
+        if self.expected_points:
+            parts.append("期望回答要点：\n" + "\n".join(f"- {p}" for p in self.expected_points))
+        if self.follow_ups:
+            parts.append("追问方向：\n" + "\n".join(f"- {p}" for p in self.follow_ups))
+        return "\n".join(parts)
+
+
+def parse_question_bank(text: str, source: str = "") -> List[BankQuestion]:
+    """解析一个题库 markdown 文件；缺少题号或题目的条目跳过"""
+    questions: List[BankQuestion] = []
+    dimension: Optional[str] = None
+    current: Optional[Dict[str, Any]] = None
+    list_field: Optional[str] = None
+
+    def flush():
+        if current and current.get("text"):
+            questions.append(BankQuestion(**current))
+
+    for raw in text.splitlines():
+        line = raw.strip()
+        if line.startswith("## ") and not line.startswith("### "):
+            flush()
+            current, list_field = None, None
+            dimension = dimension_by_name(line[3:])
+            continue
+        if line.startswith("### "):
+            flush()
+            current, list_field = None, None
+            match = ID_RE.match(line[4:].strip())
+            if match:
+                current = {
+                    "bank_id": f"Q{match['level']}-{match['dim']}{match['num']}",
+                    "title": match["title"].strip(),
+                    "dimension": dimension or LETTER_DIMENSION.get(match["dim"], ""),
+                    "difficulty": LEVEL_DIFFICULTY[match["level"]],
+                    "source": source
+                }
+            continue
+        if line.startswith(("#", "---")):
+            # 其他标题与分隔线结束当前列表
+            list_field = None
+            continue
+        if current is None or not line:
+            continue
+        field = FIELD_RE.match(line)
+        if field:
+            name, value = field["name"].strip(), _strip_bold(field["value"])
+            list_field = None
+            if name == "题目":
+                current["text"] = value
+            elif name == "考察点":
+                current["focus"] = value
+            elif name == "期望回答要点":
+                list_field = "expected_points"
+            elif name == "追问方向":
+                list_field = "follow_ups"
+            continue
+        item = LIST_ITEM_RE.match(line)
+        if list_field and item:
+            current.setdefault(list_field, []).append(_strip_bold(item["item"]))
+    flush()
+    return [q for q in questions if q.dimension in ABILITY_DIMENSIONS]
+
+
+class QuestionBank:
+    """按（维度, 难度）索引的题库（首次使用时加载，线程安全）"""
+
+    def __init__(self, root: Optional[str] = None, rng: Optional[random.Random] = None):
+        self.root = Path(root or settings.question_bank_dir)
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[Tuple[str, str], List[BankQuestion]]] = None
+
+    def _load(self) -> Dict[Tuple[str, str], List[BankQuestion]]:
+        index: Dict[Tuple[str, str], List[BankQuestion]] = {}
+        if self.root.exists():
+            for path in sorted(self.root.glob("*.md")):
+                for q in parse_question_bank(path.read_text(encoding="utf-8"), path.name):
+                    index.setdefault((q.dimension, q.difficulty), []).append(q)
+        print(f"📖 结构化题库加载完成: {sum(len(v) for v in index.values())} 道题")
+        return index
+
+    @property
+    def index(self) -> Dict[Tuple[str, str], List[BankQuestion]]:
+        with self._lock:
+            if self._index is None:
+                self._index = self._load()
+            return self._index
+
+    def reload(self):
+        with self._lock:
+            self._index = None
+
+    def questions(self, dimension: str, difficulty: str) -> List[BankQuestion]:
+        return list(self.index.get((dimension, difficulty), []))
+
+    def draw_slots(
+        self,
+        dimension: str,
+        slots: List[Tuple[str, str]],
+        asked_questions: Optional[Iterable[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        按题目位 [(题目 ID, 难度)] 随机取题并填入 ID；与 asked_questions 近似重复的题目（含之前轮次改写过的）
+        不再取用，同一次调用内不重复。该难度的题用完的位置不返回
+        """
+        asked = MinHashIndex()
+        for text in asked_questions or []:
+            asked.add(text, text)
+        used = set()
+        drawn = []
+        for question_id, difficulty in slots:
+            candidates = [
+                q for q in self.questions(dimension, difficulty)
+                if q.bank_id not in used and asked.nearest(q.text) is None
+            ]
+            if not candidates:
+                continue
+            q = self._rng.choice(candidates)
+            used.add(q.bank_id)
+            drawn.append({
+                "id": question_id,
+                "text": q.text,
+                "dimension": q.dimension,
+                "difficulty": q.difficulty,
+                "reference_context": q.reference_context(),
+                "bank_id": q.bank_id
+            })
+        return drawn
+
+    def stats(self) -> Dict[str, Any]:
+        index = self.index
+        return {
+            "enabled": settings.question_bank_enabled,
+            "total": sum(len(v) for v in index.values()),
+            "by_slot": {f"{dim}/{difficulty}": len(v) for (dim, difficulty), v in sorted(index.items())}
+        }
+
+
+# 全局实例
+question_bank = QuestionBank()
@@ -2,10 +2,14 @@
 题库生成服务
 """
 import asyncio
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
 from services.llm_service import llm_service
 from services.rag_service import rag_service
-from config import ABILITY_DIMENSIONS
+from services.question_pool import question_pool
+from services.question_bank import question_bank
+from services.question_dedup import MinHashIndex, dedup_stats
+from services.prompt_compactor import compact_chunks
+from config import ABILITY_DIMENSIONS, settings
 
 
 # 题目生成的系统提示
@@ -46,6 +50,74 @@ QUESTION_GEN_USER_PROMPT = """请生成一道面试题。
 直接输出问题文本，不要包含任何前缀或后缀。"""
 
 
+# 单次调用生成一个维度的全部题目（结构化 JSON 输出）
+QUESTION_GEN_MULTI_SYSTEM_PROMPT = """你是一位专业的 AI 产品经理面试官。
+你需要基于给定的[参考资料]（来自知识库的真题或知识点），为候选人一次性生成同一考察维度下的一组面试题。
+
+面试场景配置：
+- 公司规模：{company_scale}
+- 侧重点：{scale_focus}
+
+难度控制指南：
+- [基础]：重点考察基本概念理解和基础业务常识，避免深究技术原理或复杂架构。
+- [进阶]：考察具体场景下的应用能力、简单的方案设计或问题分析。
+- [高级]：考察系统性思维、复杂权衡、商业价值判断或底层技术逻辑。
+
+要求：
+1. 严格遵守上述[难度控制指南]，每道题的难度必须与指定难度一致
+2. 优先改编[参考资料]中的题目，如果参考资料不相关，则根据维度自行生成
+3. 结合[简历差距分析]（如有），针对候选人的薄弱点进行追问
+4. 同一组内的题目考察角度互不重复
+5. 题目表述要专业、清晰，不要返回答案"""
+
+QUESTION_GEN_MULTI_USER_PROMPT = """请生成 {count} 道面试题。
+
+【考察维度】
+{dimension}（{dimension_name}）
+
+【难度安排】
+难度依次为：{difficulties}
+
+【候选人简历差距分析】
+{resume_context}
+
+【参考资料】
+{context}
+
+【输出要求】
+以严格的 JSON 数组格式输出，按难度安排的顺序每题一个对象，共 {count} 个：
+[
+  {{"difficulty": "基础", "text": "问题文本"}}
+]
+text 只包含问题本身，不要包含编号、前缀或答案。"""
+
+
+# 题库题目按公司规模改写场景（一个维度一次调用）
+QUESTION_BANK_REPHRASE_SYSTEM_PROMPT = """你是一位专业的 AI 产品经理面试官。
+你需要把题库中的面试题改写为贴合当前面试场景的表述。
+
+面试场景配置：
+- 公司规模：{company_scale}
+- 侧重点：{scale_focus}
+
+要求：
+1. 只调整业务场景、举例和措辞，使其贴合公司规模与侧重点
+2. 保持原题的考察点和难度不变，不要增删考察内容
+3. 题目表述要专业、清晰，不要返回答案"""
+
+QUESTION_BANK_REPHRASE_USER_PROMPT = """请改写以下 {count} 道题库题目。
+
+【待改写题目】
+{questions}
+
+【输出要求】
+以严格的 JSON 数组格式输出，每题一个对象，id 与原题一致：
+[
+  {{"id": "Q1-B01", "text": "改写后的问题文本"}}
+]
+text 只包含问题本身，不要包含编号、前缀或答案。"""
+
+
 def get_scale_focus(scale: str) -> str:
     """获取不同规模公司的面试侧重点"""
     focus_map = {
@@ -57,22 +129,8 @@ def get_scale_focus(scale: str) -> str:
     return focus_map.get(scale, "通用标准")
 
 
-async def get_questions_for_dimension(
-    dimension: str,
-    count: int,
-    start_id: int,
-    resume_context: str = "无",
-    company_scale: str = "中型公司",
-    current_round: int = 1,
-    total_rounds: int = 1
-) -> List[Dict[str, Any]]:
-    """生成指定维度的题目"""
-    questions = []
-    dimension_info = ABILITY_DIMENSIONS.get(dimension, {})
-    dim_name = dimension_info.get("name", dimension)
-    scale_focus = get_scale_focus(company_scale)
-    
-    # 定义难度分布（逐步递进）
+def difficulty_schedule(count: int, current_round: int = 1, total_rounds: int = 1) -> List[str]:
+    """按轮次确定维度内各题的难度（逐步递进）"""
     if total_rounds > 1:
         if current_round == 1:
             # 第一轮：主要是基础，少量进阶
@@ -90,74 +148,380 @@ async def get_questions_for_dimension(
                        ["高级"] * max(0, count - count // 3 - count // 2)
                        
     # 截取需要的数量
-    difficulties = difficulties[:count]
+    return difficulties[:count]
+
+
+def _round_context(current_round: int, total_rounds: int) -> str:
+    """轮次上下文提示，强化递进感"""
+    round_context = f"当前是第 {current_round}/{total_rounds} 轮面试。"
+    if current_round == 1:
+        round_context += "请侧重考察基础知识广度和业务常识。"
+    elif current_round == total_rounds:
+        round_context += "请侧重考察深度思考、复杂问题解决和抗压能力。"
+    return round_context
+
+
+async def _retrieve_context(dimension: str, difficulty: str, company_scale: str) -> str:
+    """按维度与难度检索参考资料，去重并压缩到 token 预算内"""
+    dimension_info = ABILITY_DIMENSIONS.get(dimension, {})
+    dim_name = dimension_info.get("name", dimension)
     
-    for i, difficulty in enumerate(difficulties):
-        # 1. RAG 检索 (加入公司规模上下文检索)
-        query = f"AI产品经理面试题 {dim_name} {difficulty} {company_scale}"
-        chunks = await rag_service.retrieve(query, top_k=3)
-        
-        # 构建上下文
-        context = "\n".join([c.get("content_with_weight", "") for c in chunks])
+    # RAG 检索 (加入公司规模上下文检索)
+    query = f"AI产品经理面试题 {dim_name} {difficulty} {company_scale}"
+    # 只在该维度、该难度（或不分难度，如能力模型）的片段中检索
+    filters = {"dimension": dimension, "difficulty": [difficulty, None]} if settings.rag_filter_enabled else None
+    chunks = await rag_service.retrieve(
+        query, top_k=3, budget=settings.question_gen_rag_budget_seconds, filters=filters
+    )
+    
+    # 构建上下文（该上下文也会随题目保存并用于评估）
+    return compact_chunks(
+        [c.get("content_with_weight", "") for c in chunks],
+        query=f"{dim_name} {difficulty} {' '.join(dimension_info.get('keywords', []))}",
+        budget=settings.prompt_budget_question_context,
+        call_site="question_generator"
+    )
+
+
+def _with_round_hint(user_prompt: str, round_context: str) -> str:
+    if not round_context:
+        return user_prompt
+    return user_prompt + f"\n\n【特别提示】\n{round_context}"
+
+
+async def _generate_one_question(
+    dimension: str,
+    difficulty: str,
+    question_id: str,
+    resume_context: str,
+    company_scale: str,
+    round_context: str,
+    semaphore: asyncio.Semaphore
+) -> Optional[Dict[str, Any]]:
+    """检索参考资料并生成一道题目"""
+    dim_name = ABILITY_DIMENSIONS.get(dimension, {}).get("name", dimension)
+    
+    async with semaphore:
+        # 1. RAG 检索
+        context = await _retrieve_context(dimension, difficulty, company_scale)
         if not context:
             context = "暂无知识库相关记录，请基于通用知识生成。"
             
         # 2. LLM 生成题目
         system_prompt = QUESTION_GEN_SYSTEM_PROMPT.format(
             company_scale=company_scale,
-            scale_focus=scale_focus
+            scale_focus=get_scale_focus(company_scale)
         )
         
-        # 增加轮次上下文提示，强化递进感
-        round_context = f"当前是第 {current_round}/{total_rounds} 轮面试。"
-        if current_round == 1:
-            round_context += "请侧重考察基础知识广度和业务常识。"
-        elif current_round == total_rounds:
-            round_context += "请侧重考察深度思考、复杂问题解决和抗压能力。"
-        
-        user_prompt = QUESTION_GEN_USER_PROMPT.format(
+        user_prompt = _with_round_hint(QUESTION_GEN_USER_PROMPT.format(
             dimension=dimension,
             dimension_name=dim_name,
             difficulty=difficulty,
             resume_context=resume_context,
             context=context
-        ) + f"\n\n【特别提示】\n{round_context}"
+        ), round_context)
         
         q_text = await llm_service.chat_completion(
             system_prompt=system_prompt,
             user_prompt=user_prompt,
-            temperature=0.7
+            temperature=0.7,
+            call_site="question_generator"
         )
+    
+    if not q_text:
+        return None
+    return {
+        "id": question_id,
+        "text": q_text.strip(),
+        "dimension": dimension,
+        "difficulty": difficulty,
+        "reference_context": context  # 保存RAG检索到的上下文供评估使用
+    }
+
+
+def _match_multi_items(items: Any, difficulties: List[str]) -> List[Optional[str]]:
+    """
+    把结构化输出对齐到难度安排：优先取同位置且难度一致的题目，
+    否则取剩余题目中第一个难度一致的；对不上的位置为 None
+    """
+    if isinstance(items, dict):
+        items = items.get("questions")
+    if not isinstance(items, list):
+        return [None] * len(difficulties)
+    
+    pool = [
+        (str(item.get("difficulty", "")).strip(), item["text"].strip())
+        for item in items
+        if isinstance(item, dict) and isinstance(item.get("text"), str) and item["text"].strip()
+    ]
+    used = set()
+    texts: List[Optional[str]] = []
+    for i, difficulty in enumerate(difficulties):
+        candidates = ([i] if i < len(pool) else []) + list(range(len(pool)))
+        match = next((j for j in candidates if j not in used and pool[j][0] == difficulty), None)
+        if match is None:
+            texts.append(None)
+        else:
+            used.add(match)
+            texts.append(pool[match][1])
+    return texts
+
+
+async def _generate_in_one_call(
+    dimension: str,
+    slots: List[Tuple[str, str]],
+    resume_context: str,
+    company_scale: str,
+    round_context: str,
+    semaphore: asyncio.Semaphore
+) -> List[Dict[str, Any]]:
+    """
+    一次结构化 JSON 调用生成一个维度的多道题目（slots 为 [(题目 ID, 难度)]）
+    
+    每种难度各检索一次参考资料；输出解析失败或个别题目缺失/难度不符时，
+    这些位置回退为单题生成
+    """
+    dim_name = ABILITY_DIMENSIONS.get(dimension, {}).get("name", dimension)
+    difficulties = [difficulty for _, difficulty in slots]
+    levels = list(dict.fromkeys(difficulties))
+    
+    async with semaphore:
+        contexts = dict(zip(levels, await asyncio.gather(*[
+            _retrieve_context(dimension, level, company_scale) for level in levels
+        ])))
+        merged = "\n".join(f"[{level}] {contexts[level]}" for level in levels if contexts[level])
         
-        if q_text:
-            questions.append({
-                "id": f"q{start_id + i:03d}",
-                "text": q_text.strip(),
-                "dimension": dimension,
-                "difficulty": difficulty,
-                "reference_context": context  # 保存RAG检索到的上下文供评估使用
-            })
-            
-    return questions
+        system_prompt = QUESTION_GEN_MULTI_SYSTEM_PROMPT.format(
+            company_scale=company_scale,
+            scale_focus=get_scale_focus(company_scale)
+        )
+        user_prompt = _with_round_hint(QUESTION_GEN_MULTI_USER_PROMPT.format(
+            count=len(difficulties),
+            dimension=dimension,
+            dimension_name=dim_name,
+            difficulties="、".join(difficulties),
+            resume_context=resume_context,
+            context=merged or "暂无知识库相关记录，请基于通用知识生成。"
+        ), round_context)
+        
+        try:
+            items = await llm_service.chat_completion_json(
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                temperature=0.7,
+                call_site="question_generator_multi",
+                max_tokens=min(4000, 300 * len(difficulties) + 200)
+            )
+        except Exception as e:
+            print(f"⚠️ {dim_name} 题目批量生成失败，逐题回退: {str(e)}")
+            items = None
+    
+    texts = _match_multi_items(items, difficulties)
+    questions: List[Optional[Dict[str, Any]]] = [
+        {
+            "id": question_id,
+            "text": text,
+            "dimension": dimension,
+            "difficulty": difficulty,
+            "reference_context": contexts[difficulty] or "暂无知识库相关记录，请基于通用知识生成。"
+        } if text else None
+        for (question_id, difficulty), text in zip(slots, texts)
+    ]
+    
+    missing = [i for i, q in enumerate(questions) if q is None]
+    if missing:
+        if items is not None:
+            print(f"↩️ {dim_name} 有 {len(missing)} 道题缺失或难度不符，改为单题生成")
+        retried = await asyncio.gather(*[
+            _generate_one_question(
+                dimension=dimension,
+                difficulty=slots[i][1],
+                question_id=slots[i][0],
+                resume_context=resume_context,
+                company_scale=company_scale,
+                round_context=round_context,
+                semaphore=semaphore
+            )
+            for i in missing
+        ])
+        for i, q in zip(missing, retried):
+            questions[i] = q
+    return [q for q in questions if q]
 
 
-async def generate_questions(
-    ability_weights: Dict[str, float],
-    count: int = 10,
-    resume_gap_analysis: list[str] = None,
+async def generate_slots(
+    dimension: str,
+    slots: List[Tuple[str, str]],
+    resume_context: str,
+    company_scale: str,
+    round_context: str,
+    semaphore: asyncio.Semaphore,
+    single_call: bool
+) -> List[Dict[str, Any]]:
+    """
+    实时生成一个维度内指定的题目位（slots 为 [(题目 ID, 难度)]），结果按 slots 顺序排列
+    
+    single_call 且多于一题时一次结构化调用生成，否则各题在信号量限制下并发生成
+    """
+    if not slots:
+        return []
+    if single_call and len(slots) > 1:
+        return await _generate_in_one_call(
+            dimension, slots, resume_context, company_scale, round_context, semaphore
+        )
+    results = await asyncio.gather(*[
+        _generate_one_question(
+            dimension=dimension,
+            difficulty=difficulty,
+            question_id=question_id,
+            resume_context=resume_context,
+            company_scale=company_scale,
+            round_context=round_context,
+            semaphore=semaphore
+        )
+        for question_id, difficulty in slots
+    ])
+    return [q for q in results if q]
+
+
+async def _rephrase_bank_questions(
+    dimension: str,
+    questions: List[Dict[str, Any]],
+    company_scale: str,
+    semaphore: asyncio.Semaphore
+) -> List[Dict[str, Any]]:
+    """
+    一次便宜模型调用按公司规模改写一个维度的题库题目；改写失败或缺失的题目保留原文。
+    reference_context 仍是原题的考察点与期望回答要点
+    """
+    if not questions:
+        return questions
+    dim_name = ABILITY_DIMENSIONS.get(dimension, {}).get("name", dimension)
+    async with semaphore:
+        try:
+            items = await llm_service.chat_completion_json(
+                system_prompt=QUESTION_BANK_REPHRASE_SYSTEM_PROMPT.format(
+                    company_scale=company_scale,
+                    scale_focus=get_scale_focus(company_scale)
+                ),
+                user_prompt=QUESTION_BANK_REPHRASE_USER_PROMPT.format(
+                    count=len(questions),
+                    questions="\n".join(f"[{q['bank_id']}] {q['text']}" for q in questions)
+                ),
+                temperature=0.5,
+                call_site="question_bank_rephrase",
+                max_tokens=min(4000, 300 * len(questions) + 200)
+            )
+        except Exception as e:
+            print(f"⚠️ {dim_name} 题库题目改写失败，使用原题: {str(e)}")
+            return questions
+    if isinstance(items, dict):
+        items = items.get("questions")
+    rephrased = {
+        str(item.get("id", "")).strip(): item["text"].strip()
+        for item in items or []
+        if isinstance(item, dict) and isinstance(item.get("text"), str) and item["text"].strip()
+    } if isinstance(items, list) else {}
+    return [dict(q, text=rephrased.get(q["bank_id"], q["text"])) for q in questions]
+
+
+def _bank_slots(
+    dimension: str,
+    slots: List[Tuple[str, str]],
+    resume_context: str,
+    asked_questions: Optional[List[str]]
+) -> List[Dict[str, Any]]:
+    """从结构化题库取题；有简历差距分析时末尾 question_bank_live_per_dimension 道题留给实时生成"""
+    live = min(len(slots), settings.question_bank_live_per_dimension) if resume_context != "无" else 0
+    return question_bank.draw_slots(dimension, slots[:len(slots) - live], asked_questions)
+
+
+async def get_questions_for_dimension(
+    dimension: str,
+    count: int,
+    start_id: int,
+    resume_context: str = "无",
     company_scale: str = "中型公司",
     current_round: int = 1,
-    total_rounds: int = 1
+    total_rounds: int = 1,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    single_call: Optional[bool] = None,
+    use_pool: Optional[bool] = None,
+    use_bank: Optional[bool] = None,
+    asked_questions: Optional[List[str]] = None
 ) -> List[Dict[str, Any]]:
     """
-    根据能力权重生成面试题目（RAG + 简历增强版 + 难度递进）
+    生成指定维度的题目
+    
+    single_call 开启（None 时取配置 question_gen_single_call）且题数大于 1 时，
+    一次结构化 JSON 调用生成该维度全部题目，失败的题目逐题回退；
+    否则各题在信号量限制下并发检索与生成。两种方式的题目 ID 与难度顺序一致。
+    use_bank 开启（None 时取配置 question_bank_enabled）时最先从结构化题库取题（跳过与 asked_questions
+    近似重复的题），期望回答要点作为 reference_context，question_bank_rephrase 开启时按公司规模改写一次；
+    use_pool 开启（None 时取配置 question_pool_enabled）时其余题目位从预生成题库取题，
+    针对简历差距的题目和题库不足的部分仍实时生成。
+    semaphore 为空时按 question_gen_concurrency 新建（同一轮的各维度可共享一个信号量）
     """
-    questions = []
-    resume_context = "无"
-    if resume_gap_analysis:
-        resume_context = "\n".join([f"- {gap}" for gap in resume_gap_analysis])
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(1, settings.question_gen_concurrency))
+    if single_call is None:
+        single_call = settings.question_gen_single_call
+    if use_pool is None:
+        use_pool = settings.question_pool_enabled
+    if use_bank is None:
+        use_bank = settings.question_bank_enabled
     
-    # 1. 计算各维度题目数量
+    difficulties = difficulty_schedule(count, current_round, total_rounds)
+    slots = [(f"q{start_id + i:03d}", difficulty) for i, difficulty in enumerate(difficulties)]
+    round_context = _round_context(current_round, total_rounds)
+    
+    banked: List[Dict[str, Any]] = []
+    if use_bank:
+        banked = await asyncio.to_thread(_bank_slots, dimension, slots, resume_context, asked_questions)
+        drawn = {q["id"] for q in banked}
+        slots = [slot for slot in slots if slot[0] not in drawn]
+    
+    pooled: List[Dict[str, Any]] = []
+    if use_pool:
+        # 有简历差距分析时，末尾若干题（难度最高）保留给针对性的实时生成
+        live = min(len(slots), settings.question_pool_live_per_dimension) if resume_context != "无" else 0
+        pooled = await asyncio.to_thread(
+            question_pool.draw_slots, dimension, company_scale, slots[:len(slots) - live]
+        )
+        drawn = {q["id"] for q in pooled}
+        slots = [slot for slot in slots if slot[0] not in drawn]
+    
+    generating = generate_slots(
+        dimension, slots, resume_context, company_scale, round_context, semaphore, single_call
+    )
+    if banked and settings.question_bank_rephrase:
+        # 改写与其余题目位的实时生成并发进行
+        banked, generated = await asyncio.gather(
+            _rephrase_bank_questions(dimension, banked, company_scale, semaphore), generating
+        )
+    else:
+        generated = await generating
+    return sorted(banked + pooled + generated, key=lambda q: q["id"])
+
+
+async def generate_pool_questions(
+    dimension: str,
+    difficulty: str,
+    company_scale: str,
+    n: int,
+    semaphore: Optional[asyncio.Semaphore] = None
+) -> List[Dict[str, Any]]:
+    """为题库生成 n 道通用题目（不针对具体候选人和轮次）"""
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(1, settings.question_gen_concurrency))
+    slots = [(f"p{i + 1:03d}", difficulty) for i in range(n)]
+    return await generate_slots(
+        dimension, slots, "无", company_scale, "", semaphore, settings.question_gen_single_call
+    )
+
+
+def allocate_dimension_counts(ability_weights: Dict[str, float], count: int) -> Dict[str, int]:
+    """按能力权重分配各维度题目数量"""
     dimension_counts = {}
     total_weight = sum(ability_weights.values())
     
@@ -176,23 +540,186 @@ async def generate_questions(
             max_dim = max(ability_weights, key=ability_weights.get)
             dimension_counts[max_dim] += 1
             current_total += 1
-            
-    # 2. 并行生成各维度题目
+    
+    return dimension_counts
+
+
+async def _deduplicated(
+    dimension_task,
+    index: MinHashIndex,
+    resume_context: str,
+    company_scale: str,
+    round_context: str,
+    semaphore: asyncio.Semaphore
+) -> List[Dict[str, Any]]:
+    """
+    过滤一个维度的生成结果中与本场面试已出题目近似重复的题目
+
+    重复的题目带上"避免重复"提示重新生成（最多 question_dedup_max_retries 次）；重试用尽（或重新生成失败）时
+    保留各版本中相似度最低的一个，只有与已出题目完全相同时才丢弃，缺题数计入 dedup_stats。
+    查重与写入索引之间没有 await，各维度并发执行时不会互相漏判
+    """
+    kept = []
+    for q in await dimension_task:
+        best = None
+        for attempt in range(settings.question_dedup_max_retries + 1):
+            dedup_stats.record(checked=1)
+            match = index.nearest(q["text"])
+            if match is None:
+                index.add(q["text"], q["text"])
+                kept.append(q)
+                best = None
+                break
+            dedup_stats.record(duplicates=1)
+            print(f"♻️ {q['id']} 与已出题目近似重复（相似度 {match[1]:.2f}）: {match[0][:30]}")
+            if best is None or match[1] < best[0]:
+                best = (match[1], q)
+            if attempt == settings.question_dedup_max_retries:
+                break
+            hint = f"不要与这道已出过的题目考察同一内容：{match[0]}"
+            dedup_stats.record(regenerated=1)
+            regenerated = await _generate_one_question(
+                dimension=q["dimension"],
+                difficulty=q["difficulty"],
+                question_id=q["id"],
+                resume_context=resume_context,
+                company_scale=company_scale,
+                round_context=f"{round_context}\n{hint}".strip(),
+                semaphore=semaphore
+            )
+            if regenerated is None:
+                break
+            q = regenerated
+        if best is None:
+            continue
+        similarity, candidate = best
+        if similarity < 1.0:
+            print(f"⚠️ {candidate['id']} 重新生成后仍近似重复，保留相似度最低的版本（{similarity:.2f}）")
+            index.add(candidate["text"], candidate["text"])
+            kept.append(candidate)
+            dedup_stats.record(kept_similar=1)
+        else:
+            print(f"🗑️ {candidate['id']} 重新生成后仍与已出题目相同，丢弃（本轮少 1 道题）")
+            dedup_stats.record(dropped=1)
+    return kept
+
+
+def _resume_context(resume_gap_analysis: Optional[List[str]]) -> str:
+    if not resume_gap_analysis:
+        return "无"
+    return "\n".join([f"- {gap}" for gap in resume_gap_analysis])
+
+
+def _build_dimension_tasks(
+    ability_weights: Dict[str, float],
+    count: int,
+    resume_gap_analysis: Optional[List[str]],
+    company_scale: str,
+    current_round: int,
+    total_rounds: int,
+    asked_questions: Optional[List[str]] = None
+) -> list:
+    """
+    为每个维度构建一个生成协程，题目 ID 按维度顺序连续分配
+
+    开启近似重复检测时，各维度结果与 asked_questions（本场面试之前各轮的题目）及本轮已生成的题目查重
+    """
+    resume_context = _resume_context(resume_gap_analysis)
+    
     tasks = []
     current_id = 1
+    # 整轮共享一个信号量，限制同时进行的单题生成数
+    semaphore = asyncio.Semaphore(max(1, settings.question_gen_concurrency))
+    
+    index = None
+    if settings.question_dedup_enabled:
+        index = MinHashIndex()
+        for text in asked_questions or []:
+            index.add(text, text)
+    round_context = _round_context(current_round, total_rounds)
     
-    for dim, dim_count in dimension_counts.items():
+    for dim, dim_count in allocate_dimension_counts(ability_weights, count).items():
         if dim_count > 0:
-            tasks.append(get_questions_for_dimension(
+            task = get_questions_for_dimension(
                 dimension=dim, 
                 count=dim_count, 
                 start_id=current_id,
                 resume_context=resume_context,
                 company_scale=company_scale,
                 current_round=current_round,
-                total_rounds=total_rounds
-            ))
+                total_rounds=total_rounds,
+                semaphore=semaphore,
+                asked_questions=asked_questions
+            )
+            if index is not None:
+                task = _deduplicated(task, index, resume_context, company_scale, round_context, semaphore)
+            tasks.append(task)
             current_id += dim_count
+    
+    return tasks
+
+
+async def generate_question_at(
+    dimension: str,
+    difficulty: str,
+    question_id: str,
+    resume_gap_analysis: Optional[List[str]] = None,
+    company_scale: str = "中型公司",
+    asked_questions: Optional[List[str]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    生成指定维度与难度的一道题（自适应面试逐题出题用）
+
+    与整轮出题一样依次优先取结构化题库、预生成题库（无简历差距分析时）并与 asked_questions 查重；失败时返回 None
+    """
+    resume_context = _resume_context(resume_gap_analysis)
+    semaphore = asyncio.Semaphore(1)
+    slots = [(question_id, difficulty)]
+    
+    async def pick() -> List[Dict[str, Any]]:
+        if settings.question_bank_enabled and resume_context == "无":
+            banked = await asyncio.to_thread(question_bank.draw_slots, dimension, slots, asked_questions)
+            if banked:
+                if settings.question_bank_rephrase:
+                    banked = await _rephrase_bank_questions(dimension, banked, company_scale, semaphore)
+                return banked
+        if settings.question_pool_enabled and resume_context == "无":
+            pooled = await asyncio.to_thread(question_pool.draw_slots, dimension, company_scale, slots)
+            if pooled:
+                return pooled
+        return await generate_slots(dimension, slots, resume_context, company_scale, "", semaphore, False)
+    
+    task = pick()
+    if settings.question_dedup_enabled:
+        index = MinHashIndex()
+        for text in asked_questions or []:
+            index.add(text, text)
+        task = _deduplicated(task, index, resume_context, company_scale, "", semaphore)
+    questions = await task
+    return questions[0] if questions else None
+
+
+async def generate_questions(
+    ability_weights: Dict[str, float],
+    count: int = 10,
+    resume_gap_analysis: list[str] = None,
+    company_scale: str = "中型公司",
+    current_round: int = 1,
+    total_rounds: int = 1,
+    asked_questions: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    根据能力权重生成面试题目（RAG + 简历增强版 + 难度递进）
+    
+    asked_questions 为本场面试之前各轮已出的题目，与之近似重复的题目会被重新生成或丢弃
+    """
+    questions = []
+    
+    # 并行生成各维度题目
+    tasks = _build_dimension_tasks(
+        ability_weights, count, resume_gap_analysis,
+        company_scale, current_round, total_rounds, asked_questions
+    )
             
     # 等待所有生成任务完成
     results = await asyncio.gather(*tasks)
@@ -200,5 +727,46 @@ async def generate_questions(
     # 展平结果
     for res in results:
         questions.extend(res)
+    if len(questions) < count:
+        print(f"⚠️ 本轮只生成了 {len(questions)}/{count} 道题")
         
     return questions[:count]
+
+
+async def generate_questions_stream(
+    ability_weights: Dict[str, float],
+    count: int = 10,
+    resume_gap_analysis: list[str] = None,
+    company_scale: str = "中型公司",
+    current_round: int = 1,
+    total_rounds: int = 1,
+    asked_questions: Optional[List[str]] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    流式生成面试题目
+    
+    每个维度完成后立即产出 {"type": "question", "data": 题目}，
+    全部完成后产出 {"type": "result", "data": 按 ID 排序的题目列表}
+    """
+    tasks = [
+        asyncio.ensure_future(coro) for coro in _build_dimension_tasks(
+            ability_weights, count, resume_gap_analysis,
+            company_scale, current_round, total_rounds, asked_questions
+        )
+    ]
+    
+    questions = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            res = await next_done
+            for q in res:
+                yield {"type": "question", "data": q}
+            questions.extend(res)
+    finally:
+        # 客户端断开时取消尚未完成的生成任务
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+    
+    questions.sort(key=lambda q: q["id"])
+    yield {"type": "result", "data": questions[:count]}
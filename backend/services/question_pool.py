@@ -0,0 +1,265 @@
+"""
+预生成题库
+通用题目（不含简历差距与轮次信息）按（维度, 难度, 公司规模）预先生成并持久化，
+出题时直接取用，省去检索与 LLM 调用；后台补货线程在未用题目低于低水位时补到目标数量
+"""
+import asyncio
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import func, update
+from config import settings, ABILITY_DIMENSIONS
+from database import PooledQuestion, SessionLocal, DifficultyLevel, is_db_available
+
+DIFFICULTIES = [level.value for level in DifficultyLevel]
+
+
+class QuestionPool:
+    """题库存取；数据库不可用时所有操作退化为空"""
+
+    def draw(self, dimension: str, difficulty: str, company_scale: str, n: int) -> List[Dict[str, Any]]:
+        """
+        取出最多 n 道未用题目并标记为已用
+
+        逐条以 used_at IS NULL 为条件更新，多进程/多线程同时取题时同一道题只会被一方取到
+        """
+        if n <= 0 or not is_db_available():
+            return []
+        db = SessionLocal()
+        try:
+            candidates = (
+                db.query(PooledQuestion)
+                .filter(
+                    PooledQuestion.dimension == dimension,
+                    PooledQuestion.difficulty == difficulty,
+                    PooledQuestion.company_scale == company_scale,
+                    PooledQuestion.used_at.is_(None)
+                )
+                .order_by(PooledQuestion.id)
+                .limit(n * 2)
+                .all()
+            )
+            now = datetime.now()
+            claimed = []
+            for row in candidates:
+                if len(claimed) >= n:
+                    break
+                result = db.execute(
+                    update(PooledQuestion)
+                    .where(PooledQuestion.id == row.id, PooledQuestion.used_at.is_(None))
+                    .values(used_at=now)
+                )
+                if result.rowcount == 1:
+                    claimed.append({
+                        "text": row.text,
+                        "dimension": row.dimension,
+                        "difficulty": row.difficulty,
+                        "reference_context": row.reference_context
+                    })
+            db.commit()
+            return claimed
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ 题库取题失败: {str(e)}")
+            return []
+        finally:
+            db.close()
+
+    def draw_slots(
+        self,
+        dimension: str,
+        company_scale: str,
+        slots: List[Tuple[str, str]]
+    ) -> List[Dict[str, Any]]:
+        """按题目位 [(题目 ID, 难度)] 取题并填入 ID；题库不足的位置不返回"""
+        by_difficulty: Dict[str, List[str]] = {}
+        for question_id, difficulty in slots:
+            by_difficulty.setdefault(difficulty, []).append(question_id)
+
+        questions = []
+        for difficulty, ids in by_difficulty.items():
+            drawn = self.draw(dimension, difficulty, company_scale, len(ids))
+            for question_id, q in zip(ids, drawn):
+                q["id"] = question_id
+                questions.append(q)
+        if len(questions) < len(slots):
+            pool_replenisher.wake()
+        return questions
+
+    def add(self, questions: List[Dict[str, Any]], company_scale: str) -> int:
+        """写入生成好的题目，返回写入条数"""
+        if not questions or not is_db_available():
+            return 0
+        db = SessionLocal()
+        try:
+            db.add_all([
+                PooledQuestion(
+                    dimension=q["dimension"],
+                    difficulty=q["difficulty"],
+                    company_scale=company_scale,
+                    text=q["text"],
+                    reference_context=q.get("reference_context")
+                )
+                for q in questions
+            ])
+            db.commit()
+            return len(questions)
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ 题库写入失败: {str(e)}")
+            return 0
+        finally:
+            db.close()
+
+    def levels(self) -> Dict[Tuple[str, str, str], int]:
+        """各（维度, 难度, 公司规模）的未用题目数"""
+        if not is_db_available():
+            return {}
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(
+                    PooledQuestion.dimension,
+                    PooledQuestion.difficulty,
+                    PooledQuestion.company_scale,
+                    func.count(PooledQuestion.id)
+                )
+                .filter(PooledQuestion.used_at.is_(None))
+                .group_by(PooledQuestion.dimension, PooledQuestion.difficulty, PooledQuestion.company_scale)
+                .all()
+            )
+            return {(dim, diff, scale): count for dim, diff, scale, count in rows}
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        levels = self.levels()
+        by_scale = Counter()
+        for (_, _, scale), count in levels.items():
+            by_scale[scale] += count
+        below = [
+            slot for slot in pool_replenisher.slots()
+            if levels.get(slot, 0) < settings.question_pool_low_water
+        ]
+        return {
+            "enabled": settings.question_pool_enabled,
+            "available": sum(levels.values()),
+            "available_by_scale": dict(by_scale),
+            "slots_below_low_water": len(below),
+            "replenisher": pool_replenisher.stats()
+        }
+
+
+class PoolReplenisher:
+    """
+    后台补货线程：定期（或取题不足时被唤醒）检查各（维度, 难度, 公司规模）的库存，
+    低于 question_pool_low_water 的补到 question_pool_target。线程内使用独立事件循环
+    """
+
+    def __init__(self, pool: QuestionPool):
+        self.pool = pool
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self.cycles = 0
+        self.generated = 0
+        self.failures = 0
+        self.last_cycle_at: Optional[float] = None
+
+    @staticmethod
+    def slots() -> List[Tuple[str, str, str]]:
+        return [
+            (dim, difficulty, scale)
+            for scale in settings.question_pool_scales
+            for dim in ABILITY_DIMENSIONS
+            for difficulty in DIFFICULTIES
+        ]
+
+    async def refill_once(self) -> int:
+        """补货一次，返回新增题目数"""
+        from services.question_generator import generate_pool_questions
+
+        levels = await asyncio.to_thread(self.pool.levels)
+        added = 0
+        for dim, difficulty, scale in self.slots():
+            if self._stop.is_set():
+                break
+            have = levels.get((dim, difficulty, scale), 0)
+            if have >= settings.question_pool_low_water:
+                continue
+            need = max(0, settings.question_pool_target - have)
+            try:
+                questions = await generate_pool_questions(dim, difficulty, scale, need)
+            except Exception as e:
+                self.failures += 1
+                print(f"⚠️ 题库补货失败 {dim}/{difficulty}/{scale}: {str(e)}")
+                continue
+            added += await asyncio.to_thread(self.pool.add, questions, scale)
+        self.cycles += 1
+        self.generated += added
+        self.last_cycle_at = time.time()
+        if added:
+            print(f"🧺 题库补货 {added} 道")
+        return added
+
+    async def _refill_in_thread(self) -> int:
+        from services.llm_service import llm_service
+        from services.rag_service import rag_service
+
+        try:
+            return await self.refill_once()
+        finally:
+            # 该线程的事件循环即将关闭，先关闭其上的连接池
+            await llm_service.aclose()
+            await rag_service.aclose()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                asyncio.run(self._refill_in_thread())
+            except Exception as e:
+                self.failures += 1
+                print(f"⚠️ 题库补货线程异常: {str(e)}")
+            self._wake.wait(timeout=settings.question_pool_check_interval)
+            self._wake.clear()
+
+    def start(self):
+        """启动后台线程（已在运行时不重复启动）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="question-pool", daemon=True)
+            self._thread.start()
+            print("🧺 题库补货线程已启动")
+
+    def wake(self):
+        """提前触发一次检查"""
+        self._wake.set()
+
+    def stop(self, timeout: float = 5.0):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        thread.join(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "cycles": self.cycles,
+            "generated": self.generated,
+            "failures": self.failures,
+            "last_cycle_at": self.last_cycle_at
+        }
+
+
+# 全局实例
+question_pool = QuestionPool()
+pool_replenisher = PoolReplenisher(question_pool)
@@ -0,0 +1,119 @@
+"""
+检索结果缓存
+出题检索的 query 由维度、难度、公司规模拼成，取值空间很小，同一 query 在各轮面试中反复出现。
+按 (dataset_id, 归一化 query, top_k, similarity_threshold, 过滤条件) 缓存检索到的片段：内存 LRU + TTL，
+知识库重新索引后可按 dataset 显式失效
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from config import settings
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """全角转半角、统一小写、合并空白"""
+    return _SPACE_RE.sub(" ", unicodedata.normalize("NFKC", query or "")).strip().lower()
+
+
+def retrieval_cache_key(
+    dataset_id: str,
+    query: str,
+    top_k: int,
+    similarity_threshold: float,
+    filters: Optional[Dict[str, FrozenSet]] = None
+) -> Tuple:
+    """filters 为 normalize_filters 的结果（字段 → 允许的标签集合）"""
+    filter_key = tuple(sorted(
+        (field, tuple(sorted(allowed, key=lambda v: (v is None, str(v)))))
+        for field, allowed in (filters or {}).items()
+    ))
+    return (dataset_id, normalize_query(query), int(top_k), round(float(similarity_threshold), 4), filter_key)
+
+
+class RetrievalCache:
+    """
+    检索结果的 TTL + LRU 缓存（线程安全）
+
+    每个 dataset 有一个版本号，invalidate 时递增（全部失效时递增全局版本）；写入时带上检索开始前
+    读到的版本号，版本已变化（检索期间被失效）的结果不会写入
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple, Tuple[List[Dict[str, Any]], float]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def version(self, dataset_id: str) -> Tuple[int, int]:
+        with self._lock:
+            return self._epoch, self._versions.get(dataset_id, 0)
+
+    def get(self, key: Tuple) -> Optional[List[Dict[str, Any]]]:
+        """读取缓存，未命中或已过期返回 None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                chunks, stored_at = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return chunks
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def set(self, key: Tuple, chunks: List[Dict[str, Any]], version: Optional[Tuple[int, int]] = None):
+        """写入缓存；version 与 dataset 当前版本不一致时丢弃"""
+        with self._lock:
+            if version is not None and version != (self._epoch, self._versions.get(key[0], 0)):
+                return
+            self._entries[key] = (list(chunks), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, dataset_id: Optional[str] = None) -> int:
+        """失效某个 dataset（为空时全部）的缓存，返回删除的条目数"""
+        with self._lock:
+            if dataset_id is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._epoch += 1
+            else:
+                stale = [key for key in self._entries if key[0] == dataset_id]
+                for key in stale:
+                    del self._entries[key]
+                removed = len(stale)
+                self._versions[dataset_id] = self._versions.get(dataset_id, 0) + 1
+            self.invalidations += 1
+            return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": settings.rag_cache_enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
@@ -2,30 +2,213 @@
 RAGFlow 服务
 用于与 RAGFlow 知识库交互
 """
+import asyncio
+import importlib.util
+import threading
+import time
+import weakref
 import httpx
 from typing import List, Dict, Any, Optional
 from config import settings
+from services.llm_governor import backoff_delay
+from services.local_retriever import local_retriever, matches_filters, normalize_filters, tag_remote_chunk
+from services.rag_cache import RetrievalCache, retrieval_cache_key
+from services.singleflight import SingleFlight
+from services.cassette import Cassette, rag_request_key, cassette as default_cassette
+
+# 可重试的 HTTP 状态码
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# 剩余时限不足该值（秒）时不再发起新的尝试
+MIN_ATTEMPT_SECONDS = 0.05
+_H2_AVAILABLE = importlib.util.find_spec("h2") is not None
+if settings.ragflow_http2 and not _H2_AVAILABLE:
+    print("⚠️ 未安装 h2，RAGFlow 客户端使用 HTTP/1.1")
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
 
 class RAGService:
     """RAGFlow 服务封装"""
     
-    def __init__(self):
+    def __init__(self, cassette: Optional[Cassette] = None):
         self.api_key = settings.ragflow_api_key
         self.base_url = settings.ragflow_api_base
         self.dataset_id = settings.ragflow_dataset_id
+        self.singleflight = SingleFlight("rag")
+        self.cassette = cassette
+        self.cache = RetrievalCache(
+            max_entries=settings.rag_cache_max_entries,
+            ttl_seconds=settings.rag_cache_ttl_seconds
+        )
+        # 每个事件循环各自的客户端（循环被回收后条目自动消失）
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._clients_lock = threading.Lock()
+        
+    @property
+    def backend(self) -> str:
+        """当前使用的检索后端：ragflow 或 local"""
+        if settings.rag_backend == "auto":
+            return "ragflow" if self.api_key and self.dataset_id else "local"
+        return settings.rag_backend
+        
+    def get_client(self) -> httpx.AsyncClient:
+        """
+        获取当前事件循环的 HTTP 客户端
         
-    async def retrieve(self, query: str, top_k: int = 5, similarity_threshold: float = 0.5) -> List[Dict[str, Any]]:
+        同一事件循环内共享一个 keep-alive 连接池（可用时走 HTTP/2 多路复用）；Streamlit 每次 run_async 会新建事件循环，
+        题目预取、题库补货在后台线程中各自运行事件循环，因此按循环分别持有客户端，避免复用绑定在其他循环上的连接。
+        """
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            client = self._clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(
+                    http2=settings.ragflow_http2 and _H2_AVAILABLE,
+                    timeout=httpx.Timeout(settings.ragflow_timeout, connect=settings.ragflow_connect_timeout),
+                    limits=httpx.Limits(
+                        max_connections=settings.ragflow_max_connections,
+                        max_keepalive_connections=settings.ragflow_max_keepalive_connections,
+                        keepalive_expiry=settings.ragflow_keepalive_expiry
+                    )
+                )
+                self._clients[loop] = client
+        return client
+    
+    async def aclose(self):
+        """关闭当前事件循环的连接池（FastAPI lifespan 结束、后台线程的事件循环结束前调用）"""
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            client = self._clients.pop(loop, None)
+            for stale in [l for l in self._clients if l.is_closed()]:
+                del self._clients[stale]
+        if client is not None:
+            await client.aclose()
+        
+    async def retrieve(
+        self,
+        query: str,
+        top_k: int = 5,
+        similarity_threshold: float = 0.5,
+        budget: Optional[float] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
         """
         从知识库检索相关内容
         
+        本地后端直接在进程内检索（不经过缓存）。RAGFlow 后端先查检索结果缓存（query 归一化后作为键）；
+        未命中时相同参数的并发检索合并为一次 RAGFlow 请求。只缓存非空结果（检索失败同样返回空列表，不应被缓存）
+        
         Args:
             query: 检索关键词
             top_k: 返回数量
             similarity_threshold: 相似度阈值
+            budget: 调用方剩余的时间预算（秒），与 ragflow_deadline_seconds 取较小者作为检索时限（含重试）
+            filters: 按片段标签过滤，如 {"dimension": "system_thinking", "difficulty": ["进阶", None]}
+                （字段为 dimension / difficulty / doc_type，列表中的 None 表示接受未打该标签的片段）。
+                本地后端先划出候选片段再打分；RAGFlow 后端多取 rag_filter_overfetch 倍结果后按标签过滤
             
         Returns:
             检索结果列表
         """
+        normalized = normalize_filters(filters)
+        if self.backend == "local":
+            return local_retriever.search(query, top_k, similarity_threshold, normalized)
+        
+        cache_key = retrieval_cache_key(self.dataset_id, query, top_k, similarity_threshold, normalized)
+        if settings.rag_cache_enabled:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return list(cached)
+        version = self.cache.version(self.dataset_id)
+        
+        limit = settings.ragflow_deadline_seconds if budget is None else min(budget, settings.ragflow_deadline_seconds)
+        deadline = time.monotonic() + limit
+        fetch_k = top_k * max(1, settings.rag_filter_overfetch) if normalized else top_k
+        if settings.rag_singleflight_enabled:
+            chunks = await self.singleflight.do(
+                "|".join(str(part) for part in cache_key),
+                lambda: self._retrieve_remote(query, fetch_k, similarity_threshold, deadline)
+            )
+        else:
+            chunks = await self._retrieve_remote(query, fetch_k, similarity_threshold, deadline)
+        if normalized:
+            chunks = [
+                chunk for chunk in map(tag_remote_chunk, chunks) if matches_filters(chunk, normalized)
+            ][:top_k]
+        if chunks and settings.rag_cache_enabled:
+            self.cache.set(cache_key, chunks, version=version)
+        return list(chunks)
+    
+    def invalidate_cache(self, dataset_id: Optional[str] = None) -> int:
+        """知识库重新索引后失效检索缓存（dataset_id 为空时全部失效，并重建本地检索索引），返回删除的条目数"""
+        removed = self.cache.invalidate(dataset_id)
+        if dataset_id is None:
+            local_retriever.reload()
+        print(f"🧹 检索缓存已失效 {dataset_id or '全部'}: {removed} 条")
+        return removed
+    
+    async def _post_with_retry(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        headers: Dict[str, str],
+        deadline: float
+    ) -> Optional[httpx.Response]:
+        """
+        发送检索请求：连接错误、超时与 429/5xx 按全抖动指数退避重试；
+        每次尝试的超时不超过剩余时限，剩余时限不够再等一次退避时放弃（返回 None）
+        """
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining < MIN_ATTEMPT_SECONDS:
+                print("⏱️ RAGFlow 检索超出时限")
+                return None
+            retry_after = None
+            try:
+                response = await self.get_client().post(
+                    url,
+                    json=payload,
+                    headers=headers,
+                    timeout=httpx.Timeout(
+                        min(settings.ragflow_timeout, remaining),
+                        connect=min(settings.ragflow_connect_timeout, remaining)
+                    )
+                )
+            except httpx.TransportError as e:
+                error = type(e).__name__
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    return response
+                error = f"HTTP {response.status_code}"
+                retry_after = _retry_after(response)
+            
+            attempt += 1
+            delay = backoff_delay(attempt, retry_after, settings.ragflow_backoff_base, settings.ragflow_backoff_max)
+            if attempt > settings.ragflow_max_retries or time.monotonic() + delay + MIN_ATTEMPT_SECONDS > deadline:
+                print(f"❌ RAGFlow 请求失败（{error}），已重试 {attempt - 1} 次")
+                return None
+            print(f"⚠️ RAGFlow 请求失败（{error}），{delay:.2f}s 后第 {attempt} 次重试")
+            await asyncio.sleep(delay)
+    
+    async def _retrieve_remote(
+        self,
+        query: str,
+        top_k: int,
+        similarity_threshold: float,
+        deadline: float
+    ) -> List[Dict[str, Any]]:
+        """调用 RAGFlow 检索 API（开启录制回放时读写 cassette）"""
+        if self.cassette is not None and self.cassette.replaying:
+            return self.cassette.lookup(
+                "rag", rag_request_key(self.dataset_id, query, top_k, similarity_threshold)
+            )
+
         if not self.api_key or not self.dataset_id:
             print("❌ RAGFlow 配置缺失: API Key 或 Dataset ID 未设置")
             return []
@@ -46,25 +229,33 @@ class RAGService:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(url, json=payload, headers=headers)
-                
-                if response.status_code != 200:
-                    print(f"❌ RAGFlow API 错误: {response.status_code} - {response.text}")
-                    return []
-                
-                data = response.json()
-                if data.get("code") != 0:
-                    print(f"❌ RAGFlow 业务错误: {data.get('message')}")
-                    return []
-                
-                # 解析返回结果
-                # RAGFlow 返回结构通常为 data: { chunks: [...] }
-                chunks = data.get("data", {}).get("chunks", [])
-                return chunks
+            response = await self._post_with_retry(url, payload, headers, deadline)
+            if response is None:
+                return []
+            
+            if response.status_code != 200:
+                print(f"❌ RAGFlow API 错误: {response.status_code} - {response.text}")
+                return []
+            
+            data = response.json()
+            if data.get("code") != 0:
+                print(f"❌ RAGFlow 业务错误: {data.get('message')}")
+                return []
+            
+            # 解析返回结果
+            # RAGFlow 返回结构通常为 data: { chunks: [...] }
+            chunks = data.get("data", {}).get("chunks", [])
+            if self.cassette is not None and self.cassette.recording:
+                self.cassette.record(
+                    "rag",
+                    rag_request_key(self.dataset_id, query, top_k, similarity_threshold),
+                    {"dataset_id": self.dataset_id, "query": query, "top_k": top_k},
+                    chunks
+                )
+            return chunks
                 
         except Exception as e:
             print(f"❌ RAGFlow 请求异常: {str(e)}")
             return []
 
-rag_service = RAGService()
+rag_service = RAGService(cassette=default_cassette)
@@ -0,0 +1,110 @@
+"""
+下一轮面试题后台预取
+进入第 N 轮后即在后台线程中投机生成第 N+1 轮题目；进入下一轮时如果生成参数
+（能力权重、差距分析、公司规模、轮次等）未变则直接使用预取结果，否则丢弃并重新生成
+"""
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from config import settings
+from services.llm_service import llm_service
+from services.question_generator import generate_questions
+from services.rag_service import rag_service
+
+# 所有会话共享的后台线程池；每个任务在自己的事件循环中运行
+_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.round_prefetch_workers),
+    thread_name_prefix="round-prefetch"
+)
+
+
+def round_key(
+    ability_weights: Dict[str, float],
+    count: int,
+    resume_gap_analysis: Optional[List[str]],
+    company_scale: str,
+    current_round: int,
+    total_rounds: int,
+    asked_questions: Optional[List[str]] = None
+) -> str:
+    """由一轮题目的全部生成参数计算预取键"""
+    raw = json.dumps({
+        "weights": ability_weights,
+        "count": count,
+        "gaps": resume_gap_analysis or [],
+        "scale": company_scale,
+        "round": current_round,
+        "total_rounds": total_rounds,
+        "asked": asked_questions or []
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def _generate(params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    try:
+        return await generate_questions(**params)
+    finally:
+        # 该线程的事件循环即将关闭，先关闭其上的连接池
+        await llm_service.aclose()
+        await rag_service.aclose()
+
+
+def _generate_in_thread(params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return asyncio.run(_generate(params))
+
+
+class RoundPrefetcher:
+    """单个面试会话的下一轮题目预取"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def prefetch(self, **params) -> str:
+        """在后台开始生成（参数同 generate_questions）；同一参数已在预取时不重复提交"""
+        key = round_key(**params)
+        with self._lock:
+            if key not in self._futures:
+                self._futures[key] = _executor.submit(_generate_in_thread, params)
+                print(f"🔮 后台预取第 {params['current_round']} 轮题目")
+        return key
+
+    def take(self, timeout: Optional[float] = None, **params) -> Optional[List[Dict[str, Any]]]:
+        """
+        取出与参数完全匹配的预取结果；仍在生成时等待其完成（最多 timeout 秒）
+
+        参数不匹配的预取视为过期并丢弃。没有可用结果时返回 None，由调用方重新生成
+        """
+        key = round_key(**params)
+        with self._lock:
+            future = self._futures.pop(key, None)
+            stale = list(self._futures.values())
+            self._futures.clear()
+        for f in stale:
+            f.cancel()
+
+        if future is None:
+            self.misses += 1
+            return None
+        try:
+            questions = future.result(timeout=settings.round_prefetch_wait_seconds if timeout is None else timeout)
+        except Exception as e:
+            print(f"⚠️ 预取的题目不可用，重新生成: {type(e).__name__} {str(e)}")
+            self.misses += 1
+            return None
+        if not questions:
+            self.misses += 1
+            return None
+        self.hits += 1
+        print(f"⚡ 使用预取的第 {params['current_round']} 轮题目")
+        return questions
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = sum(1 for f in self._futures.values() if not f.done())
+        return {"hits": self.hits, "misses": self.misses, "pending": pending}
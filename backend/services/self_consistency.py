@@ -0,0 +1,123 @@
+"""
+多次采样评分（self-consistency）的聚合与停止判定
+同一回答分波次并发采样评分，取平均分；每波结束后按当前估计判断是否停止：
+- 平均分的标准误降到 evaluate_sc_se_target 以下，或
+- 真实分数与平均分落在同一分档（🔴/🟡/🟢，分档线同 llm_cascade_borderline_scores）的概率达到 evaluate_sc_confidence_target
+单道题的样本方差在样本很少时不可靠，按已完成题目的合并组内方差做收缩（首题前用 evaluate_sc_prior_std）
+"""
+import math
+import threading
+from typing import Any, Dict, List, Optional
+from config import settings
+
+
+def _phi(x: float) -> float:
+    return 0.5 * (1 + math.erf(x / math.sqrt(2)))
+
+
+def band_confidence(mean: float, standard_error: float, lines: Optional[List[float]] = None) -> float:
+    """真实分数 ~ N(mean, se²) 时与 mean 落在同一分档的概率"""
+    lines = sorted(settings.llm_cascade_borderline_scores if lines is None else lines)
+    if standard_error <= 0:
+        return 1.0
+    lower = max((line for line in lines if line <= mean), default=None)
+    upper = min((line for line in lines if line > mean), default=None)
+    p_upper = _phi((upper - mean) / standard_error) if upper is not None else 1.0
+    p_lower = _phi((lower - mean) / standard_error) if lower is not None else 0.0
+    return p_upper - p_lower
+
+
+class ScoreAggregate:
+    """一道题的采样分数；单样本方差以 prior_variance（权重 prior_weight 个自由度）收缩"""
+
+    def __init__(self, prior_variance: float, prior_weight: float = 2.0):
+        self.prior_variance = prior_variance
+        self.prior_weight = prior_weight
+        self.scores: List[float] = []
+
+    def add(self, score: float):
+        self.scores.append(float(score))
+
+    @property
+    def n(self) -> int:
+        return len(self.scores)
+
+    @property
+    def mean(self) -> float:
+        return sum(self.scores) / self.n if self.scores else 0.0
+
+    @property
+    def sum_squares(self) -> float:
+        mean = self.mean
+        return sum((s - mean) ** 2 for s in self.scores)
+
+    @property
+    def variance(self) -> float:
+        """单次采样分数的方差估计"""
+        return (self.prior_weight * self.prior_variance + self.sum_squares) / (self.prior_weight + self.n - 1)
+
+    @property
+    def standard_error(self) -> float:
+        return math.sqrt(self.variance / self.n) if self.scores else float("inf")
+
+    @property
+    def confidence(self) -> float:
+        return band_confidence(self.mean, self.standard_error) if self.scores else 0.0
+
+    def settled(self) -> bool:
+        return bool(self.scores) and (
+            self.standard_error <= settings.evaluate_sc_se_target
+            or self.confidence >= settings.evaluate_sc_confidence_target
+        )
+
+
+class SelfConsistencyStats:
+    """采样统计（平均采样数、提前停止比例）与合并组内方差"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.answers = 0
+            self.samples = 0
+            self.settled = 0
+            self._sum_squares = 0.0
+            self._dof = 0
+
+    @property
+    def prior_variance(self) -> float:
+        """合并组内方差；自由度不足 10 时用 evaluate_sc_prior_std²"""
+        with self._lock:
+            if self._dof >= 10:
+                return self._sum_squares / self._dof
+        return settings.evaluate_sc_prior_std ** 2
+
+    def aggregate(self) -> ScoreAggregate:
+        return ScoreAggregate(self.prior_variance)
+
+    def record(self, aggregate: ScoreAggregate):
+        with self._lock:
+            self.answers += 1
+            self.samples += aggregate.n
+            self.settled += aggregate.settled()
+            if aggregate.n > 1:
+                self._sum_squares += aggregate.sum_squares
+                self._dof += aggregate.n - 1
+
+    def stats(self) -> Dict[str, Any]:
+        prior_std = math.sqrt(self.prior_variance)
+        with self._lock:
+            return {
+                "enabled": settings.evaluate_self_consistency_enabled,
+                "answers": self.answers,
+                "samples": self.samples,
+                "avg_samples": round(self.samples / self.answers, 3) if self.answers else 0.0,
+                "settled_rate": round(self.settled / self.answers, 4) if self.answers else 0.0,
+                "score_std": round(prior_std, 3)
+            }
+
+
+# 全局实例
+self_consistency_stats = SelfConsistencyStats()
@@ -0,0 +1,58 @@
+"""
+Single-flight 请求合并
+同一个 key 的并发请求只发起一次上游调用，其余请求等待并共享该结果。
+与缓存不同，它覆盖的是第一个结果产生之前的时间窗口；调用完成后即从表中移除。
+
+调用方之间共享同一个结果对象，拿到结果后不应原地修改。
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """按 key 合并并发中的相同请求"""
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple[int, str], asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行 factory() 或加入已在进行中的同 key 调用
+
+        上游调用在独立任务中运行：某个等待者被取消不会中断其他等待者。
+        合并范围限定在同一事件循环内（Streamlit 每次调用都使用新的事件循环）。
+        """
+        loop = asyncio.get_running_loop()
+        call_key = (id(loop), key)
+        with self._lock:
+            task = self._calls.get(call_key)
+            if task is not None and not task.done():
+                self.coalesced += 1
+            else:
+                task = loop.create_task(factory())
+                self._calls[call_key] = task
+                self.leaders += 1
+                task.add_done_callback(lambda t, k=call_key: self._forget(k, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, call_key: Tuple[int, str], task: asyncio.Future):
+        with self._lock:
+            if self._calls.get(call_key) is task:
+                del self._calls[call_key]
+        # 所有等待者都已取消时，避免 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = len(self._calls)
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": in_flight
+        }
@@ -0,0 +1,32 @@
+"""
+文本处理工具
+面向中文的字符 n-gram 切分与分句，不依赖分词库
+"""
+import re
+from typing import List, Set
+
+# 去除空白与常见中英文标点，只保留参与 n-gram 的字符
+_STRIP_RE = re.compile(r"[\s\u3000-\u303f\uff00-\uff0f\uff1a-\uff20\uff3b-\uff40\uff5b-\uff65!-/:-@\[-`{-~]+")
+_SENTENCE_RE = re.compile(r"[^。！？!?；;\n]+[。！？!?；;]?")
+
+
+def normalize_text(text: str) -> str:
+    """去掉空白和标点并统一小写"""
+    return _STRIP_RE.sub("", text or "").lower()
+
+
+def char_ngrams(text: str, n: int = 2) -> List[str]:
+    """字符 n-gram 序列（文本短于 n 时返回整个文本）"""
+    normalized = normalize_text(text)
+    if len(normalized) <= n:
+        return [normalized] if normalized else []
+    return [normalized[i:i + n] for i in range(len(normalized) - n + 1)]
+
+
+def char_ngram_set(text: str, n: int = 2) -> Set[str]:
+    return set(char_ngrams(text, n))
+
+
+def split_sentences(text: str) -> List[str]:
+    """按中英文句末标点和换行分句，保留标点"""
+    return [s.strip() for s in _SENTENCE_RE.findall(text or "") if s.strip()]
@@ -0,0 +1,16 @@
+"""
+Token 数粗略估算
+不依赖具体模型的分词器：中日韩字符约 1 token/字，其余字符约 4 字符/token
+"""
+import re
+
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的 token 数"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    other = len(text) - cjk
+    return cjk + (other + 3) // 4
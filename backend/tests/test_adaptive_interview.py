@@ -0,0 +1,90 @@
+"""
+自适应面试：下一题生成失败（返回空或抛出异常）后会话仍可重试，已作答的题目不会被重复作答
+"""
+import asyncio
+
+import httpx
+import pytest
+
+import main
+import services.adaptive_interview as adaptive_interview
+from services.adaptive_interview import AdaptiveInterview, QuestionGenerationError, adaptive_sessions
+
+WEIGHTS = {
+    "business_decomposition": 0.2,
+    "ai_tech_understanding": 0.3,
+    "business_awareness": 0.1,
+    "system_thinking": 0.2,
+    "execution_power": 0.1,
+    "risk_awareness": 0.1
+}
+ANSWER = "我会先定义离线评测集，再建立线上指标与人工抽检闭环。"
+
+
+class FlakyGenerator:
+    """按顺序执行 outcomes：'ok' 正常出题，None 返回空，异常实例则抛出"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def __call__(self, dimension, difficulty, question_id, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else "ok"
+        if isinstance(outcome, Exception):
+            raise outcome
+        if outcome is None:
+            return None
+        return {"id": question_id, "text": f"{dimension} {difficulty} {question_id}", "dimension": dimension, "difficulty": difficulty}
+
+
+@pytest.mark.parametrize("failure", [None, RuntimeError("429 Too Many Requests")])
+def test_failed_generation_clears_current(monkeypatch, failure):
+    monkeypatch.setattr(adaptive_interview, "generate_question_at", FlakyGenerator("ok", failure))
+    interview = AdaptiveInterview(WEIGHTS)
+
+    async def scenario():
+        first = await interview.next_question()
+        interview.record(first, 7.0)
+        with pytest.raises(QuestionGenerationError):
+            await interview.next_question()
+        assert interview.current is None
+        assert not interview.finished
+        assert [q["id"] for q in interview.questions] == ["q001"]
+        retried = await interview.next_question()
+        assert retried["id"] == "q002"
+        assert interview.current is retried
+
+    asyncio.run(scenario())
+
+
+def test_answer_endpoint_is_retryable_when_generation_raises(monkeypatch):
+    generator = FlakyGenerator("ok", RuntimeError("429 Too Many Requests"))
+    monkeypatch.setattr(adaptive_interview, "generate_question_at", generator)
+
+    async def fake_evaluate(question, answer):
+        return {"score": 7.0, "dimension": question["dimension"]}
+
+    monkeypatch.setattr(main, "evaluate_answer", fake_evaluate)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            started = (await client.post("/api/adaptive/start", json={"ability_weights": WEIGHTS})).json()
+            session_id = started["data"]["session_id"]
+            interview = adaptive_sessions.get(session_id)
+
+            failed = (await client.post("/api/adaptive/answer", json={"session_id": session_id, "answer": ANSWER})).json()
+            assert failed["success"] is False
+            assert failed["data"]["evaluation"]["score"] == 7.0
+            assert failed["data"]["finished"] is False
+
+            # 重试提交不会再次评分并记录已作答的 q001
+            repeated = (await client.post("/api/adaptive/answer", json={"session_id": session_id, "answer": ANSWER})).json()
+            assert repeated["success"] is False
+            assert sum(len(r) for r in interview.responses.values()) == 1
+
+            retried = (await client.post("/api/adaptive/next", json={"session_id": session_id})).json()
+            assert retried["success"] is True
+            assert retried["data"]["question"]["id"] == "q002"
+
+    asyncio.run(scenario())
@@ -0,0 +1,43 @@
+"""
+结构化题库解析：列表项按「- 」前缀识别并去掉成对加粗标记，分隔线与标题结束当前列表
+"""
+from pathlib import Path
+
+from config import settings
+from services.question_bank import parse_question_bank
+
+SNIPPET = """## 风险意识（1道）
+
+### Q3-R01 合规伦理
+**题目**：设计人脸识别产品时，需要考虑哪些合规和伦理风险？如何规避？
+
+**考察点**：合规意识、伦理思考
+
+**期望回答要点**：
+- **隐私保护**：授权机制、数据加密、定期清理
+- **公平性**：多样性测试、偏见检测
+
+---
+
+**文档结束**
+"""
+
+
+def test_bold_list_items_and_footer():
+    [question] = parse_question_bank(SNIPPET, "snippet.md")
+    assert question.bank_id == "Q3-R01"
+    assert question.dimension == "risk_awareness"
+    assert question.difficulty == "高级"
+    assert question.expected_points == [
+        "隐私保护：授权机制、数据加密、定期清理",
+        "公平性：多样性测试、偏见检测"
+    ]
+
+
+def test_shipped_bank_entry():
+    path = Path(settings.question_bank_dir) / "高级题-10道.md"
+    questions = {q.bank_id: q for q in parse_question_bank(path.read_text(encoding="utf-8"), path.name)}
+    points = questions["Q3-R01"].expected_points
+    assert points[0] == "隐私保护：授权机制、数据加密、定期清理"
+    assert len(points) == 5
+    assert not any("**" in p or "文档结束" in p for q in questions.values() for p in q.expected_points)
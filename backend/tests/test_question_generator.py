@@ -0,0 +1,46 @@
+"""
+出题查重：重试用尽时保留相似度最低的版本，只有完全相同的题目才丢弃并计入统计
+"""
+import asyncio
+
+import services.question_generator as question_generator
+from config import settings
+from services.question_dedup import MinHashIndex, dedup_stats
+
+ASKED = "请结合你做过的项目，谈谈你会如何设计并衡量大模型客服的效果评估体系"
+
+
+def question(text: str) -> dict:
+    return {"id": "q001", "text": text, "dimension": "ai_tech_understanding", "difficulty": "进阶"}
+
+
+def run_dedup(monkeypatch, first: str, regenerated: list) -> list:
+    async def fake_generate(**kwargs):
+        return question(regenerated.pop(0)) if regenerated else None
+
+    async def dimension_task():
+        return [question(first)]
+
+    monkeypatch.setattr(question_generator, "_generate_one_question", fake_generate)
+    monkeypatch.setattr(settings, "question_dedup_max_retries", 1)
+    index = MinHashIndex()
+    index.add(ASKED, ASKED)
+    return asyncio.run(question_generator._deduplicated(
+        dimension_task(), index, "无", "中型公司", "", asyncio.Semaphore(1)
+    ))
+
+
+def test_keeps_least_similar_candidate_when_retries_exhausted(monkeypatch):
+    before = dedup_stats.stats()
+    similar = "请结合你做过的项目，谈谈你会如何设计并衡量大模型客服的效果评估体系与指标"
+    kept = run_dedup(monkeypatch, ASKED, [similar])
+    assert [q["text"] for q in kept] == [similar]
+    after = dedup_stats.stats()
+    assert after["kept_similar"] == before["kept_similar"] + 1
+    assert after["dropped"] == before["dropped"]
+
+
+def test_drops_exact_repeat_and_counts_shortfall(monkeypatch):
+    before = dedup_stats.stats()
+    assert run_dedup(monkeypatch, ASKED, [ASKED]) == []
+    assert dedup_stats.stats()["dropped"] == before["dropped"] + 1